@@ -1,14 +1,23 @@
 # meeting-registration/admin.py
 import os
-from datetime import datetime, timedelta
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
-from flask import session, send_file
+from datetime import datetime, timedelta, timezone
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, abort
+from flask import session
 from functools import wraps
-import csv
-import io
 from sqlalchemy import func, desc
 from models import db, Employee, Meeting, Registration
-from extensions import cache
+from db_routing import use_replica
+import meeting_cache
+import meeting_warmup
+import registration_cache
+import registration_stats
+import live_feed
+from employee_directory import count_employees
+from export_utils import csv_response, iter_registrations
+from pagination import estimate_count, keyset_paginate
+from query_budget import query_budget
+import employee_search
+import attendance_rollup
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -74,6 +83,7 @@ def logout():
     return redirect(url_for('admin.login'))
 
 @admin_bp.route('/')
+@use_replica
 @login_required
 def dashboard():
     """Admin dashboard"""
@@ -81,38 +91,32 @@ def dashboard():
     print(f"Dashboard - Session logged in: {session.get('admin_logged_in')}")
     print(f"Dashboard - Full session: {dict(session)}")
 
-    # Get statistics
-    total_employees = Employee.query.count()
+    # Get statistics (ตัวนับจาก cache / Redis ไม่ต้อง count ตารางทุกครั้งที่ refresh)
     active_meeting = Meeting.get_active_meeting()
     
     stats = {
-        'total_employees': total_employees,
-        'total_meetings': Meeting.query.count(),
+        'total_employees': count_employees(),
+        'total_meetings': meeting_cache.count_meetings(),
         'active_meeting': active_meeting
     }
     
     if active_meeting:
-        stats['total_registrations'] = Registration.query.filter_by(
-            meeting_id=active_meeting.id
-        ).count()
+        meeting_stats = registration_stats.get_stats(active_meeting.id)
+        stats['total_registrations'] = meeting_stats.total
         
         # Get recent registrations
         recent_registrations = Registration.query.filter_by(
             meeting_id=active_meeting.id
         ).order_by(desc(Registration.registration_time)).limit(10).all()
         
-        # Registration by hour statistics
-        hourly_stats = db.session.query(
-            func.date_trunc('hour', Registration.registration_time).label('hour'),
-            func.count(Registration.id).label('count')
-        ).filter_by(meeting_id=active_meeting.id).group_by('hour').all()
-        
         stats['recent_registrations'] = recent_registrations
-        stats['hourly_stats'] = hourly_stats
+        stats['hourly_stats'] = meeting_stats.hourly
     
     return render_template('admin/dashboard.html', **stats)
 
 @admin_bp.route('/meetings')
+@use_replica
+@query_budget(2)
 @login_required
 def meetings():
     """Manage meetings"""
@@ -153,7 +157,8 @@ def create_meeting():
             db.session.add(meeting)
             db.session.commit()
 
-            cache.delete('active_meeting')
+            meeting_cache.invalidate()
+            meeting_warmup.schedule(meeting)
             
             flash('สร้างการประชุมใหม่สำเร็จ', 'success')
             return redirect(url_for('admin.meetings'))
@@ -188,7 +193,8 @@ def edit_meeting(meeting_id):
             meeting.additional_info = request.form.get('additional_info')
             
             db.session.commit()
-            cache.delete('active_meeting')
+            meeting_cache.invalidate()
+            meeting_warmup.schedule(meeting)
             
             flash('แก้ไขข้อมูลการประชุมสำเร็จ', 'success')
             return redirect(url_for('admin.meetings'))
@@ -222,7 +228,7 @@ def delete_meeting(meeting_id):
     try:
         db.session.delete(meeting)
         db.session.commit()
-        cache.delete('active_meeting')
+        meeting_cache.invalidate()
         
         # For AJAX request
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
@@ -249,7 +255,8 @@ def toggle_meeting(meeting_id):
     meeting.is_active = not meeting.is_active
     
     db.session.commit()
-    cache.delete('active_meeting')
+    meeting_cache.invalidate()
+    meeting_warmup.schedule(meeting)
     flash('อัปเดตสถานะการประชุมแล้ว', 'success')
     return redirect(url_for('admin.meetings'))
 
@@ -267,105 +274,125 @@ def set_exclusive_meeting(meeting_id):
     meeting.is_active = True
     
     db.session.commit()
-    cache.delete('active_meeting')
+    meeting_cache.invalidate()
+    meeting_warmup.schedule(meeting)
     
     flash(f'เปิดเฉพาะการประชุม "{meeting.topic}" และปิดการประชุมอื่นทั้งหมด', 'success')
     return redirect(url_for('admin.meetings'))
 
 @admin_bp.route('/registrations/<int:meeting_id>')
+@use_replica
 @login_required
 def view_registrations(meeting_id):
     """View registrations for a meeting"""
     meeting = Meeting.query.get_or_404(meeting_id)
     
-    # Pagination
-    page = request.args.get('page', 1, type=int)
-    per_page = 50
-    
-    registrations = Registration.query.filter_by(
-        meeting_id=meeting_id
-    ).order_by(desc(Registration.registration_time)).paginate(
-        page=page, per_page=per_page, error_out=False
+    # Keyset pagination (ใหม่ -> เก่า) ทุกหน้าใช้เวลาเท่ากัน ไม่ต้อง OFFSET/COUNT
+    registrations = keyset_paginate(
+        Registration.query.filter_by(meeting_id=meeting_id),
+        (Registration.registration_time, Registration.id),
+        per_page=50,
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+        descending=True
     )
+    registrations.total = registration_stats.get_stats(meeting_id).total
     
     return render_template('admin/registrations.html', 
                          meeting=meeting, 
                          registrations=registrations)
 
+@admin_bp.route('/registrations/<int:meeting_id>/stream')
+@login_required
+def registrations_stream(meeting_id):
+    """Live registration feed (Server-Sent Events, อ่านจาก Redis เท่านั้น)"""
+    if not live_feed.is_enabled() or meeting_cache.get_meeting(meeting_id) is None:
+        abort(404)
+    return live_feed.stream_response(meeting_id, request.headers.get('Last-Event-ID'))
+
 @admin_bp.route('/registrations/<int:meeting_id>/export')
+@use_replica
 @login_required
 def export_registrations(meeting_id):
     """Export registrations to CSV"""
-    meeting = Meeting.query.get_or_404(meeting_id)
-    registrations = Registration.query.filter_by(meeting_id=meeting_id).all()
+    Meeting.query.get_or_404(meeting_id)
     
-    # Create CSV in memory
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write headers
-    writer.writerow([
+    header = [
         'ลำดับ', 'รหัสพนักงาน', 'ชื่อ-นามสกุล', 'ตำแหน่ง', 
         'ส่วนงานย่อ', 'ศูนย์ต้นทุน', 'เวลาลงทะเบียน', 'ลงทะเบียนด้วยตนเอง'
-    ])
-    
-    # Write data
-    for idx, reg in enumerate(registrations, 1):
-        writer.writerow([
-            idx,
-            reg.emp_id or '',
-            reg.emp_name,
-            reg.position or '',
-            reg.sec_short or '',
-            reg.cc_name or '',
-            reg.registration_time.strftime('%Y-%m-%d %H:%M:%S'),
-            'ใช่' if reg.is_manual_entry else 'ไม่ใช่'
-        ])
-    
-    # Prepare response
-    output.seek(0)
-    output_bytes = io.BytesIO()
-    output_bytes.write(output.getvalue().encode('utf-8-sig'))  # UTF-8 with BOM for Excel
-    output_bytes.seek(0)
+    ]
+    
+    def rows():
+        for idx, reg in enumerate(iter_registrations(meeting_id), 1):
+            yield [
+                idx,
+                reg.emp_id or '',
+                reg.emp_name,
+                reg.position or '',
+                reg.sec_short or '',
+                reg.cc_name or '',
+                reg.registration_time.strftime('%Y-%m-%d %H:%M:%S'),
+                'ใช่' if reg.is_manual_entry else 'ไม่ใช่'
+            ]
     
     filename = f"registrations_{meeting_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
     
-    return send_file(
-        output_bytes,
-        mimetype='text/csv',
-        as_attachment=True,
-        download_name=filename
-    )
+    return csv_response(header, rows(), filename)
 
 @admin_bp.route('/employees')
+@use_replica
 @login_required
 def employees():
     """View employees"""
-    page = request.args.get('page', 1, type=int)
-    per_page = 50  # จำนวนรายการต่อหน้า
     search = request.args.get('search', '')
-    
-    query = Employee.query
-    
-    if search:
-        query = query.filter(
-            db.or_(
-                Employee.emp_id.contains(search),
-                Employee.emp_name.contains(search),
-                Employee.position.contains(search),
-                Employee.sec_short.contains(search),
-                Employee.cc_name.contains(search)
-            )
+    terms = employee_search.normalize_query(search)
+    
+    if terms:
+        # ค้นหา: แสดงผลที่ตรงที่สุดก่อน แบ่งหน้าตามลำดับความตรง ใช้ trigram index
+        employees = employee_search.search_page(
+            terms,
+            after=request.args.get('after'),
+            before=request.args.get('before')
         )
-    
-    employees = query.order_by(Employee.emp_id).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+        # ผลทั้งหมดอยู่ในหน้าเดียว = รู้จำนวนจริงแล้ว ไม่ต้องประมาณ
+        if not employees.has_next and not employees.has_prev:
+            employees.total = len(employees.items)
+        else:
+            employees.total = estimate_count(employee_search.filtered_query(terms))
+            employees.total_is_estimate = True
+    else:
+        employees = keyset_paginate(
+            Employee.query.filter(Employee.deleted_at.is_(None)),
+            (Employee.emp_id,),
+            per_page=50,  # จำนวนรายการต่อหน้า
+            after=request.args.get('after'),
+            before=request.args.get('before')
+        )
+        employees.total = count_employees()
     
     return render_template('admin/employees.html', 
                          employees=employees, 
                          search=search)
 
+@admin_bp.route('/api/employees/search')
+@use_replica
+@login_required
+def search_employees_api():
+    """Employee autocomplete (JSON)"""
+    query = request.args.get('q', '').strip()
+    limit = min(request.args.get('limit', employee_search.AUTOCOMPLETE_LIMIT, type=int), 20)
+    
+    results = employee_search.autocomplete(query, limit=max(limit, 1)) if len(query) >= 2 else []
+    
+    return jsonify({
+        'results': [
+            dict(employee,
+                 title=f"{employee['emp_id']} {employee['emp_name']}",
+                 description=' / '.join(filter(None, [employee['position'], employee['sec_short']])))
+            for employee in results
+        ]
+    })
+
 @admin_bp.route('/registrations/<int:registration_id>/delete', methods=['POST'])
 @login_required
 def delete_registration(registration_id):
@@ -373,12 +400,14 @@ def delete_registration(registration_id):
     registration = Registration.query.get_or_404(registration_id)
     meeting_id = registration.meeting_id
     emp_name = registration.emp_name
+    counted = registration_stats.snapshot(registration)
     
     try:
         db.session.delete(registration)
         db.session.commit()
-        # Clear cache ถ้ามี
-        cache.delete('active_meeting')
+        registration_cache.invalidate(meeting_id)
+        registration_stats.record([counted], delta=-1)
+        live_feed.publish_counts([meeting_id])
         
 
         flash(f'ลบการลงทะเบียนของ {emp_name} เรียบร้อยแล้ว', 'success')
@@ -386,9 +415,9 @@ def delete_registration(registration_id):
         db.session.rollback()
         flash(f'เกิดข้อผิดพลาดในการลบ: {str(e)}', 'error')
     
-    # Redirect กลับไปหน้าเดิมพร้อม page number
-    page = request.args.get('page', 1, type=int)
-    return redirect(url_for('admin.view_registrations', meeting_id=meeting_id, page=page))
+    # Redirect กลับไปหน้าเดิมพร้อม cursor
+    cursor_args = {name: request.args[name] for name in ('after', 'before') if request.args.get(name)}
+    return redirect(url_for('admin.view_registrations', meeting_id=meeting_id, **cursor_args))
 
 @admin_bp.route('/registrations/delete_multiple', methods=['POST'])
 @login_required
@@ -402,10 +431,14 @@ def delete_multiple_registrations():
         return redirect(url_for('admin.view_registrations', meeting_id=meeting_id))
     
     try:
+        meeting_ids = [row.meeting_id for row in db.session.query(Registration.meeting_id).filter(
+            Registration.id.in_(registration_ids)).distinct()]
         Registration.query.filter(Registration.id.in_(registration_ids)).delete(synchronize_session=False)
         db.session.commit()
-        # Clear ALL cache
-        cache.delete('active_meeting')
+        for affected_meeting_id in meeting_ids:
+            registration_cache.invalidate(affected_meeting_id)
+            registration_stats.invalidate(affected_meeting_id)
+        live_feed.publish_counts(meeting_ids)
         flash(f'ลบ {len(registration_ids)} รายการเรียบร้อยแล้ว', 'success')
     except Exception as e:
         db.session.rollback()
@@ -427,8 +460,9 @@ def delete_all_registrations(meeting_id):
         count = Registration.query.filter_by(meeting_id=meeting_id).count()
         Registration.query.filter_by(meeting_id=meeting_id).delete()
         db.session.commit()
-        # Clear ALL cache
-        cache.delete('active_meeting')
+        registration_cache.invalidate(meeting_id)
+        registration_stats.invalidate(meeting_id)
+        live_feed.publish_counts([meeting_id])
         flash(f'ลบการลงทะเบียนทั้งหมด {count} รายการเรียบร้อยแล้ว', 'success')
     except Exception as e:
         db.session.rollback()
@@ -437,6 +471,7 @@ def delete_all_registrations(meeting_id):
     return redirect(url_for('admin.view_registrations', meeting_id=meeting_id))
 
 @admin_bp.route('/statistics')
+@use_replica
 @login_required
 def statistics():
     """View registration statistics"""
@@ -446,32 +481,87 @@ def statistics():
         flash('ไม่มีการประชุมที่เปิดอยู่', 'warning')
         return redirect(url_for('admin.dashboard'))
     
-    # Statistics by department
-    dept_stats = db.session.query(
-        Registration.sec_short,
-        func.count(Registration.id).label('count')
-    ).filter_by(
-        meeting_id=active_meeting.id
-    ).group_by(Registration.sec_short).order_by(desc('count')).all()
-    
-    # Statistics by hour
-    hourly_stats = db.session.query(
-        func.date_trunc('hour', Registration.registration_time).label('hour'),
-        func.count(Registration.id).label('count')
-    ).filter_by(
-        meeting_id=active_meeting.id
-    ).group_by('hour').order_by('hour').all()
-    
-    # Manual vs automatic registration
-    manual_stats = db.session.query(
-        Registration.is_manual_entry,
-        func.count(Registration.id).label('count')
-    ).filter_by(
-        meeting_id=active_meeting.id
-    ).group_by(Registration.is_manual_entry).all()
+    # Statistics by department / hour / manual vs automatic (live counters)
+    meeting_stats = registration_stats.get_stats(active_meeting.id)
+    dept_stats = meeting_stats.by_section
+    hourly_stats = meeting_stats.hourly
+    manual_stats = meeting_stats.manual
     
     return render_template('admin/statistics.html',
                          meeting=active_meeting,
                          dept_stats=dept_stats,
                          hourly_stats=hourly_stats,
                          manual_stats=manual_stats)
+
+def rollup_meeting():
+    """Meeting selected by ?meeting_id= (default: the active meeting)"""
+    meeting_id = request.args.get('meeting_id', type=int)
+    if meeting_id:
+        return meeting_cache.get_meeting_or_404(meeting_id)
+    return Meeting.get_active_meeting()
+
+@admin_bp.route('/statistics/hierarchy')
+@use_replica
+@login_required
+def hierarchy_statistics():
+    """Attendance rate at every level of the organization (สายงาน > กลุ่ม > ฝ่าย > ส่วนงาน)"""
+    meeting = rollup_meeting()
+    if not meeting:
+        flash('ไม่มีการประชุมที่เปิดอยู่', 'warning')
+        return redirect(url_for('admin.dashboard'))
+    
+    # แสดงถึงระดับไหน (default: สายงานและกลุ่ม)
+    depth = min(max(request.args.get('depth', 2, type=int), 1), len(attendance_rollup.LEVELS))
+    rollup = attendance_rollup.get_rollup(meeting.id)
+    
+    meetings = db.session.query(Meeting.id, Meeting.topic, Meeting.meeting_date).order_by(
+        desc(Meeting.meeting_date), desc(Meeting.id)
+    ).limit(50).all()
+    
+    return render_template('admin/statistics_hierarchy.html',
+                         meeting=meeting,
+                         meetings=meetings,
+                         rollup=rollup,
+                         rows=[row for row in rollup.rows if row.depth <= depth],
+                         depth=depth,
+                         levels=attendance_rollup.LEVELS,
+                         computed_at=datetime.fromtimestamp(rollup.computed_at, timezone.utc))
+
+@admin_bp.route('/statistics/hierarchy.<format>')
+@use_replica
+@login_required
+def export_hierarchy_statistics(format):
+    """Attendance rollup as JSON or CSV (ทุกระดับ)"""
+    if format not in ('json', 'csv'):
+        abort(404)
+    
+    meeting = rollup_meeting()
+    if not meeting:
+        abort(404)
+    rollup = attendance_rollup.get_rollup(meeting.id)
+    
+    if format == 'json':
+        return jsonify({
+            'meeting_id': meeting.id,
+            'computed_at': datetime.fromtimestamp(rollup.computed_at, timezone.utc).isoformat(),
+            'registration_total': rollup.registration_total,
+            'unmatched': rollup.unmatched,
+            'rows': [row.to_dict() for row in rollup.rows]
+        })
+    
+    header = ['ระดับ'] + [level[1] for level in attendance_rollup.LEVELS] + [
+        'ชื่อย่อ', 'ชื่อเต็ม', 'ผู้มีสิทธิ์', 'ลงทะเบียน', 'อัตรา (%)'
+    ]
+    
+    def rows():
+        for row in rollup.rows:
+            codes = list(row.codes) + [''] * (len(attendance_rollup.LEVELS) - row.depth)
+            yield [row.label] + [code or '' for code in codes] + [
+                row.short_name or '', row.full_name or '', row.eligible, row.registered, f'{row.rate:.2f}'
+            ]
+        # การลงทะเบียนที่ไม่ตรงกับพนักงานในระบบ (กรอกเอง / พนักงานที่ถูกลบ)
+        if rollup.unmatched:
+            yield ['ไม่ตรงกับข้อมูลพนักงาน'] + [''] * (len(header) - 3) + [rollup.unmatched, '']
+    
+    filename = f"attendance_{meeting.id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    return csv_response(header, rows(), filename)
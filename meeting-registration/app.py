@@ -5,6 +5,9 @@ load_dotenv()
     
 import os
 import json
+import math
+import base64
+import hmac
 from flask_caching import Cache
 import requests
 import logging
@@ -26,13 +29,24 @@ from pathlib import Path
 from config import config
 from models import db, Employee, Meeting, Registration
 from admin import admin_bp
-from extensions import cache, celery_app
+from extensions import cache, celery_app, redis_store
+from tiered_cache import tiered_cache
 from timezone_utils import convert_to_timezone, format_datetime_thai, format_time_thai, format_date_thai
 
 from flask_mail import Mail
 from auth import auth_bp
 from organizer import organizer_bp
-from qrcode_utils import generate_meeting_qr, generate_qr_base64
+import qrcode_cache
+import registration_buffer
+import registration_cache
+import registration_stats
+import live_feed
+import meeting_cache
+import db_resilience
+import db_routing
+from db_resilience import CircuitOpenError
+from query_budget import query_budget
+from redis.exceptions import RedisError
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -71,6 +85,9 @@ def create_app(config_name=None):
     db.init_app(app)
     Migrate(app, db)
     cache.init_app(app)
+    redis_store.init_app(app)
+    tiered_cache.init_app(app)
+    db_resilience.init_app(app)
     
     # Configure Celery
     celery_app.config_from_object(app.config, namespace='CELERY')
@@ -135,6 +152,9 @@ def create_app(config_name=None):
         default_limits=["200 per day", "50 per hour"],
         storage_uri=app.config.get('RATELIMIT_STORAGE_URL', 'memory://')
     )
+    # EventSource ต่อใหม่ทุก LIVE_FEED_RETRY_MS จึงไม่นับรวมกับ default limits
+    limiter.exempt(app.view_functions['admin.registrations_stream'])
+    limiter.exempt(app.view_functions['organizer.registrations_stream'])
 
     # The Celery task definition can stay here
     @celery_app.task(name='tasks.send_to_google_sheets')
@@ -230,8 +250,18 @@ def create_app(config_name=None):
             'datetime': datetime
         }
     
+    logo_path_memo = {}
+
     def get_logo_path():
         """Get logo path relative to Flask app - works everywhere"""
+        # ใช้ path ที่เคยหาเจอแล้วถ้าไฟล์ยังอยู่ (stat ครั้งเดียวแทนการไล่หาทุกครั้ง)
+        known_path = logo_path_memo.get('path')
+        if known_path and os.path.exists(known_path):
+            return known_path
+        logo_path_memo['path'] = find_logo_path()
+        return logo_path_memo['path']
+
+    def find_logo_path():
         # Check in static folder (Flask default location)
         static_folder = app.static_folder or 'static'
         
@@ -254,55 +284,96 @@ def create_app(config_name=None):
         
         return None
 
+    def get_registration_url(meeting_id):
+        """Registration URL encoded in the meeting QR Code"""
+        base_url = request.url_root.rstrip('/')
+        if app.config.get('APPLICATION_ROOT'):
+            base_url = base_url + app.config['APPLICATION_ROOT'].rstrip('/')
+        return f"{base_url}/submit/{meeting_id}"
+
+    def meeting_qr_url(meeting_id):
+        """URL ของรูป QR Code (มี fingerprint ใน query string เพื่อให้ browser cache ได้นาน)"""
+        digest = qrcode_cache.fingerprint(get_registration_url(meeting_id), get_logo_path())
+        return url_for('meeting_qrcode_image', meeting_id=meeting_id, v=digest)
+
+    def save_registration(meeting, emp_id, **fields):
+        """
+        Shared registration write path for register() and register_manual()
+
+        Returns:
+            (registration, created)
+        """
+        # Write-behind: ตอบผู้ใช้ทันทีแล้วให้ worker เขียนลง database เป็น batch
+        # (เฉพาะการลงทะเบียนจากข้อมูลพนักงาน เพราะ manual entry อาจขัด foreign key ได้)
+        if registration_buffer.is_enabled() and not fields.get('is_manual_entry'):
+            try:
+                return registration_buffer.accept(
+                    meeting.id,
+                    emp_id,
+                    ip_address=get_remote_address(),
+                    user_agent=request.headers.get('User-Agent', '')[:500],
+                    **fields
+                )
+            except RedisError as e:
+                logger.warning(f"Registration buffer unavailable, writing directly: {e}")
+        
+        registration, created = Registration.create_or_get(
+            meeting.id,
+            emp_id,
+            ip_address=get_remote_address(),
+            user_agent=request.headers.get('User-Agent', '')[:500],
+            **fields
+        )
+        
+        if registration is not None:
+            registration_cache.add(registration)
+        
+        if created:
+            registration_stats.record([registration])
+            live_feed.publish_registrations([registration])
+            
+            # Send to Google Sheets (async)
+            try:
+                reg_data_for_task = {
+                    'รหัสพนักงาน': registration.emp_id,
+                    'ชื่อ': registration.emp_name,
+                    'ตำแหน่ง': registration.position or '',
+                    'ส่วนงานย่อ': registration.sec_short or '',
+                    'ชื่อศูนย์ต้นทุน': registration.cc_name or '',
+                    'เวลาลงทะเบียน': registration.registration_time.isoformat(),
+                    'ลงทะเบียนด้วยตนเอง': 'ใช่' if registration.is_manual_entry else 'ไม่ใช่'
+                }
+                send_to_google_sheets_task.delay(reg_data_for_task, app.config['GOOGLE_SCRIPT_URL'])
+            except Exception as e:
+                logger.error(f"Failed to queue task for Google Sheets: {e}")
+        
+        return registration, created
+
+    def find_registration(meeting_id, emp_id):
+        """
+        Look up an existing registration summary (Redis first, database if Redis is down)
+
+        Returns:
+            dict (emp_id, emp_name, position, sec_short, cc_name, ...) or None
+        """
+        try:
+            return registration_cache.get(meeting_id, emp_id)
+        except RedisError as e:
+            logger.warning(f"Registered set unavailable, checking database: {e}")
+            existing_registration = Registration.query.filter_by(meeting_id=meeting_id, emp_id=emp_id).first()
+            return registration_cache.summarize(existing_registration) if existing_registration else None
+
     @app.route('/')
+    @query_budget(1)
     def index():
         """Main registration page - แสดงตามจำนวนการประชุมที่ active"""
         
-        # ดึงการประชุมที่ active และ public
-        active_meetings = Meeting.query.filter_by(
-            is_active=True,
-            is_public=True
-        ).all()
-        
-        # จัดกลุ่มการประชุมตามสถานะเวลา
-        timezone = app.config.get('TIMEZONE', 'Asia/Bangkok')
-        bangkok_tz = pytz.timezone(timezone)
-        now = datetime.now(bangkok_tz)
-        today = now.date()
-        
-        ongoing_meetings = []  # กำลังดำเนินการ
-        today_meetings = []    # วันนี้ (ยังไม่เริ่ม)
-        upcoming_meetings = [] # กำลังจะมาถึง (พรุ่งนี้ขึ้นไป)
-        past_meetings = []     # ผ่านไปแล้ว
-        
-        for meeting in active_meetings:
-            # แปลงเวลาให้เป็น datetime สำหรับเปรียบเทียบ
-            meeting_start = bangkok_tz.localize(
-                datetime.combine(meeting.meeting_date, meeting.start_time)
-            )
-            meeting_end = bangkok_tz.localize(
-                datetime.combine(meeting.meeting_date, meeting.end_time)
-            )
-            
-            # ตรวจสอบสถานะ
-            if meeting_end < now:
-                # ผ่านไปแล้ว
-                past_meetings.append(meeting)
-            elif meeting_start <= now <= meeting_end:
-                # กำลังดำเนินการอยู่
-                ongoing_meetings.append(meeting)
-            elif meeting.meeting_date == today:
-                # วันนี้แต่ยังไม่เริ่ม
-                today_meetings.append(meeting)
-            else:
-                # วันอื่นๆ ในอนาคต
-                upcoming_meetings.append(meeting)
-        
-        # เรียงลำดับภายในแต่ละกลุ่ม
-        ongoing_meetings.sort(key=lambda m: m.start_time)
-        today_meetings.sort(key=lambda m: m.start_time)
-        upcoming_meetings.sort(key=lambda m: (m.meeting_date, m.start_time))
-        past_meetings.sort(key=lambda m: (m.meeting_date, m.start_time), reverse=True)
+        # การประชุมที่ active และ public จัดกลุ่มตามสถานะเวลาไว้แล้ว (cache จนกว่าจะมีการประชุมเปลี่ยนกลุ่ม)
+        buckets = meeting_cache.get_index_buckets()
+        ongoing_meetings = buckets.ongoing  # กำลังดำเนินการ
+        today_meetings = buckets.today      # วันนี้ (ยังไม่เริ่ม)
+        upcoming_meetings = buckets.upcoming  # กำลังจะมาถึง (พรุ่งนี้ขึ้นไป)
+        past_meetings = buckets.past        # ผ่านไปแล้ว (5 รายการล่าสุด)
         
         # รวมการประชุมตามลำดับความสำคัญ
         sorted_meetings = ongoing_meetings + today_meetings + upcoming_meetings
@@ -315,7 +386,7 @@ def create_app(config_name=None):
                                 ongoing_meetings=ongoing_meetings,
                                 today_meetings=today_meetings,
                                 upcoming_meetings=upcoming_meetings,
-                                past_meetings=past_meetings[:5])  # แสดงแค่ 5 รายการล่าสุด
+                                past_meetings=past_meetings)
         else:
             # ถ้าไม่มีการประชุมที่ active เลย
             return render_template('index_multi.html', 
@@ -325,9 +396,10 @@ def create_app(config_name=None):
                                 past_meetings=[])
     
     @app.route('/submit/<int:meeting_id>')
+    @query_budget(1)
     def register_meeting(meeting_id):
         """Registration page for specific meeting"""
-        meeting = Meeting.query.get_or_404(meeting_id)
+        meeting = meeting_cache.get_meeting_or_404(meeting_id)
         
         if not meeting.is_active:
             flash('การประชุมนี้ปิดรับลงทะเบียนแล้ว', 'warning')
@@ -354,7 +426,7 @@ def create_app(config_name=None):
         
         # หา meeting ที่จะลงทะเบียน
         if meeting_id:
-            meeting = Meeting.query.get_or_404(meeting_id)
+            meeting = meeting_cache.get_meeting_or_404(meeting_id)
         else:
             # ถ้าไม่ระบุ meeting_id ให้หา active meeting
             meeting = Meeting.get_active_meeting()
@@ -371,63 +443,42 @@ def create_app(config_name=None):
                 flash('กรุณารอสักครู่ก่อนลงทะเบียนใหม่', 'warning')
                 return redirect(url_for('index'))
         
-        # ขั้นตอนที่ 1: ตรวจสอบการลงทะเบียนซ้ำก่อนเป็นอันดับแรกเสมอ
-        if Registration.check_duplicate(meeting.id, emp_id):
+        # Search for employee
+        employee = Employee.search_by_id(emp_id)
+        
+        # การสแกนซ้ำ: ตอบจาก registered set โดยไม่ต้องถาม database
+        existing_registration = find_registration(meeting.id, employee.emp_id if employee else emp_id)
+        if existing_registration:
             flash('รหัสพนักงานนี้ได้ลงทะเบียนในการประชุมนี้แล้ว', 'info')
-            
-            # ดึงข้อมูลการลงทะเบียนเก่ามาแสดงผล เพื่อให้ผู้ใช้เห็นข้อมูลของตัวเอง
-            existing_registration = Registration.query.filter_by(meeting_id=meeting.id, emp_id=emp_id).first()
-            
             return render_template('registration_success.html', 
-                                    registration_data={
-                                        'emp_id': existing_registration.emp_id,
-                                        'emp_name': existing_registration.emp_name,
-                                        'position': existing_registration.position,
-                                        'sec_short': existing_registration.sec_short,
-                                        'cc_name': existing_registration.cc_name
-                                    },
+                                    registration_data=existing_registration,
                                     meeting=meeting,
                                     already_registered=True)
-    
-        # Search for employee
-        employee = Employee.search_by_id(emp_id)
         
         if employee:            
             try:
-                # Create registration
-                registration = Registration(
-                    meeting_id=meeting.id,
+                # INSERT ... ON CONFLICT - ตรวจสอบการลงทะเบียนซ้ำใน statement เดียว
+                registration, created = save_registration(
+                    meeting,
                     emp_id=employee.emp_id,
                     emp_name=employee.emp_name,
                     position=employee.position,
                     sec_short=employee.sec_short,
                     cc_name=employee.cc_name,
-                    is_manual_entry=False,
-                    ip_address=get_remote_address(),
-                    user_agent=request.headers.get('User-Agent', '')[:500]
+                    is_manual_entry=False
                 )
                 
-                db.session.add(registration)
-                db.session.commit()
+                if not created:
+                    flash('รหัสพนักงานนี้ได้ลงทะเบียนในการประชุมนี้แล้ว', 'info')
+                    return render_template('registration_success.html', 
+                                        registration_data=employee.to_dict(),
+                                        registration=registration,
+                                        meeting=meeting,
+                                        already_registered=True)
                 
                 # Update session with last registration time
                 session[last_registration_key] = datetime.now().isoformat()
                 
-                # Send to Google Sheets (async)
-                try:
-                    reg_data_for_task = {
-                        'รหัสพนักงาน': registration.emp_id,
-                        'ชื่อ': registration.emp_name,
-                        'ตำแหน่ง': registration.position or '',
-                        'ส่วนงานย่อ': registration.sec_short or '',
-                        'ชื่อศูนย์ต้นทุน': registration.cc_name or '',
-                        'เวลาลงทะเบียน': registration.registration_time.isoformat(),
-                        'ลงทะเบียนด้วยตนเอง': 'ใช่' if registration.is_manual_entry else 'ไม่ใช่'
-                    }
-                    send_to_google_sheets_task.delay(reg_data_for_task, app.config['GOOGLE_SCRIPT_URL'])
-                except Exception as e:
-                    logger.error(f"Failed to queue task for Google Sheets: {e}")
-                
                 flash('ลงทะเบียนสำเร็จ', 'success')
                 return render_template('registration_success.html', 
                                     registration_data=employee.to_dict(),
@@ -435,18 +486,6 @@ def create_app(config_name=None):
                                     meeting=meeting,
                                     already_registered=False)
                 
-            except IntegrityError:
-                db.session.rollback()
-                flash('คุณได้ลงทะเบียนในการประชุมนี้แล้ว', 'info')
-                existing_registration = Registration.query.filter_by(
-                    meeting_id=meeting.id,
-                    emp_id=employee.emp_id
-                ).first()
-                return render_template('registration_success.html', 
-                                    registration_data=employee.to_dict(),
-                                    registration=existing_registration,
-                                    meeting=meeting,
-                                    already_registered=True)
             except Exception as e:
                 db.session.rollback()
                 logger.error(f"Registration error: {e}")
@@ -466,7 +505,7 @@ def create_app(config_name=None):
 
         # ✅ ใช้ meeting_id ที่ส่งมา ถ้าไม่มีค่อยหา active meeting
         if meeting_id:
-            meeting = Meeting.query.get_or_404(meeting_id)
+            meeting = meeting_cache.get_meeting_or_404(meeting_id)
             if not meeting.is_active:
                 flash('การประชุมนี้ปิดรับลงทะเบียนแล้ว', 'warning')
                 return redirect(url_for('index'))
@@ -480,14 +519,6 @@ def create_app(config_name=None):
             flash('ไม่มีการประชุมที่เปิดให้ลงทะเบียน', 'error')
             return redirect(url_for('index'))
         
-        # ใช้ session.merge() เพื่อนำ object จาก cache กลับเข้าสู่ session ปัจจุบัน
-        # ทำให้เราได้ object ตัวจริงที่ session กำลังดูแลอยู่
-        # cached_meeting = Meeting.get_active_meeting()
-        # if not cached_meeting:
-        #     flash('ไม่มีการประชุมที่เปิดให้ลงทะเบียน', 'error')
-        #     return redirect(url_for('index'))
-        # meeting = db.session.merge(cached_meeting)
-
         # Get form data
         new_emp_id = request.form.get('new_emp_id', '').strip()
         new_emp_name = request.form.get('new_emp_name', '').strip()
@@ -508,42 +539,21 @@ def create_app(config_name=None):
                                  emp_id=new_emp_id,
                                  meeting=meeting)
         
-        # Check for duplicate
-        if Registration.check_duplicate(meeting.id, new_emp_id):
-            flash('รหัสพนักงานนี้ได้ลงทะเบียนในการประชุมนี้แล้ว', 'warning')
-            return redirect(url_for('index'))
-        
         try:
-            # Create manual registration
-            registration = Registration(
-                meeting_id=meeting.id,
+            # Create manual registration (duplicate check อยู่ใน INSERT เดียวกัน)
+            registration, created = save_registration(
+                meeting,
                 emp_id=new_emp_id,
                 emp_name=new_emp_name,
                 position=new_position,
                 sec_short=new_sec_short,
                 cc_name=new_cc_name,
-                is_manual_entry=True,
-                ip_address=get_remote_address(),
-                user_agent=request.headers.get('User-Agent', '')[:500]
+                is_manual_entry=True
             )
             
-            db.session.add(registration)
-            db.session.commit()
-            
-            # Send to Google Sheets (async)
-            try:
-                reg_data_for_task = {
-                    'รหัสพนักงาน': registration.emp_id,
-                    'ชื่อ': registration.emp_name,
-                    'ตำแหน่ง': registration.position or '',
-                    'ส่วนงานย่อ': registration.sec_short or '',
-                    'ชื่อศูนย์ต้นทุน': registration.cc_name or '',
-                    'เวลาลงทะเบียน': registration.registration_time.isoformat(),
-                    'ลงทะเบียนด้วยตนเอง': 'ใช่' if registration.is_manual_entry else 'ไม่ใช่'
-                }
-                send_to_google_sheets_task.delay(reg_data_for_task, app.config['GOOGLE_SCRIPT_URL'])
-            except Exception as e:
-                logger.error(f"Failed to queue task for Google Sheets: {e}")
+            if not created:
+                flash('รหัสพนักงานนี้ได้ลงทะเบียนในการประชุมนี้แล้ว', 'warning')
+                return redirect(url_for('index'))
             
             flash('ลงทะเบียนด้วยตนเองสำเร็จ', 'success')
             return render_template('registration_success.html', 
@@ -578,12 +588,36 @@ def create_app(config_name=None):
             return jsonify({'exists': True, 'data': employee.to_dict()})
         return jsonify({'exists': False})
     
-    @app.route('/api/registration_status/<meeting_id>/<emp_id>')
+    @app.route('/api/registration_status/<int:meeting_id>/<emp_id>')
     def registration_status(meeting_id, emp_id):
         """Check registration status"""
-        is_registered = Registration.check_duplicate(meeting_id, emp_id)
+        # ไม่สร้าง registered set ใน Redis ให้ meeting_id ที่ไม่มีอยู่จริง
+        if meeting_cache.get_meeting(meeting_id) is None:
+            return jsonify({'error': 'meeting not found'}), 404
+        is_registered = find_registration(meeting_id, emp_id) is not None
         return jsonify({'registered': is_registered})
     
+    @app.route('/api/metrics')
+    def metrics():
+        """Operational metrics (JSON) - ต้องใช้ METRICS_TOKEN หรือ login เป็น admin"""
+        token = app.config.get('METRICS_TOKEN')
+        supplied = request.args.get('token', request.headers.get('X-Metrics-Token'))
+        authorized = 'admin_logged_in' in session or (
+            bool(token) and supplied is not None and hmac.compare_digest(supplied, token)
+        )
+        if not authorized:
+            # ไม่ได้ตั้ง token - ไม่บอกว่ามี endpoint นี้
+            if not token:
+                return jsonify({'error': 'not found'}), 404
+            return jsonify({'error': 'forbidden'}), 403
+        
+        return jsonify({
+            'registration_buffer': registration_buffer.get_metrics(),
+            'cache': tiered_cache.get_metrics(),
+            'database': db_resilience.get_metrics(),
+            'replica': db_routing.get_metrics()
+        })
+    
     @app.errorhandler(429)
     def ratelimit_handler(e):
         """Handle rate limit exceeded"""
@@ -613,6 +647,18 @@ def create_app(config_name=None):
             except:
                 pass
     
+    @app.errorhandler(CircuitOpenError)
+    def handle_circuit_open(error):
+        """Database circuit breaker is open - fail fast instead of waiting for the database"""
+        retry_after = max(1, math.ceil(error.retry_after))
+        if request.path.startswith('/api/') or request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            response = jsonify({'error': 'database unavailable', 'retry_after': retry_after})
+        else:
+            response = app.make_response(render_template('503.html', retry_after=retry_after))
+        response.status_code = 503
+        response.headers['Retry-After'] = str(retry_after)
+        return response
+    
     @app.errorhandler(OperationalError)
     def handle_db_error(error):
         """Handle database connection errors"""
@@ -651,58 +697,53 @@ def create_app(config_name=None):
     @app.route('/meeting/<int:meeting_id>/qrcode')
     def meeting_qrcode(meeting_id):
         """Display QR Code for a specific meeting"""
-        meeting = Meeting.query.get_or_404(meeting_id)
+        meeting = meeting_cache.get_meeting_or_404(meeting_id)
         
-        # Get base URL from configuration or request
-        base_url = request.url_root.rstrip('/')
-        if app.config.get('APPLICATION_ROOT'):
-            base_url = base_url + app.config['APPLICATION_ROOT'].rstrip('/')
+        return render_template('qrcode_display.html', 
+                            meeting=meeting,
+                            qr_image_url=meeting_qr_url(meeting_id),
+                            registration_url=get_registration_url(meeting_id))
+
+    @app.route('/meeting/<int:meeting_id>/qrcode.png')
+    def meeting_qrcode_image(meeting_id):
+        """QR Code PNG (cache ใน Redis, ตอบ 304 ถ้า ETag ตรงกัน)"""
+        meeting_cache.get_meeting_or_404(meeting_id)
         
-        # Use absolute path for logo
+        registration_url = get_registration_url(meeting_id)
         logo_path = get_logo_path()
+        digest = qrcode_cache.fingerprint(registration_url, logo_path)
         
-    
-        # Generate QR Code with absolute logo path
-        from qrcode_utils import generate_qr_base64
-        registration_url = f"{base_url}/submit/{meeting_id}"
-        qr_base64 = generate_qr_base64(registration_url, with_logo=True, logo_path=logo_path)
+        # URL ที่มี fingerprint ตรงกับเนื้อหาไม่มีวันเปลี่ยน - ให้ browser/proxy cache ได้ 1 ปี
+        if request.args.get('v') == digest:
+            cache_control = 'public, max-age=31536000, immutable'
+        else:
+            cache_control = 'public, max-age=3600'
         
-        return render_template('qrcode_display.html', 
-                            meeting=meeting,
-                            qr_image=qr_base64,
-                            registration_url=registration_url)
+        if digest in request.if_none_match:
+            response = app.response_class(status=304)
+        else:
+            png, _ = qrcode_cache.get_png(registration_url, logo_path, digest=digest)
+            response = app.response_class(png, mimetype='image/png')
+        
+        response.set_etag(digest)
+        response.headers['Cache-Control'] = cache_control
+        return response
 
     # เพิ่ม Route สำหรับดาวน์โหลด QR Code
     @app.route('/meeting/<int:meeting_id>/qrcode/download')
     def download_meeting_qrcode(meeting_id):
         """Download QR Code as PNG file"""
         from flask import send_file
+        from io import BytesIO
         
-        meeting = Meeting.query.get_or_404(meeting_id)
-        
-        # Get base URL
-        base_url = request.url_root.rstrip('/')
-        if app.config.get('APPLICATION_ROOT'):
-            base_url = base_url + app.config['APPLICATION_ROOT'].rstrip('/')
-
-        logo_path = get_logo_path()
-        
-        # Generate QR Code image
-        from qrcode_utils import generate_qr_code
-        registration_url = f"{base_url}/submit/{meeting_id}"
-        
-        img = generate_qr_code(registration_url, with_logo=True, logo_path=logo_path)
+        meeting = meeting_cache.get_meeting_or_404(meeting_id)
         
-        # Save to BytesIO for download
-        from io import BytesIO
-        buffered = BytesIO()
-        img.save(buffered, format="PNG")
-        buffered.seek(0)
+        png, _ = qrcode_cache.get_png(get_registration_url(meeting_id), get_logo_path())
         
         filename = f"qrcode_meeting_{meeting_id}.png"
         
         return send_file(
-            buffered,
+            BytesIO(png),
             mimetype='image/png',
             as_attachment=True,
             download_name=filename
@@ -711,26 +752,13 @@ def create_app(config_name=None):
     # เพิ่ม context processor เพื่อสร้าง QR Code สำหรับการประชุม
     @app.context_processor
     def inject_qrcode_generator():
-        """Make QR code generator available in templates"""
+        """Make QR code helpers available in templates"""
         def get_meeting_qr(meeting_id):
-            base_url = request.url_root.rstrip('/')
-            if app.config.get('APPLICATION_ROOT'):
-                base_url = base_url + app.config['APPLICATION_ROOT'].rstrip('/')
-            
-            # Get logo path using helper function
-            logo_path = get_logo_path()
-            
-            if logo_path:
-                logger.info(f"Logo found at: {logo_path}")
-            else:
-                logger.warning("No logo found in any location")
-            
-            # Generate QR code with or without logo based on availability
-            from qrcode_utils import generate_qr_base64
-            registration_url = f"{base_url}/submit/{meeting_id}"
-            return generate_qr_base64(registration_url, with_logo=bool(logo_path), logo_path=logo_path)
+            """Base64 PNG (ใช้ meeting_qr_url กับ <img src> แทนถ้าทำได้)"""
+            png, _ = qrcode_cache.get_png(get_registration_url(meeting_id), get_logo_path())
+            return base64.b64encode(png).decode()
         
-        return dict(get_meeting_qr=get_meeting_qr)
+        return dict(get_meeting_qr=get_meeting_qr, meeting_qr_url=meeting_qr_url)
     
     return app
 
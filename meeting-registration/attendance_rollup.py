@@ -0,0 +1,210 @@
+# attendance_rollup.py
+"""
+Attendance rollups over the organizational hierarchy
+
+สายงาน (division) > กลุ่ม (group) > ฝ่าย (department) > ส่วนงาน (section)
+
+ผู้มีสิทธิ์ (eligible) คือพนักงานที่ยังไม่ถูก soft delete และผู้ลงทะเบียน (registered) คือพนักงานกลุ่มนั้น
+ที่ลงทะเบียนการประชุมแล้ว ทุกระดับคำนวณจากการ scan employees LEFT JOIN registrations ครั้งเดียว:
+  PostgreSQL: GROUP BY ROLLUP(division, group, department, section) แล้วใช้ GROUPING() แยกระดับ
+  database อื่น (SQLite ใน TestingConfig): GROUP BY ระดับล่างสุดแล้วรวมขึ้นไปใน Python
+การลงทะเบียนที่ไม่ตรงกับพนักงาน (กรอกเอง / พนักงานที่ถูกลบไปแล้ว) นับแยกเป็น unmatched
+
+ผลลัพธ์ cache ต่อการประชุมและ version ของ employee directory (เปลี่ยนทุกครั้งที่ import พนักงาน)
+และคำนวณใหม่เมื่อจำนวนผู้ลงทะเบียน (registration_stats) เปลี่ยน แต่ไม่บ่อยกว่า ROLLUP_MAX_STALE_SECONDS
+"""
+
+import logging
+import time
+from collections import namedtuple
+
+from sqlalchemy import and_, func, select
+
+import registration_stats
+from db_routing import on_primary
+from extensions import cache
+
+logger = logging.getLogger(__name__)
+
+# ระดับจากบนลงล่าง: (ชื่อ, ชื่อที่แสดง, คอลัมน์รหัส, ชื่อย่อ, ชื่อเต็ม)
+LEVELS = (
+    ('division', 'สายงาน', 'division_code', 'division_short', 'division_full'),
+    ('group', 'กลุ่ม', 'group_code', 'group_short', 'group_full'),
+    ('department', 'ฝ่าย', 'department_code', 'department_short', 'department_full'),
+    ('section', 'ส่วนงาน', 'section_code', 'sec_short', 'section_full'),
+)
+LEVEL_NAMES = tuple(level[0] for level in LEVELS)
+
+ROLLUP_CACHE_TIMEOUT = 3600
+# ผลที่คำนวณไว้ก่อนมีผู้ลงทะเบียนเพิ่ม ยังใช้ได้อีกกี่วินาที (กันคำนวณใหม่ทุก request ช่วงลงทะเบียน)
+ROLLUP_MAX_STALE_SECONDS = 30
+
+
+class RollupRow(namedtuple('RollupRow', ['depth', 'codes', 'short_name', 'full_name', 'eligible', 'registered'])):
+    """
+    One node of the hierarchy
+
+    depth 0 คือทั้งองค์กร, 1 สายงาน ... 4 ส่วนงาน
+    codes คือรหัสของทุกระดับตั้งแต่สายงานถึงระดับของแถว (ยาวเท่า depth)
+    """
+    __slots__ = ()
+
+    @property
+    def level(self):
+        return LEVEL_NAMES[self.depth - 1] if self.depth else 'total'
+
+    @property
+    def label(self):
+        return LEVELS[self.depth - 1][1] if self.depth else 'ทั้งองค์กร'
+
+    @property
+    def rate(self):
+        """Attendance rate in percent"""
+        return self.registered * 100.0 / self.eligible if self.eligible else 0.0
+
+    def to_dict(self):
+        return {
+            'level': self.level,
+            'codes': dict(zip(LEVEL_NAMES, self.codes)),
+            'short_name': self.short_name,
+            'full_name': self.full_name,
+            'eligible': self.eligible,
+            'registered': self.registered,
+            'rate': round(self.rate, 2),
+        }
+
+
+Rollup = namedtuple('Rollup', ['meeting_id', 'rows', 'registration_total', 'unmatched', 'computed_at'])
+
+
+def _columns():
+    from models import Employee
+
+    codes = [getattr(Employee, level[2]) for level in LEVELS]
+    names = []
+    for level in LEVELS:
+        names.extend([func.max(getattr(Employee, level[3])), func.max(getattr(Employee, level[4]))])
+    return codes, names
+
+
+def _base_query(meeting_id, columns, *group_by):
+    from models import Employee, Registration
+
+    # registrations unique ต่อ (meeting_id, emp_id) จึงนับ Registration.id ได้ตรงจำนวนพนักงาน
+    return select(
+        *columns,
+        func.count(Employee.emp_id),
+        func.count(Registration.id)
+    ).select_from(Employee).outerjoin(
+        Registration,
+        and_(Registration.emp_id == Employee.emp_id, Registration.meeting_id == meeting_id)
+    ).where(Employee.deleted_at.is_(None)).group_by(*group_by)
+
+
+def _own_names(names, depth):
+    """(short, full) name of a node from the max(name) columns of every level"""
+    if not depth:
+        return None, None
+    return names[(depth - 1) * 2], names[(depth - 1) * 2 + 1]
+
+
+def _rollup_postgresql(meeting_id):
+    """GROUP BY ROLLUP: one result row per node of the hierarchy"""
+    from models import db
+
+    codes, names = _columns()
+    groupings = [func.grouping(code) for code in codes]
+    stmt = _base_query(meeting_id, [*codes, *groupings, *names], func.rollup(*codes))
+
+    nodes = {}
+    size = len(LEVELS)
+    for row in db.session.execute(stmt):
+        # ROLLUP สร้างเฉพาะ prefix จึงนับระดับจากคอลัมน์ที่ไม่ถูกรวม
+        depth = size - sum(row[size:size * 2])
+        nodes[tuple(row[:depth])] = [*_own_names(row[size * 2:size * 4], depth), row[-2], row[-1]]
+    return nodes
+
+
+def _rollup_generic(meeting_id):
+    """GROUP BY the lowest level, then add every leaf into its ancestors"""
+    from models import db
+
+    codes, names = _columns()
+    stmt = _base_query(meeting_id, [*codes, *names], *codes)
+
+    nodes = {}
+    size = len(LEVELS)
+    for row in db.session.execute(stmt):
+        eligible, registered = row[-2], row[-1]
+        for depth in range(size + 1):
+            node = nodes.get(tuple(row[:depth]))
+            if node is None:
+                nodes[tuple(row[:depth])] = [*_own_names(row[size:size * 3], depth), eligible, registered]
+            else:
+                node[2] += eligible
+                node[3] += registered
+    return nodes
+
+
+def _sort_key(codes):
+    # แถวแม่มาก่อนแถวลูก (prefix) และรหัสว่างอยู่ท้ายสุดของแต่ละระดับ
+    return tuple((code is None, code or '') for code in codes)
+
+
+@on_primary
+def compute(meeting_id, registration_total=None):
+    """
+    Compute the rollup of a meeting from the database (primary เสมอ เพราะผลถูก cache ใช้ร่วมกัน)
+
+    Returns:
+        Rollup (rows เรียงตามลำดับชั้น แถวแรกคือทั้งองค์กร)
+    """
+    from models import db
+
+    if db.engine.dialect.name == 'postgresql':
+        nodes = _rollup_postgresql(meeting_id)
+    else:
+        nodes = _rollup_generic(meeting_id)
+
+    rows = [RollupRow(len(codes), codes, *values)
+            for codes, values in sorted(nodes.items(), key=lambda item: _sort_key(item[0]))]
+    if not rows:
+        rows = [RollupRow(0, (), None, None, 0, 0)]
+
+    if registration_total is None:
+        registration_total = registration_stats.get_stats(meeting_id).total
+    unmatched = max(registration_total - rows[0].registered, 0)
+
+    return Rollup(meeting_id, rows, registration_total, unmatched, time.time())
+
+
+def get_rollup(meeting_id):
+    """
+    Cached rollup of a meeting
+
+    Returns:
+        Rollup
+    """
+    from employee_directory import EmployeeDirectory
+
+    key = f'attendance_rollup:{meeting_id}:{EmployeeDirectory.current_version()}'
+    total = registration_stats.get_stats(meeting_id).total
+
+    try:
+        rollup = cache.get(key)
+        if rollup is not None and (rollup.registration_total == total
+                                   or time.time() - rollup.computed_at < ROLLUP_MAX_STALE_SECONDS):
+            return rollup
+    except Exception as e:
+        logger.warning(f"Cannot read attendance rollup cache: {e}")
+
+    started = time.perf_counter()
+    rollup = compute(meeting_id, total)
+    logger.info(f"Computed attendance rollup for meeting {meeting_id}: "
+                f"{len(rollup.rows)} nodes in {time.perf_counter() - started:.2f}s")
+
+    try:
+        cache.set(key, rollup, timeout=ROLLUP_CACHE_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"Cannot cache attendance rollup: {e}")
+    return rollup
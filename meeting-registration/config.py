@@ -23,6 +23,12 @@ class Config:
     DATABASE_URL = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
     SQLALCHEMY_DATABASE_URI = DATABASE_URL
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Optional read replica (db_routing.py): admin/organizer reports and exports read from here
+    REPLICA_DATABASE_URL = os.environ.get('REPLICA_DATABASE_URL', '')
+    SQLALCHEMY_BINDS = {'replica': REPLICA_DATABASE_URL} if REPLICA_DATABASE_URL else {}
+    REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', '10'))  # read from primary above this lag
+    REPLICA_LAG_CHECK_INTERVAL = float(os.environ.get('REPLICA_LAG_CHECK_INTERVAL', '5'))  # seconds, per worker
     
     # Session configuration
     PERMANENT_SESSION_LIFETIME = timedelta(hours=1)
@@ -49,6 +55,31 @@ class Config:
     REGISTRATION_COOLDOWN = 5  # seconds between registrations from same IP
     MAX_REGISTRATIONS_PER_IP = 50  # maximum registrations from single IP per day
 
+    # Write-behind registration buffer (Redis Stream -> batched INSERT by RQ worker)
+    REGISTRATION_WRITE_BEHIND = os.environ.get('REGISTRATION_WRITE_BEHIND', 'false').lower() == 'true'
+    REGISTRATION_FLUSH_BATCH_SIZE = int(os.environ.get('REGISTRATION_FLUSH_BATCH_SIZE', '500'))
+    REGISTRATION_FLUSH_RECLAIM_MS = int(os.environ.get('REGISTRATION_FLUSH_RECLAIM_MS', '60000'))  # re-flush entries of dead workers
+    REGISTRATION_FLUSH_RETRY_SECONDS = int(os.environ.get('REGISTRATION_FLUSH_RETRY_SECONDS', '30'))  # next flush while entries are pending
+
+    # Per-meeting registered set in Redis (answers rescans without PostgreSQL)
+    REGISTRATION_CACHE_TTL = int(os.environ.get('REGISTRATION_CACHE_TTL', '86400'))  # seconds
+    # Rebuild live registration counters from SQL (scheduled by rq_worker.py, 0 = off)
+    REGISTRATION_STATS_RECONCILE_MINUTES = int(os.environ.get('REGISTRATION_STATS_RECONCILE_MINUTES', '60'))
+
+    # Live registration feed (SSE) for admin/organizer dashboards, see live_feed.py
+    LIVE_FEED_ENABLED = os.environ.get('LIVE_FEED_ENABLED', 'true').lower() == 'true'
+    # 0 = ส่ง event ที่ค้างแล้วปิด (เหมาะกับ gunicorn sync worker), > 0 = เปิดค้างไว้ (ต้องใช้ gevent worker)
+    LIVE_FEED_STREAM_SECONDS = int(os.environ.get('LIVE_FEED_STREAM_SECONDS', '0'))
+    LIVE_FEED_RETRY_MS = int(os.environ.get('LIVE_FEED_RETRY_MS', '3000'))  # EventSource reconnect delay
+    LIVE_FEED_KEEPALIVE_SECONDS = int(os.environ.get('LIVE_FEED_KEEPALIVE_SECONDS', '15'))
+    LIVE_FEED_MAXLEN = int(os.environ.get('LIVE_FEED_MAXLEN', '1000'))  # entries kept per meeting for reconnects
+
+    # Generated QR Code PNGs in Redis (content-addressed, see qrcode_cache.py)
+    QR_CACHE_TTL = int(os.environ.get('QR_CACHE_TTL', '2592000'))  # 30 days
+
+    # Token for /api/metrics (empty = admin session only)
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
     # SQLAlchemy configuration with connection pool
     SQLALCHEMY_ENGINE_OPTIONS = {
         'pool_size': 10,
@@ -63,19 +94,45 @@ class Config:
         }
     }
     
-    # Database retry configuration
-    DATABASE_RETRY_COUNT = int(os.environ.get('DATABASE_RETRY_COUNT', '3'))
-    DATABASE_RETRY_DELAY = int(os.environ.get('DATABASE_RETRY_DELAY', '1'))
+    # Database retry configuration (db_resilience.py: backoff with full jitter, read queries only)
+    DATABASE_RETRY_COUNT = int(os.environ.get('DATABASE_RETRY_COUNT', '3'))  # attempts
+    DATABASE_RETRY_DELAY = float(os.environ.get('DATABASE_RETRY_DELAY', '0.2'))  # seconds before the first retry
     DATABASE_RETRY_BACKOFF = os.environ.get('DATABASE_RETRY_BACKOFF', 'exponential')  # linear or exponential
-    DATABASE_MAX_RETRY_DELAY = int(os.environ.get('DATABASE_MAX_RETRY_DELAY', '30'))  # max seconds
+    DATABASE_MAX_RETRY_DELAY = float(os.environ.get('DATABASE_MAX_RETRY_DELAY', '2'))  # max seconds per retry
+    # Circuit breaker: fail fast (503) after this many consecutive connection errors per worker
+    DATABASE_BREAKER_THRESHOLD = int(os.environ.get('DATABASE_BREAKER_THRESHOLD', '5'))
+    DATABASE_BREAKER_RESET_SECONDS = int(os.environ.get('DATABASE_BREAKER_RESET_SECONDS', '30'))  # before a trial request
     
     # Cache configuration
     CACHE_KEY_PREFIX = os.environ.get('CACHE_KEY_PREFIX', 'meeting_reg_')
     CACHE_ACTIVE_MEETING_TIMEOUT = int(os.environ.get('CACHE_ACTIVE_MEETING_TIMEOUT', '60'))
-    
+
+    # Per-worker memory tier in front of Redis for hot keys (tiered_cache.py)
+    TIERED_CACHE_ENABLED = os.environ.get('TIERED_CACHE_ENABLED', 'true').lower() == 'true'
+    TIERED_CACHE_SIZE = int(os.environ.get('TIERED_CACHE_SIZE', '1024'))  # entries per worker
+    TIERED_CACHE_TTL = int(os.environ.get('TIERED_CACHE_TTL', '5'))  # seconds, upper bound on staleness
+
+    # Cache stampede protection for hot keys (tiered_cache.get_or_compute)
+    CACHE_STALE_SECONDS = int(os.environ.get('CACHE_STALE_SECONDS', '300'))  # serve expired values while one worker recomputes
+    CACHE_LOCK_TIMEOUT = int(os.environ.get('CACHE_LOCK_TIMEOUT', '10'))  # seconds, must exceed the slowest recompute
+    CACHE_LOCK_WAIT = float(os.environ.get('CACHE_LOCK_WAIT', '3'))  # seconds to wait for the lock holder on a cold miss
+    CACHE_EARLY_REFRESH_BETA = float(os.environ.get('CACHE_EARLY_REFRESH_BETA', '1.0'))  # 0 = no early refresh
+
+    # Warm caches before each meeting starts (meeting_warmup.py, needs rq_worker.py)
+    MEETING_WARMUP_ENABLED = os.environ.get('MEETING_WARMUP_ENABLED', 'true').lower() == 'true'
+    MEETING_WARMUP_LEAD_MINUTES = int(os.environ.get('MEETING_WARMUP_LEAD_MINUTES', '15'))
+    # Public address attendees use, e.g. https://meeting.example.com (needed to pre-render QR Codes)
+    PUBLIC_BASE_URL = os.environ.get('PUBLIC_BASE_URL', '')
+
+    # In-process employee directory (ค้นหารหัสพนักงานจาก memory แทน database)
+    EMPLOYEE_DIRECTORY_ENABLED = os.environ.get('EMPLOYEE_DIRECTORY_ENABLED', 'false').lower() == 'true'
+    EMPLOYEE_DIRECTORY_CHECK_INTERVAL = int(os.environ.get('EMPLOYEE_DIRECTORY_CHECK_INTERVAL', '30'))  # seconds
+
     # Logging configuration
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
     LOG_DATABASE_QUERIES = os.environ.get('LOG_DATABASE_QUERIES', 'false').lower() == 'true'
+    # จำนวน query ต่อ request ของ view ที่มี @query_budget: off, warn (log) หรือ raise (query_budget.py)
+    QUERY_BUDGET = os.environ.get('QUERY_BUDGET', 'off')
 
     # Timezone configuration
     TIMEZONE = os.environ.get('TIMEZONE', 'Asia/Bangkok')
@@ -107,6 +164,7 @@ class DevelopmentConfig(Config):
     """Development configuration"""
     DEBUG = True
     TESTING = False
+    QUERY_BUDGET = os.environ.get('QUERY_BUDGET', 'warn')
 
 class ProductionConfig(Config):
     """Production configuration"""
@@ -118,6 +176,9 @@ class TestingConfig(Config):
     """Testing configuration"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SQLALCHEMY_BINDS = {}
+    SQLALCHEMY_ENGINE_OPTIONS = {}  # pool / connect_args ของ PostgreSQL ใช้กับ SQLite ไม่ได้
+    QUERY_BUDGET = 'raise'
 
 # Configuration dictionary
 config = {
@@ -23,6 +23,8 @@ CREATE TABLE IF NOT EXISTS employees (
     division_full VARCHAR(255),
     cost_center_code VARCHAR(50),
     cc_name VARCHAR(255),
+    content_hash VARCHAR(32),  -- hash ของข้อมูลจากไฟล์ HR (import แบบ --bulk เขียนเฉพาะแถวที่เปลี่ยน)
+    deleted_at TIMESTAMP,      -- soft delete (--bulk --soft-delete)
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
@@ -99,6 +101,11 @@ CREATE INDEX IF NOT EXISTS idx_employees_emp_id ON employees(emp_id);
 CREATE INDEX IF NOT EXISTS idx_employees_emp_name ON employees(emp_name);
 CREATE INDEX IF NOT EXISTS idx_employees_cc_name ON employees(cc_name);
 
+-- ค้นหาพนักงานแบบ substring/fuzzy (employee_search.py) expression ต้องตรงกับ SEARCH_DOCUMENT_SQL
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS idx_employees_search_trgm ON employees
+    USING gin ((lower(coalesce(emp_id, '') || ' ' || coalesce(emp_name, '') || ' ' || coalesce(position, '') || ' ' || coalesce(sec_short, '') || ' ' || coalesce(cc_name, ''))) gin_trgm_ops);
+
 -- Indexes for users
 CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
 CREATE INDEX IF NOT EXISTS idx_users_is_active ON users(is_active);
@@ -114,6 +121,7 @@ CREATE INDEX IF NOT EXISTS idx_meetings_created_at ON meetings(created_at);
 CREATE INDEX IF NOT EXISTS idx_registrations_meeting_id ON registrations(meeting_id);
 CREATE INDEX IF NOT EXISTS idx_registrations_emp_id ON registrations(emp_id);
 CREATE INDEX IF NOT EXISTS idx_registrations_registration_time ON registrations(registration_time);
+CREATE INDEX IF NOT EXISTS idx_registrations_meeting_time_id ON registrations(meeting_id, registration_time, id);  -- keyset pagination
 
 -- Indexes for otp_tokens
 CREATE INDEX IF NOT EXISTS idx_otp_tokens_email ON otp_tokens(email);
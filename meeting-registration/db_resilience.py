@@ -0,0 +1,273 @@
+# db_resilience.py
+"""
+Database retry with backoff and a circuit breaker
+
+เดิม model แต่ละตัวเขียน retry loop เอง (sleep 1, 2, 3 วินาที) ระหว่างที่ PostgreSQL ล่ม
+gunicorn sync worker ทุกตัวจึงติดอยู่ใน sleep และรับ request อื่นไม่ได้เลย
+
+Circuit breaker (หนึ่งตัวต่อ engine ต่อ worker) ครอบทุก query ผ่าน SQLAlchemy event:
+  closed     ปกติ นับ error ที่เกิดจากการเชื่อมต่อ (OperationalError) ติดกัน
+  open       error ติดกันครบ DATABASE_BREAKER_THRESHOLD - ทุก query/การเชื่อมต่อใหม่ raise
+             CircuitOpenError ทันทีโดยไม่แตะ database (app ตอบ 503 พร้อม Retry-After)
+  half_open  ครบ DATABASE_BREAKER_RESET_SECONDS แล้ว ให้ request เดียวลองก่อน
+             สำเร็จ = closed, ล้มเหลว = open อีกรอบ
+
+retry() / @with_retry ใช้กับ query อ่านที่ทำซ้ำได้ปลอดภัย: exponential (หรือ linear ตาม
+DATABASE_RETRY_BACKOFF) เริ่มที่ DATABASE_RETRY_DELAY สูงสุด DATABASE_MAX_RETRY_DELAY
+และสุ่ม (full jitter) เพื่อไม่ให้ทุก worker กลับมายิงพร้อมกัน ไม่ retry เมื่อ breaker เปิดแล้ว
+
+สถานะของ breaker ดูได้ที่ /api/metrics (database)
+"""
+
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import time
+from functools import wraps
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.exc import DisconnectionError, OperationalError, SQLAlchemyError
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+STATE_KEY = 'db_breaker'
+
+# error ที่แสดงว่า database ใช้งานไม่ได้ (ไม่ใช่ IntegrityError ฯลฯ ซึ่งเป็นปัญหาของข้อมูล)
+TRANSIENT_ERRORS = (OperationalError, DisconnectionError)
+
+
+class CircuitOpenError(SQLAlchemyError):
+    """The database circuit breaker is open; the query was not sent"""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"Database '{name}' circuit breaker is open (retry in {retry_after:.0f}s)")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Per-process breaker for one engine (นับเฉพาะ error ของการเชื่อมต่อ)"""
+
+    def __init__(self, name, threshold=5, reset_timeout=30):
+        self.name = name
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._trial_started = None
+        self._trial_thread = None
+        self._lock = threading.Lock()
+        self.counters = {'failures': 0, 'opened': 0, 'rejected': 0}
+
+    def retry_after(self):
+        """Seconds until the next trial request is allowed"""
+        if self.opened_at is None:
+            return 0
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a query may be sent now"""
+        if self.state == CLOSED:
+            return
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            if self.state == HALF_OPEN and threading.get_ident() == self._trial_thread:
+                return
+            # ครบเวลาแล้ว (หรือ request ที่ลองอยู่ค้างนานเกินไป) - ให้ request นี้ลองแทน
+            now = time.monotonic()
+            started = self.opened_at if self.state == OPEN else self._trial_started
+            if now - started >= self.reset_timeout:
+                if self.state == OPEN:
+                    self._transition(HALF_OPEN)
+                self._trial_started = now
+                self._trial_thread = threading.get_ident()
+                return
+            self.counters['rejected'] += 1
+            raise CircuitOpenError(self.name, self.retry_after())
+
+    def record_success(self):
+        if self.state == CLOSED and not self.failures:
+            return
+        with self._lock:
+            self.failures = 0
+            if self.state != CLOSED:
+                logger.info(f"Database '{self.name}' is reachable again, closing circuit breaker")
+                self._transition(CLOSED)
+
+    def record_failure(self, error):
+        with self._lock:
+            self.failures += 1
+            self.counters['failures'] += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.threshold):
+                logger.error(f"Opening database '{self.name}' circuit breaker for {self.reset_timeout}s "
+                             f"after {self.failures} consecutive errors: {error}")
+                self.counters['opened'] += 1
+                self._transition(OPEN)
+
+    def _transition(self, state):
+        self.state = state
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+        elif state == CLOSED:
+            self.opened_at = None
+        _publish_state(self)
+
+    def snapshot(self):
+        return {
+            'state': self.state,
+            'consecutive_failures': self.failures,
+            'retry_after': round(self.retry_after(), 1),
+            'threshold': self.threshold,
+            'reset_timeout': self.reset_timeout,
+            **self.counters,
+        }
+
+
+breakers = {}
+
+# จำนวนครั้งที่ retry() ต้องลองใหม่ใน process นี้
+stats = {'retries': 0}
+
+
+def _worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _publish_state(breaker):
+    """Record this worker's breaker state in Redis so /api/metrics can show every worker"""
+    from extensions import redis_store
+
+    try:
+        key = redis_store.key(STATE_KEY, breaker.name)
+        value = json.dumps({'state': breaker.state, 'since': int(time.time())})
+        pipe = redis_store.pipeline()
+        pipe.hset(key, _worker_id(), value)
+        pipe.expire(key, 86400)
+        pipe.execute()
+    except Exception as e:
+        # Redis ล่มพร้อมกันได้ - สถานะใน process ยังถูกต้อง
+        logger.debug(f"Cannot publish circuit breaker state: {e}")
+
+
+def _attach(engine, breaker):
+    @event.listens_for(engine, 'do_connect')
+    def before_connect(dialect, conn_rec, cargs, cparams):
+        # ไม่ต้องรอ connect_timeout ถ้ารู้อยู่แล้วว่า database ล่ม
+        breaker.before_call()
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        breaker.before_call()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        breaker.record_success()
+
+    @event.listens_for(engine, 'handle_error')
+    def handle_error(context):
+        # pre-ping ที่ล้มเหลวจะถูก reconnect โดย pool เอง
+        if context.is_pre_ping or isinstance(context.original_exception, CircuitOpenError):
+            return
+        if context.is_disconnect or isinstance(context.sqlalchemy_exception, TRANSIENT_ERRORS):
+            breaker.record_failure(context.original_exception)
+
+
+def init_app(app):
+    """Attach a circuit breaker to every engine of Flask-SQLAlchemy"""
+    from models import db
+
+    threshold = app.config.get('DATABASE_BREAKER_THRESHOLD', 5)
+    reset_timeout = app.config.get('DATABASE_BREAKER_RESET_SECONDS', 30)
+    with app.app_context():
+        for bind_key, engine in db.engines.items():
+            name = bind_key or 'primary'
+            breakers[name] = CircuitBreaker(name, threshold, reset_timeout)
+            _attach(engine, breakers[name])
+
+
+def backoff_delay(attempt):
+    """Sleep before retry number attempt + 1 (capped, full jitter)"""
+    config = current_app.config
+    base = config.get('DATABASE_RETRY_DELAY', 0.2)
+    cap = config.get('DATABASE_MAX_RETRY_DELAY', 2)
+    if config.get('DATABASE_RETRY_BACKOFF', 'exponential') == 'linear':
+        delay = base * (attempt + 1)
+    else:
+        delay = base * (2 ** attempt)
+    return random.uniform(0, min(cap, delay))
+
+
+def retry(func, *args, **kwargs):
+    """
+    Call func, retrying transient database errors (สำหรับ query อ่านเท่านั้น)
+
+    Raises:
+        CircuitOpenError ถ้า breaker เปิดอยู่ (ไม่ retry)
+        OperationalError ถ้ายังล้มเหลวครบ DATABASE_RETRY_COUNT ครั้ง
+    """
+    from models import db
+
+    attempts = max(1, current_app.config.get('DATABASE_RETRY_COUNT', 3))
+    for attempt in range(attempts):
+        try:
+            return func(*args, **kwargs)
+        except CircuitOpenError:
+            raise
+        except TRANSIENT_ERRORS as e:
+            try:
+                db.session.rollback()
+                db.session.remove()
+            except Exception:
+                pass
+            if attempt == attempts - 1:
+                logger.error(f"{func.__qualname__} failed after {attempts} attempts: {e}")
+                raise
+            delay = backoff_delay(attempt)
+            logger.warning(f"{func.__qualname__} database error on attempt {attempt + 1}, "
+                           f"retrying in {delay:.2f}s: {e}")
+            stats['retries'] += 1
+            time.sleep(delay)
+
+
+def with_retry(f):
+    """Decorator form of retry()"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        return retry(f, *args, **kwargs)
+    return decorated_function
+
+
+def get_metrics():
+    """
+    Breaker state per engine
+
+    Returns:
+        dict: retries ของ process นี้ และต่อ engine: worker (process นี้) กับ
+        cluster (สถานะล่าสุดของทุก worker ที่เคยเปลี่ยนสถานะ)
+    """
+    from extensions import redis_store
+
+    engines = {}
+    for name, breaker in breakers.items():
+        try:
+            raw = redis_store.hgetall(redis_store.key(STATE_KEY, name))
+            cluster = {_decode(worker): json.loads(value) for worker, value in raw.items()}
+        except Exception as e:
+            logger.warning(f"Cannot read circuit breaker states: {e}")
+            cluster = None
+        engines[name] = {'worker': breaker.snapshot(), 'cluster': cluster}
+    return {'pid': os.getpid(), 'retries': stats['retries'], 'engines': engines}
+
+
+def _decode(value):
+    return value.decode('utf-8') if isinstance(value, bytes) else value
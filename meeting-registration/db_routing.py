@@ -0,0 +1,204 @@
+# db_routing.py
+"""
+Optional read-replica routing
+
+ตั้ง REPLICA_DATABASE_URL แล้ว view ที่อ่านอย่างเดียว (สถิติ, export, รายชื่อผู้ลงทะเบียน,
+ค้นหาพนักงาน) จะอ่านจาก replica ผ่าน bind 'replica' ส่วนการลงทะเบียนและทุกอย่างที่ไม่ได้ระบุ
+ยังใช้ primary เหมือนเดิม:
+
+    @admin_bp.route('/statistics')
+    @use_replica
+    @login_required
+    def statistics(): ...
+
+กฎการเลือก engine (RoutingSession.get_bind):
+- ใช้ replica เฉพาะ request ที่ผ่าน @use_replica และเป็น SELECT (flush / INSERT / UPDATE / DELETE ไป primary)
+- replication lag ถูกวัดทุก REPLICA_LAG_CHECK_INTERVAL วินาทีต่อ worker ถ้าเกิน REPLICA_MAX_LAG_SECONDS
+  หรือวัดไม่ได้ (replica ล่ม / circuit breaker ของ replica เปิด) จะอ่านจาก primary แทน
+- ผู้ใช้ที่เพิ่งเขียนข้อมูล (เช่น ลบการลงทะเบียนแล้ว redirect กลับมาที่รายการ) อ่านจาก primary
+  ต่ออีก REPLICA_MAX_LAG_SECONDS เพื่อให้เห็นสิ่งที่ตัวเองเพิ่งแก้
+- โค้ดที่เติม cache ที่ใช้ร่วมกัน (meeting_cache รวม count_meetings, registration_stats, registered set,
+  employee directory และ count_employees, autocomplete ของ employee_search, estimate_count ของ
+  pagination, attendance_rollup) อ่านจาก primary เสมอด้วย `with primary():` / @on_primary
+"""
+
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import current_app, g, has_app_context, has_request_context, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+
+logger = logging.getLogger(__name__)
+
+REPLICA_BIND = 'replica'
+
+# flask session key: อ่านจาก primary จนถึงเวลานี้ (หลังผู้ใช้เขียนข้อมูล)
+PRIMARY_UNTIL_KEY = 'db_primary_until'
+
+LAG_SQL = text(
+    "SELECT CASE"
+    " WHEN NOT pg_is_in_recovery() THEN 0"
+    " WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+    " ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)"
+    " END"
+)
+
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session that sends SELECTs of @use_replica requests to the replica bind"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and _reading_replica() \
+                and not getattr(clause, 'is_dml', False):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _reading_replica():
+    return has_app_context() and g.get('db_read_replica', False) and not g.get('db_force_primary', 0)
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _track_writes(orm_execute_state):
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info['db_wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _track_flush(db_session, flush_context):
+    db_session.info['db_wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _read_your_writes(db_session):
+    if not db_session.info.pop('db_wrote', False):
+        return
+    if has_request_context() and is_enabled():
+        session[PRIMARY_UNTIL_KEY] = time.time() + current_app.config.get('REPLICA_MAX_LAG_SECONDS', 10)
+
+
+def is_enabled():
+    from models import db
+
+    return REPLICA_BIND in db.engines
+
+
+class _LagMonitor:
+    """Per-worker replication lag, measured at most every REPLICA_LAG_CHECK_INTERVAL seconds"""
+
+    def __init__(self):
+        self.lag = None
+        self.error = None
+        self.checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def current(self):
+        """Lag in seconds, or None if the replica cannot be reached"""
+        interval = current_app.config.get('REPLICA_LAG_CHECK_INTERVAL', 5)
+        if time.monotonic() - self.checked_at < interval:
+            return self.lag
+        # thread อื่นกำลังวัดอยู่ - ใช้ค่าเดิม
+        if not self._lock.acquire(blocking=False):
+            return self.lag
+        try:
+            self.lag, self.error = self._measure(), None
+        except Exception as e:
+            logger.warning(f"Cannot measure replica lag, reading from primary: {e}")
+            self.lag, self.error = None, str(e)
+        finally:
+            self.checked_at = time.monotonic()
+            self._lock.release()
+        return self.lag
+
+    @staticmethod
+    def _measure():
+        from models import db
+
+        engine = db.engines[REPLICA_BIND]
+        with engine.connect() as conn:
+            if engine.dialect.name != 'postgresql':
+                conn.execute(text('SELECT 1'))
+                return 0.0
+            return float(conn.execute(LAG_SQL).scalar() or 0)
+
+
+lag_monitor = _LagMonitor()
+
+# การตัดสินใจของ @use_replica ใน process นี้
+stats = Counter()
+
+
+def replica_available():
+    """
+    Decide whether the current request may read from the replica
+
+    Returns:
+        True ถ้าใช้ replica ได้ (นับเหตุผลที่ไม่ได้ใช้ไว้ใน stats)
+    """
+    if not is_enabled():
+        return False
+    if has_request_context() and session.get(PRIMARY_UNTIL_KEY, 0) > time.time():
+        stats['primary_recent_write'] += 1
+        return False
+
+    lag = lag_monitor.current()
+    if lag is None:
+        stats['primary_unavailable'] += 1
+        return False
+    if lag > current_app.config.get('REPLICA_MAX_LAG_SECONDS', 10):
+        stats['primary_lagging'] += 1
+        return False
+
+    stats['replica'] += 1
+    return True
+
+
+def use_replica(f):
+    """View decorator: read-only request, SELECTs may go to the replica"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        g.db_read_replica = replica_available()
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+@contextmanager
+def primary():
+    """Force reads in this block to the primary (เช่น ข้อมูลที่จะเก็บลง cache ที่ใช้ร่วมกัน)"""
+    if not has_app_context():
+        yield
+        return
+    g.db_force_primary = g.get('db_force_primary', 0) + 1
+    try:
+        yield
+    finally:
+        g.db_force_primary -= 1
+
+
+def on_primary(f):
+    """Decorator form of primary()"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        with primary():
+            return f(*args, **kwargs)
+    return decorated_function
+
+
+def get_metrics():
+    """Replica routing state of this worker"""
+    if not is_enabled():
+        return {'enabled': False}
+    return {
+        'enabled': True,
+        'lag_seconds': lag_monitor.lag,
+        'max_lag_seconds': current_app.config.get('REPLICA_MAX_LAG_SECONDS', 10),
+        'error': lag_monitor.error,
+        'requests': dict(stats),
+    }
@@ -0,0 +1,178 @@
+# employee_directory.py
+"""
+In-process employee directory index
+
+สร้าง index ของตาราง employees ไว้ในหน่วยความจำของแต่ละ worker
+เพื่อให้ Employee.search_by_id ค้นหาได้ด้วย dict lookup โดยไม่ต้องยิง SELECT
+ทุกครั้งที่มีการสแกน QR
+
+Index จะถูกสร้างใหม่เมื่อ version stamp ใน cache เปลี่ยน
+(import_data.py จะเรียก bump_directory_version() หลัง import เสร็จ)
+"""
+
+import logging
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+from flask import current_app
+
+from db_routing import on_primary, primary
+from extensions import cache
+from tiered_cache import tiered_cache
+
+logger = logging.getLogger(__name__)
+
+DIRECTORY_VERSION_KEY = 'employee_directory_version'
+
+_RECORD_FIELDS = ('emp_id', 'emp_name', 'position', 'sec_short', 'cc_name')
+
+
+class EmployeeRecord(namedtuple('EmployeeRecord', _RECORD_FIELDS)):
+    """Compact read-only employee record (same public fields as Employee.to_dict)"""
+    __slots__ = ()
+
+    def to_dict(self):
+        return self._asdict()
+
+
+class EmployeeDirectory:
+    """Per-worker employee index keyed by every normalized form of emp_id"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_id = {}
+        self._by_stripped = {}
+        self._version = None
+        self._checked_at = 0.0
+
+    @staticmethod
+    def current_version():
+        """Read the shared version stamp (None if it has never been bumped)"""
+        try:
+            return tiered_cache.get(DIRECTORY_VERSION_KEY)
+        except Exception as e:
+            logger.warning(f"Cannot read employee directory version: {e}")
+            return None
+
+    @on_primary
+    def _build(self, version):
+        """Load employees table into memory"""
+        from models import db, Employee
+
+        rows = db.session.query(
+            Employee.emp_id,
+            Employee.emp_name,
+            Employee.position,
+            Employee.sec_short,
+            Employee.cc_name
+        ).filter(Employee.deleted_at.is_(None)).all()
+
+        by_id = {}
+        for row in rows:
+            by_id[row.emp_id] = EmployeeRecord(*row)
+
+        # stripped form -> (record, matched_by_padding)
+        # ลำดับความสำคัญเหมือน search_by_id: ตัด 0 ข้างหน้า ก่อน เติม 0 ให้ครบ 8 หลัก
+        by_stripped = {}
+        for emp_id, record in by_id.items():
+            stripped = emp_id.lstrip('0')
+            if emp_id == stripped and len(stripped) >= 6:
+                by_stripped[stripped] = (record, False)
+        for emp_id, record in by_id.items():
+            stripped = emp_id.lstrip('0')
+            if len(emp_id) == 8 and stripped not in by_stripped:
+                by_stripped[stripped] = (record, True)
+
+        self._by_id = by_id
+        self._by_stripped = by_stripped
+        self._version = version
+        logger.info(f"Employee directory built: {len(by_id)} employees (version {version})")
+
+    def _ensure_fresh(self):
+        """Rebuild the index if the shared version stamp has moved"""
+        interval = current_app.config.get('EMPLOYEE_DIRECTORY_CHECK_INTERVAL', 30)
+        now = time.monotonic()
+        if self._checked_at and now - self._checked_at < interval:
+            return
+
+        version = self.current_version()
+        with self._lock:
+            if not self._checked_at or version != self._version:
+                self._build(version)
+            self._checked_at = now
+
+    def lookup(self, emp_id):
+        """
+        Find employee using the same rules as Employee.search_by_id
+
+        Returns:
+            EmployeeRecord or None
+        """
+        self._ensure_fresh()
+
+        emp_id = str(emp_id).strip()
+
+        record = self._by_id.get(emp_id)
+        if record:
+            return record
+
+        match = self._by_stripped.get(emp_id.lstrip('0'))
+        if match:
+            record, matched_by_padding = match
+            # การเติม 0 ใช้ได้เฉพาะรหัสที่สั้นกว่า 8 หลัก
+            if not matched_by_padding or len(emp_id) < 8:
+                return record
+
+        return None
+
+    def count(self):
+        """Number of (non-deleted) employees in the directory"""
+        self._ensure_fresh()
+        return len(self._by_id)
+
+    def invalidate(self):
+        """Force rebuild on next lookup in this worker"""
+        with self._lock:
+            self._checked_at = 0.0
+
+
+directory = EmployeeDirectory()
+
+
+def bump_directory_version():
+    """Tell every worker to rebuild its employee directory"""
+    version = uuid.uuid4().hex
+    tiered_cache.set(DIRECTORY_VERSION_KEY, version, timeout=0)
+    directory.invalidate()
+    return version
+
+
+def count_employees():
+    """
+    Number of non-deleted employees (ใช้ใน admin dashboard)
+
+    ใช้ directory ถ้าเปิดใช้งาน ไม่เช่นนั้น cache ผล count ตาม version ของ directory
+    ซึ่งเปลี่ยนทุกครั้งที่ import พนักงาน
+    """
+    if current_app.config.get('EMPLOYEE_DIRECTORY_ENABLED'):
+        return directory.count()
+
+    from models import Employee
+
+    key = f'employee_count:{EmployeeDirectory.current_version()}'
+    try:
+        count = cache.get(key)
+        if count is not None:
+            return count
+    except Exception as e:
+        logger.warning(f"Cannot read employee count: {e}")
+
+    with primary():
+        count = Employee.query.filter(Employee.deleted_at.is_(None)).count()
+    try:
+        cache.set(key, count, timeout=3600)
+    except Exception as e:
+        logger.warning(f"Cannot cache employee count: {e}")
+    return count
@@ -0,0 +1,471 @@
+# employee_import.py
+"""
+Employee CSV parsing and bulk merge (ใช้โดย import_data.py)
+
+Bulk mode:
+1. อ่าน CSV และ normalize ทีละแถว แล้วส่งเข้า temporary staging table ด้วย
+   COPY FROM STDIN (ไม่ query ทีละแถว)
+2. merge จาก staging เข้า employees ด้วย INSERT ... ON CONFLICT (emp_id) DO UPDATE
+   คำสั่งเดียวใน transaction เดียว
+
+แต่ละแถวมี content_hash ของข้อมูลจากไฟล์ แถวที่ hash ตรงกับใน database
+จะถูกกรองออกก่อน INSERT จึงไม่มีการเขียน (ไม่มี row lock, trigger หรือ WAL)
+พนักงานที่ไม่อยู่ในไฟล์สามารถ soft delete ได้ (deleted_at) แต่จะถูกปฏิเสธทั้งรอบ
+(SoftDeleteRefused) ถ้ามีแถวที่ไม่ผ่านการตรวจสอบ หรือไฟล์มีพนักงานน้อยกว่า
+SOFT_DELETE_MIN_FRACTION ของพนักงานปัจจุบัน (ไฟล์ว่าง/ถูกตัด) เว้นแต่ระบุ force
+
+ไฟล์ขนาดใหญ่สามารถ parse/normalize แบบขนานได้ (workers > 1) โดยแบ่งไฟล์เป็นช่วง byte
+ตามขอบบรรทัด แต่ละช่วงถูกประมวลผลใน process pool และส่งต่อให้ COPY ตามลำดับเดิม
+"""
+
+import csv
+import hashlib
+import io
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# (field ใน Employee model, ชื่อคอลัมน์ใน CSV ของ HR)
+CSV_COLUMNS = (
+    ('emp_id', 'emp_id'),
+    ('emp_name', 'emp_name'),
+    ('position', 'position'),
+    ('section_code', 'รหัสส่วน'),
+    ('sec_short', 'sec_short'),
+    ('section_full', 'ส่วนเต็ม'),
+    ('department_code', 'รหัสฝ่าย'),
+    ('department_short', 'ฝ่ายย่อ'),
+    ('department_full', 'ฝ่ายเต็ม'),
+    ('group_code', 'รหัสกลุ่ม'),
+    ('group_short', 'กลุ่มย่อ'),
+    ('group_full', 'กลุ่มเต็ม'),
+    ('division_code', 'รหัสสายงาน'),
+    ('division_short', 'สายงานย่อ'),
+    ('division_full', 'สายงานเต็ม'),
+    ('cost_center_code', 'ศูนย์ต้นทุน'),
+    ('cc_name', 'cc_name'),
+)
+
+EMPLOYEE_FIELDS = tuple(field for field, _ in CSV_COLUMNS)
+
+# คอลัมน์ที่ส่งเข้า staging table
+STAGED_FIELDS = EMPLOYEE_FIELDS + ('content_hash',)
+
+STAGING_TABLE = 'employees_staging'
+
+# soft delete ต้องมีพนักงานในไฟล์อย่างน้อยสัดส่วนนี้ของพนักงานปัจจุบัน
+SOFT_DELETE_MIN_FRACTION = 0.9
+
+
+class SoftDeleteRefused(Exception):
+    """The file looks incomplete; soft delete would remove employees by mistake"""
+
+    def __init__(self, reason, missing, active):
+        super().__init__(f"Refusing to soft delete {missing} of {active} active employees: {reason}")
+        self.missing = missing
+        self.active = active
+
+_max_lengths = None
+
+
+def max_lengths():
+    """VARCHAR lengths of the employees table (ตรวจสอบก่อนเขียนเพื่อรายงานเป็น Row N:)"""
+    global _max_lengths
+    if _max_lengths is None:
+        from models import Employee
+        _max_lengths = {
+            column.name: column.type.length
+            for column in Employee.__table__.columns
+            if column.name in EMPLOYEE_FIELDS and getattr(column.type, 'length', None)
+        }
+    return _max_lengths
+
+
+def content_hash(record):
+    """Hash of the imported fields (เปลี่ยนเมื่อข้อมูลใดๆ จากไฟล์ HR เปลี่ยน)"""
+    raw = '\x1f'.join(record[field] for field in EMPLOYEE_FIELDS)
+    return hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+
+def normalize_row(row, lengths=None):
+    """
+    Map a CSV row to Employee fields
+
+    Args:
+        row: dict จาก csv.DictReader
+        lengths: ขนาดคอลัมน์ (default: max_lengths())
+
+    Returns:
+        dict ของ field -> ค่า (strip แล้ว) รวม content_hash หรือ None ถ้าไม่มี emp_id
+
+    Raises:
+        ValueError ถ้าค่ายาวเกินขนาดคอลัมน์
+    """
+    emp_id = (row.get('emp_id') or '').strip()
+    if not emp_id:
+        return None
+
+    record = {field: (row.get(header) or '').strip() for field, header in CSV_COLUMNS}
+
+    for field, length in (lengths or max_lengths()).items():
+        if len(record[field]) > length:
+            raise ValueError(f"{field} longer than {length} characters")
+
+    record['content_hash'] = content_hash(record)
+    return record
+
+
+def iter_csv_records(csv_file, errors, workers=1):
+    """
+    Yield (row_num, record) for every valid row of the CSV, in file order
+
+    แถวที่ไม่ผ่านการตรวจสอบจะถูกเพิ่มใน errors เป็น "Row N: ..." และข้ามไป
+
+    Args:
+        workers: จำนวน process สำหรับ parse/normalize (มากกว่า 1 = แบ่งไฟล์เป็นช่วง byte)
+    """
+    if workers > 1:
+        yield from _iter_csv_records_parallel(csv_file, errors, workers)
+        return
+
+    with open(csv_file, 'r', encoding='utf-8-sig', newline='') as file:
+        reader = csv.DictReader(file)
+
+        if reader.fieldnames:
+            logger.info(f"Found columns: {', '.join(reader.fieldnames[:5])}...")
+
+        yield from _normalize_rows(reader, errors, 2)
+
+
+def _normalize_rows(reader, errors, first_row_num, lengths=None):
+    for row_num, row in enumerate(reader, start=first_row_num):
+        try:
+            record = normalize_row(row, lengths)
+        except ValueError as e:
+            errors.append(f"Row {row_num}: {e}")
+            continue
+        if record is not None:
+            yield row_num, record
+
+
+class MultilineRecordError(Exception):
+    """A quoted field spans several lines, so the file cannot be split at line boundaries"""
+
+
+# ขนาดขั้นต่ำของแต่ละช่วง byte ที่ส่งให้ worker
+MIN_CHUNK_BYTES = 1024 * 1024
+
+
+def _chunk_ranges(csv_file, workers):
+    """
+    Split the file (after the header line) into byte ranges that start at line boundaries
+
+    Returns:
+        (fieldnames, [(start, end), ...])
+    """
+    with open(csv_file, 'rb') as file:
+        header_line = file.readline()
+        data_start = file.tell()
+        file.seek(0, os.SEEK_END)
+        size = file.tell()
+
+        fieldnames = next(csv.reader([header_line.decode('utf-8-sig')]))
+
+        # แบ่งมากกว่าจำนวน worker เพื่อให้กระจายงานได้สม่ำเสมอ
+        chunk_size = max(MIN_CHUNK_BYTES, (size - data_start) // (workers * 4) + 1)
+
+        ranges = []
+        start = data_start
+        while start < size:
+            file.seek(min(start + chunk_size, size))
+            file.readline()  # ขยับไปต้นบรรทัดถัดไป
+            end = min(file.tell(), size)
+            ranges.append((start, end))
+            start = end
+
+    return fieldnames, ranges
+
+
+def parse_chunk(csv_file, start, end, fieldnames, lengths):
+    """
+    Parse and normalize one byte range (runs in a worker process)
+
+    Returns:
+        (row_count, [(index, record), ...], [(index, message), ...])
+        index นับจาก 0 ภายในช่วงนี้ (process หลักแปลงเป็นเลขแถวจริง)
+    """
+    with open(csv_file, 'rb') as file:
+        file.seek(start)
+        text = file.read(end - start).decode('utf-8')
+
+    lines = io.StringIO(text, newline='').readlines()
+    # ช่วงใดมี field ที่ขึ้นบรรทัดใหม่ จะมีบรรทัดที่มี " เป็นจำนวนคี่ (รวมถึงช่วงที่ถูกตัดกลาง field)
+    if '"' in text and any(line.count('"') % 2 for line in lines):
+        raise MultilineRecordError()
+
+    records = []
+    errors = []
+    row_count = 0
+    for index, row in enumerate(csv.DictReader(lines, fieldnames=fieldnames)):
+        row_count += 1
+        try:
+            record = normalize_row(row, lengths)
+        except ValueError as e:
+            errors.append((index, str(e)))
+            continue
+        if record is not None:
+            records.append((index, record))
+
+    return row_count, records, errors
+
+
+def _iter_from_offset(csv_file, offset, fieldnames, errors, first_row_num, lengths):
+    """Sequentially parse the rest of the file starting at a record boundary"""
+    with open(csv_file, 'rb') as raw:
+        raw.seek(offset)
+        with io.TextIOWrapper(raw, encoding='utf-8', newline='') as file:
+            reader = csv.DictReader(file, fieldnames=fieldnames)
+            yield from _normalize_rows(reader, errors, first_row_num, lengths)
+
+
+def _iter_csv_records_parallel(csv_file, errors, workers):
+    """Parse byte-range chunks in a process pool and yield records in file order"""
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+
+    fieldnames, ranges = _chunk_ranges(csv_file, workers)
+    logger.info(f"Found columns: {', '.join(fieldnames[:5])}...")
+    logger.info(f"Parsing {len(ranges)} chunks with {workers} workers")
+
+    lengths = max_lengths()
+    next_row_num = 2
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # ส่งงานล่วงหน้าแค่บางส่วน เพื่อไม่ให้ผลลัพธ์ค้างใน memory ทั้งไฟล์
+        pending = deque()
+        remaining = iter(ranges)
+        for start, end in remaining:
+            pending.append((start, executor.submit(parse_chunk, csv_file, start, end, fieldnames, lengths)))
+            if len(pending) >= workers * 2:
+                break
+
+        while pending:
+            start = pending[0][0]
+            try:
+                row_count, records, chunk_errors = pending.popleft()[1].result()
+            except MultilineRecordError:
+                # ช่วงก่อนหน้าจบที่ขอบ record เสมอ จึงอ่านต่อจาก start แบบ process เดียวได้
+                for _, future in pending:
+                    future.cancel()
+                logger.info("CSV has quoted multi-line fields, parsing the rest in a single process")
+                yield from _iter_from_offset(csv_file, start, fieldnames, errors, next_row_num, lengths)
+                return
+
+            next_range = next(remaining, None)
+            if next_range:
+                pending.append((next_range[0], executor.submit(parse_chunk, csv_file, *next_range, fieldnames, lengths)))
+
+            for index, message in chunk_errors:
+                errors.append(f"Row {next_row_num + index}: {message}")
+            for index, record in records:
+                yield next_row_num + index, record
+
+            next_row_num += row_count
+
+
+class CopyStream(io.RawIOBase):
+    """
+    File-like object that renders records as CSV on demand for COPY FROM STDIN
+
+    ทุกค่าถูก quote เพื่อให้ค่าว่างเป็น '' (ไม่ใช่ NULL) เหมือนการ import แบบเดิม
+    """
+
+    def __init__(self, records, fields):
+        self.records = iter(records)
+        self.fields = fields
+        self.buffer = b''
+        self.line = io.StringIO()
+        self.writer = csv.writer(self.line, quoting=csv.QUOTE_ALL, lineterminator='\n')
+        self.count = 0
+
+    def readable(self):
+        return True
+
+    def _next_line(self):
+        row_num, record = next(self.records)
+        self.count += 1
+        self.line.seek(0)
+        self.line.truncate()
+        self.writer.writerow([row_num] + [record[field] for field in self.fields])
+        return self.line.getvalue().encode('utf-8')
+
+    def read(self, size=-1):
+        try:
+            while size < 0 or len(self.buffer) < size:
+                self.buffer += self._next_line()
+        except StopIteration:
+            pass
+
+        if size < 0:
+            data, self.buffer = self.buffer, b''
+        else:
+            data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    def readline(self, size=-1):
+        return self.read(size)
+
+
+def copy_to_staging(session, records):
+    """
+    Create the staging table and COPY records into it
+
+    Returns:
+        จำนวนแถวที่ COPY
+    """
+    from sqlalchemy import text
+
+    columns = ', '.join(STAGED_FIELDS)
+    session.execute(text(
+        f"CREATE TEMP TABLE {STAGING_TABLE} ON COMMIT DROP AS "
+        f"SELECT {columns} FROM employees WITH NO DATA"
+    ))
+    session.execute(text(f"ALTER TABLE {STAGING_TABLE} ADD COLUMN row_num integer"))
+
+    stream = CopyStream(records, STAGED_FIELDS)
+    cursor = session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {STAGING_TABLE} (row_num, {columns}) FROM STDIN WITH (FORMAT csv)",
+            stream
+        )
+    finally:
+        cursor.close()
+
+    # temp table ไม่มี statistics จนกว่าจะ ANALYZE (ช่วยให้เลือก hash join ตอน merge)
+    session.execute(text(f"ANALYZE {STAGING_TABLE}"))
+    return stream.count
+
+
+def check_soft_delete(total, active, missing, errors=(), force=False):
+    """
+    Raise SoftDeleteRefused unless it is safe to soft delete `missing` employees
+
+    Args:
+        total: จำนวนพนักงาน (emp_id ไม่ซ้ำ) ในไฟล์
+        active: จำนวนพนักงานที่ยังไม่ถูกลบใน database ก่อน import
+        missing: จำนวนพนักงานที่จะถูก soft delete
+        errors: แถวที่ไม่ผ่านการตรวจสอบ (พนักงานเหล่านั้นจะถูกลบถ้าไม่ปฏิเสธ)
+        force: ยอมให้ไฟล์มีพนักงานน้อยกว่า SOFT_DELETE_MIN_FRACTION (ไม่รวมกรณีมี errors)
+    """
+    if not missing:
+        return
+    if errors:
+        raise SoftDeleteRefused(f"{len(errors)} rows failed validation", missing, active)
+    if force:
+        return
+    if total == 0:
+        raise SoftDeleteRefused("the file has no employee rows", missing, active)
+    if total < active * SOFT_DELETE_MIN_FRACTION:
+        raise SoftDeleteRefused(
+            f"the file has {total} employees, fewer than {SOFT_DELETE_MIN_FRACTION:.0%} of the current ones",
+            missing, active
+        )
+
+
+def merge_staging(session, soft_delete=False, errors=(), force=False):
+    """
+    Merge staging rows into employees in a single statement
+
+    - แถวที่ content_hash ตรงกับใน database (และไม่ถูก soft delete) ถูกข้าม
+    - ถ้า emp_id ซ้ำในไฟล์ จะใช้แถวสุดท้าย (เหมือนการ import แบบเดิม)
+    - พนักงานที่ถูก soft delete ไปแล้วและกลับมาอยู่ในไฟล์จะถูกคืนสถานะ
+
+    Args:
+        soft_delete: ตั้ง deleted_at ให้พนักงานที่ไม่อยู่ในไฟล์ (ตรวจด้วย check_soft_delete ก่อน)
+        errors, force: ส่งต่อให้ check_soft_delete
+
+    Returns:
+        (imported, updated, unchanged, missing) - missing คือจำนวนพนักงานที่ไม่อยู่ในไฟล์
+        (ถูก soft delete ในรอบนี้ถ้า soft_delete=True)
+
+    Raises:
+        SoftDeleteRefused ก่อนเขียนข้อมูลใดๆ
+    """
+    from sqlalchemy import text
+
+    columns = ', '.join(STAGED_FIELDS)
+    assignments = ', '.join(f"{field} = EXCLUDED.{field}" for field in STAGED_FIELDS if field != 'emp_id')
+
+    total = session.execute(text(f"SELECT count(DISTINCT emp_id) FROM {STAGING_TABLE}")).scalar()
+
+    missing_filter = f"""
+        deleted_at IS NULL
+        AND NOT EXISTS (SELECT 1 FROM {STAGING_TABLE} s WHERE s.emp_id = employees.emp_id)
+    """
+    if soft_delete:
+        active = session.execute(text("SELECT count(*) FROM employees WHERE deleted_at IS NULL")).scalar()
+        missing = session.execute(text(f"SELECT count(*) FROM employees WHERE {missing_filter}")).scalar()
+        check_soft_delete(total, active, missing, errors, force)
+
+    result = session.execute(text(f"""
+        INSERT INTO employees ({columns}, created_at, updated_at, deleted_at)
+        SELECT {columns}, now() AT TIME ZONE 'utc', now() AT TIME ZONE 'utc', NULL
+        FROM (
+            SELECT DISTINCT ON (emp_id) {columns}
+            FROM {STAGING_TABLE}
+            ORDER BY emp_id, row_num DESC
+        ) AS incoming
+        WHERE NOT EXISTS (
+            SELECT 1 FROM employees existing
+            WHERE existing.emp_id = incoming.emp_id
+              AND existing.content_hash = incoming.content_hash
+              AND existing.deleted_at IS NULL
+        )
+        ON CONFLICT (emp_id) DO UPDATE SET {assignments}, updated_at = EXCLUDED.updated_at, deleted_at = NULL
+        RETURNING (xmax = 0) AS inserted
+    """)).fetchall()
+
+    imported = sum(1 for row in result if row.inserted)
+    updated = len(result) - imported
+
+    if soft_delete:
+        missing = session.execute(text(
+            f"UPDATE employees SET deleted_at = now() AT TIME ZONE 'utc' WHERE {missing_filter}"
+        )).rowcount
+    else:
+        missing = session.execute(text(f"SELECT count(*) FROM employees WHERE {missing_filter}")).scalar()
+
+    return imported, updated, total - len(result), missing
+
+
+def bulk_import(session, records, soft_delete=False, errors=(), force=False, before_commit=None):
+    """
+    COPY + merge in one transaction
+
+    Args:
+        errors: list ที่ iter_csv_records เติม (ตรวจหลัง COPY ก่อน soft delete)
+        force: ดู check_soft_delete
+        before_commit: เรียกด้วย dict ผลลัพธ์ก่อน commit (เช่น แสดงจำนวนที่จะถูก soft delete)
+
+    Returns:
+        dict(imported, updated, unchanged, missing, copied)
+
+    Raises:
+        SoftDeleteRefused (rollback แล้ว ไม่มีการเปลี่ยนแปลง)
+    """
+    try:
+        copied = copy_to_staging(session, records)
+        imported, updated, unchanged, missing = merge_staging(session, soft_delete=soft_delete,
+                                                              errors=errors, force=force)
+        result = {'imported': imported, 'updated': updated, 'unchanged': unchanged,
+                  'missing': missing, 'copied': copied}
+        if before_commit is not None:
+            before_commit(result)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+    return result
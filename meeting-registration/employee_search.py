@@ -0,0 +1,264 @@
+# employee_search.py
+"""
+Employee search for admin listing and autocomplete
+
+ค้นหาจาก "search document" เดียว (รหัส ชื่อ ตำแหน่ง ส่วนงาน ศูนย์ต้นทุน ต่อกันเป็นตัวเล็ก)
+ด้วย LIKE '%คำ%' ทุกคำ (AND) บน PostgreSQL ที่มี pg_trgm จะใช้ GIN trigram index
+(idx_employees_search_trgm สร้างโดย fix_database.py) และเรียงด้วย similarity()
+
+ใช้ trigram แทน full-text เพราะ parser ของ PostgreSQL ไม่ตัดคำภาษาไทย (ไม่มีช่องว่างระหว่างคำ)
+ส่วนคำค้นจะถูก normalize แบบภาษาไทยก่อน (เลขไทย คำนำหน้าชื่อ สระที่พิมพ์ผิดรูป)
+
+คำนำหน้าชื่อ: คำที่เป็นคำนำหน้าทั้งคำ (นาย, mr., miss) ถูกตัดทิ้ง, คำย่อที่มีจุด (น.ส., ด.ช.)
+ถูกตัดออกจากชื่อที่พิมพ์ติดกัน ส่วน นาย/นาง/นางสาว ที่พิมพ์ติดกับคำอื่นอาจเป็นคำจริง (นายก, นางรอง)
+จึงค้นทั้งคำเดิม หรือชื่อ/นามสกุลที่ขึ้นต้นด้วยคำที่เหลือ - คำนำหน้าภาษาอังกฤษไม่ถูกตัดจากกลางคำ
+
+SQLite (TestingConfig) และ PostgreSQL ที่ไม่มี pg_trgm ใช้ query เดียวกันแต่ไม่มี index/similarity
+"""
+
+import hashlib
+import logging
+import re
+import unicodedata
+
+from sqlalchemy import Float, and_, case, cast, func, literal_column, or_, text
+from sqlalchemy.orm import with_expression
+
+from db_routing import primary
+from pagination import keyset_paginate
+
+logger = logging.getLogger(__name__)
+
+# ต้องตรงกับ expression ของ index ใน fix_database.py / database_schema.sql
+SEARCH_DOCUMENT_SQL = (
+    "lower(coalesce(emp_id, '') || ' ' || coalesce(emp_name, '') || ' ' || "
+    "coalesce(position, '') || ' ' || coalesce(sec_short, '') || ' ' || coalesce(cc_name, ''))"
+)
+
+# จำนวนผลลัพธ์ต่อหน้าของการค้นหาในหน้า admin (เรียงตามความตรง)
+SEARCH_PAGE_SIZE = 50
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_CACHE_TIMEOUT = 60
+
+# คำนำหน้าชื่อ (เรียงจากยาวไปสั้น เพื่อให้ "นางสาว" ถูกตัดก่อน "นาง")
+THAI_TITLES = (
+    'ว่าที่ร้อยตรี', 'ว่าที่ร.ต.', 'นางสาว', 'น.ส.', 'ด.ช.', 'ด.ญ.', 'นาย', 'นาง', 'ดร.',
+)
+# ตัดเฉพาะเมื่อพิมพ์แยกเป็นคำ ("miss" อยู่ใน "mission")
+ENGLISH_TITLES = ('mrs.', 'mrs', 'miss', 'mr.', 'mr', 'ms.', 'ms', 'dr.', 'dr')
+
+# ส่วนที่เหลือหลัง นาย/นาง ที่สั้นกว่านี้ไม่ถือเป็นชื่อ ("นายก" ไม่ใช่ "นาย" + "ก")
+MIN_NAME_LENGTH = 2
+
+_THAI_DIGITS = str.maketrans('๐๑๒๓๔๕๖๗๘๙', '0123456789')
+_ZERO_WIDTH = re.compile('[\u200b\u200c\u200d\ufeff]')
+
+_trigram_available = {}
+
+
+def _is_title(term):
+    return term in THAI_TITLES or term in ENGLISH_TITLES or term + '.' in THAI_TITLES
+
+
+def _split_title(term):
+    """(title, rest) ถ้า term ขึ้นต้นด้วยคำนำหน้าภาษาไทยที่มีชื่อต่อท้าย"""
+    for title in THAI_TITLES:
+        if term.startswith(title) and len(term) > len(title):
+            return title, term[len(title):]
+    return None
+
+
+def _strip_title(term):
+    """Drop a standalone title, or a dotted Thai title typed together with the name"""
+    if _is_title(term):
+        return ''
+    split = _split_title(term)
+    # คำย่อที่ลงท้ายด้วยจุดไม่ใช่ส่วนหนึ่งของคำจริง ส่วน นาย/นาง ต้องตัดสินตอนค้น (name_after_title)
+    if split is not None and split[0].endswith('.'):
+        return split[1]
+    return term
+
+
+def name_after_title(term):
+    """
+    Name part of a term like "นายสมชาย" (None ถ้าไม่ขึ้นต้นด้วย นาย/นาง/นางสาว หรือส่วนที่เหลือสั้นเกินไป)
+
+    คำเหล่านี้ค้นได้ทั้งแบบคำเดิม ("นางรอง") และชื่อที่ขึ้นต้นด้วยส่วนที่เหลือ ("สมชาย")
+    """
+    split = _split_title(term)
+    if split is None or len(split[1]) < MIN_NAME_LENGTH:
+        return None
+    return split[1]
+
+
+def normalize_query(query):
+    """
+    Split a search string into normalized terms
+
+    - เลขไทยเป็นเลขอารบิก, ตัด zero-width space
+    - "เเ" (เ สองตัว) เป็น "แ", "ํา" เป็น "ำ"
+    - ตัดคำนำหน้าชื่อที่พิมพ์แยก (นาย, mr.) และคำย่อที่พิมพ์ติดกับชื่อ (น.ส.สมหญิง)
+      นาย/นาง/นางสาว ที่ติดกับชื่อยังอยู่ในคำค้น (ดู name_after_title)
+
+    Returns:
+        list ของคำค้น (ตัวเล็ก) - ว่างถ้าไม่มีคำที่ใช้ค้นได้
+    """
+    query = unicodedata.normalize('NFC', query or '')
+    query = _ZERO_WIDTH.sub('', query).translate(_THAI_DIGITS)
+    query = query.replace('เเ', 'แ').replace('ํา', 'ำ').lower()
+
+    terms = []
+    for term in query.split():
+        term = _strip_title(term)
+        if term:
+            terms.append(term)
+    return terms
+
+
+def _escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def has_trigram():
+    """Whether pg_trgm is installed in the current database (checked once per process)"""
+    from models import db
+
+    engine = db.engine
+    if engine.dialect.name != 'postgresql':
+        return False
+
+    key = str(engine.url)
+    if key not in _trigram_available:
+        try:
+            _trigram_available[key] = db.session.execute(
+                text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            ).scalar() is not None
+        except Exception as e:
+            logger.warning(f"Cannot check pg_trgm extension: {e}")
+            return False
+    return _trigram_available[key]
+
+
+def filtered_query(terms):
+    """Employee query matching every term (ไม่รวมพนักงานที่ถูก soft delete)"""
+    from models import Employee
+
+    document = literal_column(f"({SEARCH_DOCUMENT_SQL})")
+    query = Employee.query.filter(Employee.deleted_at.is_(None))
+    for term in terms:
+        condition = document.like(f"%{_escape_like(term)}%", escape='\\')
+        name = name_after_title(term)
+        if name is not None:
+            # "นายสมชาย" = คำเดิม หรือชื่อ/นามสกุลที่ขึ้นต้นด้วย "สมชาย"
+            # (เงื่อนไขบน document ทำให้ทั้งสองทางยังใช้ trigram index ได้)
+            escaped = _escape_like(name)
+            emp_name = func.lower(Employee.emp_name)
+            condition = or_(condition, and_(
+                document.like(f"%{escaped}%", escape='\\'),
+                or_(emp_name.like(f"{escaped}%", escape='\\'), emp_name.like(f"% {escaped}%", escape='\\'))
+            ))
+        query = query.filter(condition)
+    return query
+
+
+def _ranking(terms):
+    """
+    Sort key expressions of a search, all ascending
+
+    ลำดับ: รหัสตรงทั้งหมด (รวมแบบเติม/ตัด 0) > รหัสขึ้นต้นด้วยคำค้น > ชื่อมีวลีที่ค้น
+    > อื่น ๆ แล้วเรียงด้วย similarity ของชื่อ (ถ้ามี pg_trgm) และรหัสพนักงาน
+
+    Returns:
+        (rank, score) - score เป็น -similarity หรือ None ถ้าไม่มี pg_trgm
+    """
+    from models import Employee
+
+    phrase = ' '.join(name_after_title(term) or term for term in terms)
+    first = terms[0]
+    id_forms = {first}
+    if first.isdigit():
+        id_forms.update({first.zfill(8), first.lstrip('0') or first})
+
+    rank = case(
+        (func.lower(Employee.emp_id).in_(id_forms), 0),
+        (func.lower(Employee.emp_id).like(f"{_escape_like(first)}%", escape='\\'), 1),
+        (func.lower(Employee.emp_name).like(f"%{_escape_like(phrase)}%", escape='\\'), 2),
+        else_=3
+    )
+
+    score = None
+    if has_trigram():
+        # similarity() คืนค่า real (float4) ซึ่งเทียบกับค่าใน cursor (float ของ Python) ไม่ได้ตรง ๆ
+        # จึง cast เป็น double precision ทั้งใน ORDER BY และเงื่อนไข keyset
+        score = cast(-func.similarity(func.lower(Employee.emp_name), phrase), Float)
+    return rank, score
+
+
+def _ranked(terms):
+    """filtered_query() with Employee.search_rank / search_score and the keyset columns"""
+    from models import Employee
+
+    rank, score = _ranking(terms)
+    # ค่า query_expression ของ object ที่อยู่ใน session แล้วจะไม่ถูกอัปเดตถ้าไม่ populate_existing
+    query = filtered_query(terms).options(with_expression(Employee.search_rank, rank)) \
+        .execution_options(populate_existing=True)
+    columns = [rank.label('search_rank')]
+    if score is not None:
+        query = query.options(with_expression(Employee.search_score, score))
+        columns.append(score.label('search_score'))
+    columns.append(Employee.emp_id)
+    return query, columns
+
+
+def ranked_query(terms):
+    """filtered_query() ordered by relevance (ดู _ranking)"""
+    query, columns = _ranked(terms)
+    return query.order_by(*columns)
+
+
+def search_page(terms, after=None, before=None, per_page=SEARCH_PAGE_SIZE):
+    """
+    One page of the ranked search (keyset pagination ตามลำดับความตรง)
+
+    Args:
+        terms: ผลของ normalize_query() (ต้องไม่ว่าง)
+        after / before: cursor จาก KeysetPage ของหน้าก่อน
+
+    Returns:
+        KeysetPage ของ Employee
+    """
+    query, columns = _ranked(terms)
+    return keyset_paginate(query, columns, per_page=per_page, after=after, before=before)
+
+
+def autocomplete(query, limit=AUTOCOMPLETE_LIMIT):
+    """
+    Top matches for the autocomplete endpoint (cache สั้น ๆ ตาม version ของ employee directory)
+
+    Returns:
+        list ของ dict (to_dict ของ Employee)
+    """
+    from employee_directory import EmployeeDirectory
+    from extensions import cache
+
+    terms = normalize_query(query)
+    if not terms:
+        return []
+
+    digest = hashlib.sha1('\0'.join(terms).encode('utf-8')).hexdigest()
+    key = f'employee_search:{EmployeeDirectory.current_version()}:{limit}:{digest}'
+    try:
+        results = cache.get(key)
+        if results is not None:
+            return results
+    except Exception as e:
+        logger.warning(f"Cannot read employee search cache: {e}")
+
+    with primary():
+        results = [employee.to_dict() for employee in ranked_query(terms).limit(limit)]
+
+    try:
+        cache.set(key, results, timeout=AUTOCOMPLETE_CACHE_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"Cannot cache employee search: {e}")
+    return results
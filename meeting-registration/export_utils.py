@@ -0,0 +1,178 @@
+# export_utils.py
+"""
+Streaming exports for registration lists
+
+อ่านข้อมูลจาก database ด้วย server-side cursor (yield_per) และส่งออกทีละส่วน
+ทำให้หน่วยความจำที่ใช้คงที่ไม่ว่าการประชุมจะมีผู้ลงทะเบียนกี่คน
+
+- CSV: ส่งเป็น chunk ระหว่างอ่านข้อมูล
+- XLSX: openpyxl write-only workbook (เขียนแถวลงไฟล์ชั่วคราวบน disk) แล้วส่งไฟล์
+  ข้อความถูกเขียนเป็น inline string ในแต่ละ cell (openpyxl >= 3.1) จึงไม่มีตาราง
+  shared strings ที่โตตามจำนวนข้อความที่ไม่ซ้ำกัน (openpyxl รุ่นก่อน 3.1 เก็บตารางนี้ใน memory)
+"""
+
+import codecs
+import csv
+import io
+import tempfile
+import unicodedata
+from urllib.parse import quote
+
+from flask import Response, current_app, send_file, stream_with_context
+from werkzeug.http import dump_options_header
+
+from models import db, Registration
+from timezone_utils import format_datetime_thai
+
+# จำนวนแถวต่อการ fetch หนึ่งครั้งจาก server-side cursor
+EXPORT_FETCH_SIZE = 1000
+
+# จำนวนแถว CSV ที่รวมเป็น chunk ก่อนส่งให้ client
+CSV_CHUNK_ROWS = 500
+
+EXPORT_COLUMNS = (
+    Registration.emp_id,
+    Registration.emp_name,
+    Registration.position,
+    Registration.sec_short,
+    Registration.cc_name,
+    Registration.registration_time,
+    Registration.is_manual_entry,
+)
+
+
+def iter_registrations(meeting_id):
+    """
+    Yield registration rows of a meeting in registration order
+
+    ใช้ yield_per ซึ่งบน PostgreSQL จะเปิด server-side cursor (stream_results)
+    แถวจึงไม่ถูกโหลดทั้งหมดเข้า memory
+    """
+    query = db.session.query(*EXPORT_COLUMNS).filter(
+        Registration.meeting_id == meeting_id
+    ).order_by(Registration.id).execution_options(yield_per=EXPORT_FETCH_SIZE)
+
+    yield from query
+
+
+def registration_row(registration):
+    """JSON representation of a registration row (organizer JSON API และ live feed)"""
+    return {
+        'id': registration.id,
+        'emp_id': registration.emp_id,
+        'emp_name': registration.emp_name,
+        'position': registration.position,
+        'sec_short': registration.sec_short,
+        'cc_name': registration.cc_name,
+        'registration_time': registration.registration_time.isoformat() if registration.registration_time else None,
+        'registration_time_display': format_datetime_thai(
+            registration.registration_time, current_app.config.get('DISPLAY_TIMEZONE', 'Asia/Bangkok')
+        ),
+        'is_manual_entry': bool(registration.is_manual_entry)
+    }
+
+
+def iter_csv(header, rows):
+    """
+    Encode rows as UTF-8 CSV chunks (BOM first so Excel reads Thai correctly)
+    """
+    yield codecs.BOM_UTF8
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % CSV_CHUNK_ROWS == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def content_disposition(filename):
+    """Attachment header that keeps non-ASCII (Thai) filenames, same format as send_file"""
+    try:
+        filename.encode('ascii')
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+        quoted = quote(filename, safe="!#$&+-.^_`|~")
+        names = {'filename': simple, 'filename*': f"UTF-8''{quoted}"}
+    else:
+        names = {'filename': filename}
+    # quote/escape " และ \ (เช่น จากชื่อการประชุม) แบบเดียวกับ send_file
+    return dump_options_header('attachment', names)
+
+
+def csv_response(header, rows, filename):
+    """
+    Streaming CSV download
+
+    Args:
+        header: แถวหัวตาราง
+        rows: iterable ของแถวข้อมูล (ถูกอ่านระหว่างส่ง response)
+        filename: ชื่อไฟล์ที่ดาวน์โหลด
+    """
+    return Response(
+        stream_with_context(iter_csv(header, rows)),
+        mimetype='text/csv',
+        headers={'Content-Disposition': content_disposition(filename)}
+    )
+
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def write_xlsx(fileobj, header, rows, sheet_name):
+    """
+    Write rows into an XLSX file with a write-only workbook
+
+    หัวตารางจัดรูปแบบเหมือน pandas.DataFrame.to_excel (ตัวหนา มีเส้นขอบ จัดกึ่งกลาง)
+    ข้อความเป็น inline string จึงไม่มี sharedStrings.xml (ดูหัวไฟล์)
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Alignment, Border, Font, Side
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=sheet_name)
+
+    thin = Side(style='thin')
+    header_cells = []
+    for title in header:
+        cell = WriteOnlyCell(sheet, value=title)
+        cell.font = Font(bold=True)
+        cell.border = Border(left=thin, right=thin, top=thin, bottom=thin)
+        cell.alignment = Alignment(horizontal='center', vertical='top')
+        header_cells.append(cell)
+    sheet.append(header_cells)
+
+    for row in rows:
+        sheet.append(row)
+
+    workbook.save(fileobj)
+
+
+def xlsx_response(header, rows, filename, sheet_name):
+    """
+    XLSX download built without loading every row into memory
+
+    ไฟล์ถูกเขียนลง temporary file แล้วส่งด้วย send_file (ไฟล์จะถูกปิด/ลบเมื่อส่งเสร็จ)
+    """
+    output = tempfile.TemporaryFile()
+    try:
+        write_xlsx(output, header, rows, sheet_name)
+        output.seek(0)
+    except Exception:
+        output.close()
+        raise
+
+    return send_file(
+        output,
+        mimetype=XLSX_MIMETYPE,
+        as_attachment=True,
+        download_name=filename
+    )
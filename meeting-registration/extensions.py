@@ -1,9 +1,34 @@
 from flask_caching import Cache
 from celery import Celery
+from redis import Redis
 
 # สร้าง Celery instance โดยยังไม่ผูกกับ app
 # เราจะกำหนดค่า broker และ backend ภายหลังใน create_app
 celery_app = Celery(__name__)
 
 # สร้าง Cache instance
-cache = Cache()
\ No newline at end of file
+cache = Cache()
+
+
+class RedisStore:
+    """Raw Redis client for data structures that Flask-Caching cannot express (streams, hashes, counters)"""
+
+    def __init__(self):
+        self.client = None
+        self.prefix = ''
+
+    def init_app(self, app):
+        self.client = Redis.from_url(app.config['CACHE_REDIS_URL'])
+        self.prefix = app.config.get('CACHE_KEY_PREFIX', '')
+        app.extensions['redis_store'] = self
+
+    def key(self, *parts):
+        """Build a key in the same namespace as the Flask-Caching keys"""
+        return self.prefix + ':'.join(str(part) for part in parts)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+# Redis client ที่ใช้ร่วมกันระหว่าง web และ worker
+redis_store = RedisStore()
@@ -6,6 +6,7 @@ os.environ['FLASK_ENV'] = 'development'
 
 from sqlalchemy import create_engine, text
 from config import config
+from employee_search import SEARCH_DOCUMENT_SQL
 
 def fix_database():
     """Add missing columns and create new tables"""
@@ -29,6 +30,14 @@ def fix_database():
                 ADD COLUMN IF NOT EXISTS is_public BOOLEAN DEFAULT TRUE
             """))
             
+            # 1.1 Columns for delta employee import
+            print("Adding columns to employees table...")
+            conn.execute(text("""
+                ALTER TABLE employees
+                ADD COLUMN IF NOT EXISTS content_hash VARCHAR(32),
+                ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMP
+            """))
+            
             # 2. Create users table
             print("Creating users table...")
             conn.execute(text("""
@@ -80,6 +89,24 @@ def fix_database():
             conn.execute(text("""
                 CREATE INDEX IF NOT EXISTS idx_otp_email ON otp_tokens(email)
             """))
+            conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS idx_registrations_meeting_time_id
+                ON registrations(meeting_id, registration_time, id)
+            """))
+            
+            # 6. Trigram index สำหรับค้นหาพนักงาน (ต้องมีสิทธิ์สร้าง extension pg_trgm)
+            print("Adding employee search index...")
+            savepoint = conn.begin_nested()
+            try:
+                conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                conn.execute(text(f"""
+                    CREATE INDEX IF NOT EXISTS idx_employees_search_trgm
+                    ON employees USING gin (({SEARCH_DOCUMENT_SQL}) gin_trgm_ops)
+                """))
+                savepoint.commit()
+            except Exception as e:
+                savepoint.rollback()
+                print(f"⚠️ pg_trgm not available, employee search will scan the table: {e}")
             
             # Commit transaction
             trans.commit()
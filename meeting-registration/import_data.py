@@ -23,7 +23,10 @@ else:
 
 # Now import app after env is loaded
 from app import create_app
+import meeting_cache
 from models import db, Employee, Meeting
+from employee_directory import bump_directory_version
+from employee_import import SoftDeleteRefused, bulk_import, iter_csv_records, normalize_row
 
 def test_database_connection():
     """Test database connection before importing"""
@@ -93,53 +96,22 @@ def import_employees_from_csv(csv_file):
                 
                 for row_num, row in enumerate(reader, start=2):
                     try:
-                        emp_id = row.get('emp_id', '').strip()
-                        if not emp_id:
+                        record = normalize_row(row)
+                        if record is None:
                             continue
                         
                         # Check if employee exists
-                        employee = Employee.query.filter_by(emp_id=emp_id).first()
+                        employee = Employee.query.filter_by(emp_id=record['emp_id']).first()
                         
                         if employee:
                             # Update existing employee
-                            employee.emp_name = row.get('emp_name', '').strip()
-                            employee.position = row.get('position', '').strip()
-                            employee.section_code = row.get('รหัสส่วน', '').strip()
-                            employee.sec_short = row.get('sec_short', '').strip()
-                            employee.section_full = row.get('ส่วนเต็ม', '').strip()
-                            employee.department_code = row.get('รหัสฝ่าย', '').strip()
-                            employee.department_short = row.get('ฝ่ายย่อ', '').strip()
-                            employee.department_full = row.get('ฝ่ายเต็ม', '').strip()
-                            employee.group_code = row.get('รหัสกลุ่ม', '').strip()
-                            employee.group_short = row.get('กลุ่มย่อ', '').strip()
-                            employee.group_full = row.get('กลุ่มเต็ม', '').strip()
-                            employee.division_code = row.get('รหัสสายงาน', '').strip()
-                            employee.division_short = row.get('สายงานย่อ', '').strip()
-                            employee.division_full = row.get('สายงานเต็ม', '').strip()
-                            employee.cost_center_code = row.get('ศูนย์ต้นทุน', '').strip()
-                            employee.cc_name = row.get('cc_name', '').strip()
+                            for field, value in record.items():
+                                setattr(employee, field, value)
+                            employee.deleted_at = None
                             updated += 1
                         else:
                             # Create new employee
-                            employee = Employee(
-                                emp_id=emp_id,
-                                emp_name=row.get('emp_name', '').strip(),
-                                position=row.get('position', '').strip(),
-                                section_code=row.get('รหัสส่วน', '').strip(),
-                                sec_short=row.get('sec_short', '').strip(),
-                                section_full=row.get('ส่วนเต็ม', '').strip(),
-                                department_code=row.get('รหัสฝ่าย', '').strip(),
-                                department_short=row.get('ฝ่ายย่อ', '').strip(),
-                                department_full=row.get('ฝ่ายเต็ม', '').strip(),
-                                group_code=row.get('รหัสกลุ่ม', '').strip(),
-                                group_short=row.get('กลุ่มย่อ', '').strip(),
-                                group_full=row.get('กลุ่มเต็ม', '').strip(),
-                                division_code=row.get('รหัสสายงาน', '').strip(),
-                                division_short=row.get('สายงานย่อ', '').strip(),
-                                division_full=row.get('สายงานเต็ม', '').strip(),
-                                cost_center_code=row.get('ศูนย์ต้นทุน', '').strip(),
-                                cc_name=row.get('cc_name', '').strip()
-                            )
+                            employee = Employee(**record)
                             db.session.add(employee)
                             imported += 1
                         
@@ -162,6 +134,12 @@ def import_employees_from_csv(csv_file):
             print(f" Error reading CSV file: {e}")
             return False
         
+        # แจ้ง worker ทุกตัวให้สร้าง employee directory ใหม่
+        try:
+            bump_directory_version()
+        except Exception as e:
+            print(f" Warning: could not bump employee directory version: {e}")
+        
         print(f"\n Import completed:")
         print(f"   - New employees imported: {imported}")
         print(f"   - Existing employees updated: {updated}")
@@ -175,6 +153,88 @@ def import_employees_from_csv(csv_file):
         return True
 
 
+def import_employees_bulk(csv_file, soft_delete=False, workers=1, force=False):
+    """
+    Import employees with COPY into a staging table + one merge (PostgreSQL only)
+    
+    เขียนเฉพาะแถวที่เพิ่ม/เปลี่ยน (เทียบ content_hash) และ soft delete พนักงานที่ไม่อยู่ในไฟล์
+    ถ้า soft_delete=True  ใช้ workers > 1 เพื่อ parse/validate CSV แบบขนานหลาย process
+    soft delete ถูกปฏิเสธ (ไม่ import อะไรเลย) ถ้ามีแถวที่ผิดพลาด หรือไฟล์มีพนักงานน้อยผิดปกติ
+    (force=True ข้ามการตรวจจำนวน)
+    """
+    
+    if not test_database_connection():
+        print("\n Cannot proceed without database connection")
+        return False
+    
+    if not os.path.exists(csv_file):
+        print(f" File not found: {csv_file}")
+        return False
+    
+    app = create_app('development')
+    
+    with app.app_context():
+        try:
+            db.create_all()
+            print(" Database tables ready")
+        except Exception as e:
+            print(f" Error creating tables: {e}")
+            return False
+        
+        if db.engine.dialect.name != 'postgresql':
+            print(" Bulk import requires PostgreSQL, falling back to row-by-row import")
+            return import_employees_from_csv(csv_file)
+        
+        errors = []
+        started = datetime.now()
+        
+        def report_soft_delete(result):
+            if soft_delete:
+                print(f" {result['copied']} rows copied, soft deleting {result['missing']} employees not in the file")
+        
+        try:
+            result = bulk_import(db.session, iter_csv_records(csv_file, errors, workers=workers),
+                                 soft_delete=soft_delete, errors=errors, force=force,
+                                 before_commit=report_soft_delete)
+        except SoftDeleteRefused as e:
+            print(f" {e}")
+            if errors:
+                print(" Nothing was imported. Fix these rows and import again:")
+                for error in errors[:5]:
+                    print(f"   {error}")
+            else:
+                print(" Nothing was imported. Check the file, or use --force-soft-delete if it is complete")
+            return False
+        except Exception as e:
+            print(f" Error importing CSV file: {e}")
+            return False
+        
+        elapsed = (datetime.now() - started).total_seconds()
+        
+        # แจ้ง worker ทุกตัวให้สร้าง employee directory ใหม่
+        try:
+            bump_directory_version()
+        except Exception as e:
+            print(f" Warning: could not bump employee directory version: {e}")
+        
+        print(f"\n Bulk import completed in {elapsed:.1f}s ({result['copied']} rows copied):")
+        print(f"   - New employees imported: {result['imported']}")
+        print(f"   - Existing employees updated: {result['updated']}")
+        print(f"   - Unchanged: {result['unchanged']}")
+        if soft_delete:
+            print(f"   - Removed (soft deleted): {result['missing']}")
+        elif result['missing']:
+            print(f"   - Not in file (kept, use --soft-delete to remove): {result['missing']}")
+        print(f"   - Total in database: {Employee.query.filter_by(deleted_at=None).count()}")
+        
+        if errors:
+            print(f"\n  Errors encountered: {len(errors)}")
+            for error in errors[:5]:  # Show first 5 errors
+                print(f"   {error}")
+        
+        return True
+
+
 def import_meeting_from_json(json_file):
     """Import meeting data from JSON file"""
     
@@ -234,6 +294,7 @@ def import_meeting_from_json(json_file):
             
             db.session.add(meeting)
             db.session.commit()
+            meeting_cache.invalidate()
             
             print(f"\n Meeting imported successfully:")
             print(f"   Topic: {meeting.topic}")
@@ -254,6 +315,14 @@ if __name__ == '__main__':
     
     parser = argparse.ArgumentParser(description='Import data to registration system')
     parser.add_argument('--employees', help='Path to employees CSV file')
+    parser.add_argument('--bulk', action='store_true',
+                        help='Import employees with COPY + single merge (PostgreSQL, only changed rows are written)')
+    parser.add_argument('--soft-delete', action='store_true',
+                        help='With --bulk: mark employees missing from the CSV as deleted')
+    parser.add_argument('--force-soft-delete', action='store_true',
+                        help='With --soft-delete: allow a file with far fewer employees than the database')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='With --bulk: number of processes for parsing/validating the CSV')
     parser.add_argument('--meeting', help='Path to meeting JSON file')
     parser.add_argument('--test', action='store_true', help='Test database connection only')
     
@@ -271,7 +340,17 @@ if __name__ == '__main__':
     
     if args.employees:
         print(f"\n Importing employees from {args.employees}...")
-        if not import_employees_from_csv(args.employees):
+        if args.bulk:
+            imported_ok = import_employees_bulk(args.employees, soft_delete=args.soft_delete,
+                                                workers=max(1, args.workers),
+                                                force=args.force_soft_delete)
+        else:
+            if args.soft_delete:
+                print(" --soft-delete requires --bulk, ignoring")
+            if args.workers > 1:
+                print(" --workers requires --bulk, ignoring")
+            imported_ok = import_employees_from_csv(args.employees)
+        if not imported_ok:
             success = False
     
     if args.meeting:
@@ -282,6 +361,9 @@ if __name__ == '__main__':
     if not args.employees and not args.meeting:
         print("Usage:")
         print("  python import_data.py --employees employee.csv")
+        print("  python import_data.py --employees employee.csv --bulk  # COPY + merge")
+        print("  python import_data.py --employees employee.csv --bulk --soft-delete")
+        print("  python import_data.py --employees employee.csv --bulk --workers 4")
         print("  python import_data.py --meeting schedule.json")
         print("  python import_data.py --employees employee.csv --meeting schedule.json")
         print("  python import_data.py --test  # Test database connection")
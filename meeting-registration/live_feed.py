@@ -0,0 +1,183 @@
+# live_feed.py
+"""
+Live registration feed (Server-Sent Events) for admin and organizer dashboards
+
+ฝั่งเขียน: ทุกครั้งที่การลงทะเบียนถูก commit (app.save_registration, registration_buffer.flush)
+หรือถูกลบ จะ XADD หนึ่ง entry ลง Redis Stream ของการประชุม (reg_feed:<meeting_id>)
+ผู้ชมทุกคนอ่าน stream เดียวกันด้วย XREAD จึงเป็น fan-out แบบ pub/sub
+แต่ต่างจาก PUBLISH ตรงที่ entry ยังอยู่ (MAXLEN ~LIVE_FEED_MAXLEN) ทำให้ browser ที่เชื่อมต่อใหม่
+ส่ง Last-Event-ID มาแล้วอ่านต่อจากจุดเดิมได้โดยไม่ตกหล่น
+
+ฝั่งอ่าน: event_stream() ไม่แตะ database เลย จำนวนผู้ลงทะเบียนมาจาก registration_stats (HGETALL)
+และแถวใหม่มาจาก entry ใน stream
+
+gunicorn sync worker หนึ่งตัวรับได้ทีละ request จึงห้ามถือ connection ไว้นาน:
+  LIVE_FEED_STREAM_SECONDS = 0  (default) ส่ง event ที่ค้างอยู่แล้วปิดทันที
+                                 EventSource ต่อใหม่เองทุก LIVE_FEED_RETRY_MS
+  LIVE_FEED_STREAM_SECONDS > 0  รอ event ด้วย XREAD BLOCK จนครบเวลาแล้วปิด
+                                 ใช้กับ worker แบบ async (gunicorn -k gevent) เท่านั้น
+"""
+
+import json
+import logging
+import time
+
+from flask import Response, current_app, stream_with_context
+from redis.exceptions import RedisError
+
+import registration_stats
+from extensions import redis_store
+
+logger = logging.getLogger(__name__)
+
+FEED_KEY = 'reg_feed'
+
+# จำนวน entry สูงสุดที่อ่านต่อ XREAD หนึ่งครั้ง
+READ_COUNT = 100
+
+
+def _key(meeting_id):
+    return redis_store.key(FEED_KEY, meeting_id)
+
+
+def _decode(value):
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+def is_enabled():
+    return current_app.config.get('LIVE_FEED_ENABLED', True)
+
+
+def _append(events):
+    """XADD (meeting_id, type, rows) events in one pipeline"""
+    if not events or not is_enabled():
+        return
+
+    maxlen = current_app.config.get('LIVE_FEED_MAXLEN', 1000)
+    ttl = current_app.config.get('REGISTRATION_CACHE_TTL', 86400)
+    try:
+        pipe = redis_store.pipeline()
+        for meeting_id, event_type, rows in events:
+            key = _key(meeting_id)
+            pipe.xadd(key, {'type': event_type, 'rows': json.dumps(rows, ensure_ascii=False)},
+                      maxlen=maxlen, approximate=True)
+            pipe.expire(key, ttl)
+        pipe.execute()
+    except RedisError as e:
+        # ผู้ชมจะเห็นจำนวนที่ถูกต้องใน event ถัดไป (counts อ่านจาก registration_stats เสมอ)
+        logger.warning(f"Cannot publish live registration feed: {e}")
+
+
+def publish_registrations(registrations):
+    """Publish newly committed registrations (หนึ่ง entry ต่อการประชุม)"""
+    from export_utils import registration_row
+
+    by_meeting = {}
+    for registration in registrations:
+        by_meeting.setdefault(registration.meeting_id, []).append(registration_row(registration))
+
+    _append([(meeting_id, 'registrations', rows) for meeting_id, rows in by_meeting.items()])
+
+
+def publish_counts(meeting_ids):
+    """Tell viewers that counts changed without new rows (เช่น หลังลบการลงทะเบียน)"""
+    _append([(meeting_id, 'counts', []) for meeting_id in meeting_ids])
+
+
+def _counts(meeting_id):
+    from models import db
+
+    stats = registration_stats.get_stats(meeting_id)
+    # get_stats อาจ rebuild จาก database - คืน connection ทันทีเพราะ stream อาจเปิดค้างอีกนาน
+    db.session.remove()
+    manual = sum(stat.count for stat in stats.manual if stat.is_manual_entry)
+    return {'total': stats.total, 'manual': manual}
+
+
+def _event(event_type, data, event_id=None):
+    lines = []
+    if event_id:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False, separators=(',', ':'))}")
+    return '\n'.join(lines) + '\n\n'
+
+
+def _valid_id(event_id):
+    """Stream entry ids look like <ms>-<seq>"""
+    if not event_id:
+        return False
+    parts = event_id.split('-')
+    return len(parts) == 2 and all(part.isdigit() for part in parts)
+
+
+def _latest_id(key):
+    entries = redis_store.xrevrange(key, count=1)
+    return _decode(entries[0][0]) if entries else '0-0'
+
+
+def event_stream(meeting_id, last_event_id=None):
+    """
+    Generate SSE messages for one meeting
+
+    Args:
+        meeting_id: การประชุม
+        last_event_id: header Last-Event-ID ของ EventSource (None = เชื่อมต่อครั้งแรก)
+
+    Yields:
+        ข้อความ SSE: "counts" (ครั้งแรก) และ "registrations" / "counts" เมื่อมี entry ใหม่
+    """
+    config = current_app.config
+    stream_seconds = config.get('LIVE_FEED_STREAM_SECONDS', 0)
+    keepalive = config.get('LIVE_FEED_KEEPALIVE_SECONDS', 15)
+    key = _key(meeting_id)
+
+    yield f"retry: {config.get('LIVE_FEED_RETRY_MS', 3000)}\n\n"
+
+    try:
+        cursor = last_event_id if _valid_id(last_event_id) else None
+        if cursor is None:
+            # เชื่อมต่อครั้งแรก: ส่งจำนวนปัจจุบัน แล้วอ่านเฉพาะ entry หลังจากนี้
+            cursor = _latest_id(key)
+            yield _event('counts', _counts(meeting_id), cursor)
+
+        deadline = time.monotonic() + stream_seconds
+        while True:
+            remaining = deadline - time.monotonic()
+            block = int(min(keepalive, remaining) * 1000) if remaining > 0 else None
+            response = redis_store.xread({key: cursor}, count=READ_COUNT, block=block)
+            entries = response[0][1] if response else []
+
+            if entries:
+                rows = []
+                for _, fields in entries:
+                    fields = {_decode(name): _decode(value) for name, value in fields.items()}
+                    if fields.get('type') == 'registrations':
+                        rows.extend(json.loads(fields['rows']))
+                cursor = _decode(entries[-1][0])
+                data = _counts(meeting_id)
+                if rows:
+                    data['registrations'] = rows
+                yield _event('registrations' if rows else 'counts', data, cursor)
+
+            if remaining <= 0 and len(entries) < READ_COUNT:
+                break
+            if not entries:
+                yield ": keepalive\n\n"
+    except RedisError as e:
+        logger.warning(f"Live registration feed unavailable for meeting {meeting_id}: {e}")
+
+
+def stream_response(meeting_id, last_event_id=None):
+    """text/event-stream response for a view function"""
+    from models import db
+
+    # ไม่ถือ database connection ไว้ระหว่าง stream
+    db.session.remove()
+
+    response = Response(stream_with_context(event_stream(meeting_id, last_event_id)),
+                        mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # ให้ nginx ส่งต่อทันทีแทนการ buffer
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,280 @@
+# meeting_cache.py
+"""
+Versioned meeting cache
+
+เก็บข้อมูลการประชุมใน cache เป็น DTO ที่แก้ไขไม่ได้ (namedtuple) แทนการ pickle
+SQLAlchemy object ซึ่งจะ detached จาก session และ lazy load ไม่ได้
+
+- meeting:<version>:<id>       -> MeetingDTO
+- meetings_active:<version>    -> tuple ของ MeetingDTO ที่ active (ใหม่สุดก่อน)
+- meeting_index:<version>      -> IndexBuckets สำหรับหน้าแรก (กำลังประชุม/วันนี้/กำลังจะมาถึง/ผ่านไปแล้ว)
+                                  หมดอายุเมื่อถึงเวลาที่มีการประชุมเปลี่ยนกลุ่ม
+
+ทุกครั้งที่มีการสร้าง/แก้ไข/เปิดปิด/ลบการประชุม ให้เรียก invalidate()
+ซึ่งจะเพิ่ม version ทำให้ key เดิมทั้งหมดไม่ถูกใช้อีก (และหมดอายุไปเอง)
+
+อ่าน/เขียนผ่าน tiered_cache: version และ DTO ถูกเก็บใน memory ของ worker ด้วย
+และ invalidate() แจ้งทุก worker ผ่าน pub/sub ให้ทิ้ง version เดิม
+
+เมื่อ cache หมดอายุหรือ version เปลี่ยนช่วงที่มีคนลงทะเบียนพร้อมกันจำนวนมาก มีเพียง worker เดียว
+ที่อ่าน database ใหม่ (tiered_cache.get_or_compute) worker อื่นใช้ค่าเดิม (ของ version ก่อนหน้า) ไปก่อน
+"""
+
+import logging
+import math
+from collections import namedtuple
+from datetime import datetime, time, timedelta
+
+import pytz
+from flask import abort, current_app
+from sqlalchemy.exc import OperationalError
+
+from db_resilience import CircuitOpenError
+from db_routing import on_primary
+from tiered_cache import tiered_cache
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'meeting_cache_version'
+
+MEETING_FIELDS = (
+    'id', 'topic', 'meeting_date', 'start_time', 'end_time',
+    'room', 'floor', 'building',
+    'meeting_type', 'meeting_url', 'meeting_id', 'meeting_password', 'additional_info',
+    'is_active', 'is_public', 'organizer_id', 'created_at', 'updated_at',
+)
+
+# จำนวนการประชุมที่ผ่านไปแล้วที่แสดงในหน้าแรก
+INDEX_PAST_LIMIT = 5
+
+OrganizerDTO = namedtuple('OrganizerDTO', ['id', 'name', 'email'])
+
+
+class MeetingDTO(namedtuple('MeetingDTO', MEETING_FIELDS + ('organizer',))):
+    """Immutable snapshot of a Meeting row (safe to cache and share between requests)"""
+    __slots__ = ()
+
+    @classmethod
+    def from_model(cls, meeting):
+        organizer = None
+        if meeting.organizer is not None:
+            organizer = OrganizerDTO(meeting.organizer.id, meeting.organizer.name, meeting.organizer.email)
+        return cls(*(getattr(meeting, field) for field in MEETING_FIELDS), organizer=organizer)
+
+    def to_dict(self):
+        """Same shape as Meeting.to_dict"""
+        return {
+            'id': self.id,
+            'topic': self.topic,
+            'meeting_date': self.meeting_date.strftime('%Y-%m-%d'),
+            'start_time': self.start_time.strftime('%H:%M'),
+            'end_time': self.end_time.strftime('%H:%M'),
+            'room': self.room,
+            'floor': self.floor,
+            'building': self.building,
+            'is_active': self.is_active
+        }
+
+
+IndexBuckets = namedtuple('IndexBuckets', ['ongoing', 'today', 'upcoming', 'past', 'valid_until'])
+
+
+def _timeout():
+    return current_app.config.get('CACHE_ACTIVE_MEETING_TIMEOUT', 60)
+
+
+def current_version():
+    try:
+        return tiered_cache.get(VERSION_KEY) or 0
+    except Exception as e:
+        logger.warning(f"Cannot read meeting cache version: {e}")
+        return 0
+
+
+def _meeting_key(version, meeting_id):
+    return f'meeting:{version}:{meeting_id}'
+
+
+def _active_key(version):
+    return f'meetings_active:{version}'
+
+
+def _index_key(version):
+    return f'meeting_index:{version}'
+
+
+def _count_key(version):
+    return f'meetings_count:{version}'
+
+
+def _stale_key(key_func, version, *args):
+    """Same key in the previous version (ค่าเก่าระหว่างที่ worker อื่นกำลังอ่าน database)"""
+    return key_func(version - 1, *args) if version else None
+
+
+def _safe_get(key):
+    try:
+        return tiered_cache.get(key)
+    except Exception as e:
+        logger.warning(f"Meeting cache read failed for {key}: {e}")
+        return None
+
+
+def get_meeting(meeting_id):
+    """
+    Get meeting by id
+
+    Returns:
+        MeetingDTO or None
+    """
+    from models import Meeting
+
+    def load():
+        meeting = Meeting.load(meeting_id)
+        return MeetingDTO.from_model(meeting) if meeting is not None else None
+
+    version = current_version()
+    return tiered_cache.get_or_compute(_meeting_key(version, meeting_id), load, _timeout(),
+                                       stale_key=_stale_key(_meeting_key, version, meeting_id))
+
+
+def get_meeting_or_404(meeting_id):
+    dto = get_meeting(meeting_id)
+    if dto is None:
+        abort(404)
+    return dto
+
+
+def _load_active_meetings(version):
+    """Active meetings from cache/database (None ถ้า database ใช้งานไม่ได้)"""
+    from models import Meeting
+
+    def load():
+        # Meeting.load_active retry พร้อม sleep - ทำใน worker เดียวที่ถือ lock
+        meetings = tuple(MeetingDTO.from_model(meeting) for meeting in Meeting.load_active())
+        try:
+            tiered_cache.prime({_meeting_key(version, dto.id): dto for dto in meetings}, _timeout())
+        except Exception as e:
+            logger.warning(f"Meeting cache write failed: {e}")
+        return meetings
+
+    try:
+        return tiered_cache.get_or_compute(_active_key(version), load, _timeout(),
+                                           stale_key=_stale_key(_active_key, version))
+    except (OperationalError, CircuitOpenError) as e:
+        # ไม่มีค่าเดิมให้ใช้
+        logger.error(f"Failed to get active meetings: {e}")
+        return None
+
+
+def get_active_meetings():
+    """
+    All active meetings, newest first
+
+    Returns:
+        tuple of MeetingDTO
+    """
+    # database ใช้งานไม่ได้ - คืนค่าว่างโดยไม่ cache
+    return _load_active_meetings(current_version()) or ()
+
+
+def get_active_meeting():
+    """The most recently created active meeting (or None)"""
+    meetings = get_active_meetings()
+    return meetings[0] if meetings else None
+
+
+@on_primary
+def _count_all():
+    from models import Meeting
+    return Meeting.query.count()
+
+
+def count_meetings():
+    """Number of meetings (ใช้ใน admin dashboard)"""
+    version = current_version()
+    return tiered_cache.get_or_compute(_count_key(version), _count_all, _timeout(),
+                                       stale_key=_stale_key(_count_key, version))
+
+
+def _classify(meetings, now):
+    """
+    Split public meetings into index-page buckets
+
+    Returns:
+        (IndexBuckets, next_boundary) - next_boundary คือเวลาถัดไปที่มีการประชุม
+        เปลี่ยนกลุ่ม (เริ่ม/จบ/ขึ้นวันใหม่)
+    """
+    tz = now.tzinfo
+    today = now.date()
+    next_boundary = tz.localize(datetime.combine(today + timedelta(days=1), time.min))
+
+    ongoing, today_meetings, upcoming, past = [], [], [], []
+    for meeting in meetings:
+        meeting_start = tz.localize(datetime.combine(meeting.meeting_date, meeting.start_time))
+        meeting_end = tz.localize(datetime.combine(meeting.meeting_date, meeting.end_time))
+
+        if meeting_end < now:
+            past.append(meeting)
+        elif meeting_start <= now <= meeting_end:
+            ongoing.append(meeting)
+            next_boundary = min(next_boundary, meeting_end)
+        elif meeting.meeting_date == today:
+            today_meetings.append(meeting)
+            next_boundary = min(next_boundary, meeting_start)
+        else:
+            upcoming.append(meeting)
+
+    ongoing.sort(key=lambda m: m.start_time)
+    today_meetings.sort(key=lambda m: m.start_time)
+    upcoming.sort(key=lambda m: (m.meeting_date, m.start_time))
+    past.sort(key=lambda m: (m.meeting_date, m.start_time), reverse=True)
+
+    buckets = IndexBuckets(tuple(ongoing), tuple(today_meetings), tuple(upcoming),
+                           tuple(past[:INDEX_PAST_LIMIT]), next_boundary.timestamp())
+    return buckets, next_boundary
+
+
+def get_index_buckets():
+    """
+    Public active meetings grouped for the index page
+
+    ผลลัพธ์ถูก cache จนถึงเวลาถัดไปที่มีการประชุมเปลี่ยนกลุ่ม หรือจนกว่าจะมีการแก้ไขการประชุม
+    (invalidate() เปลี่ยน version)
+
+    Returns:
+        IndexBuckets
+    """
+    tz = pytz.timezone(current_app.config.get('TIMEZONE', 'Asia/Bangkok'))
+    now = datetime.now(tz)
+
+    version = current_version()
+    key = _index_key(version)
+
+    buckets = _safe_get(key)
+    if buckets is not None and now.timestamp() < buckets.valid_until:
+        return buckets
+
+    meetings = _load_active_meetings(version)
+    if meetings is None:
+        return IndexBuckets((), (), (), (), 0)
+
+    buckets, next_boundary = _classify([m for m in meetings if m.is_public], now)
+    if not tiered_cache.is_fresh(_active_key(version)):
+        # ได้รายการเก่าระหว่างที่ worker อื่นอ่าน database - ไม่ cache ไว้ใน version ใหม่
+        return buckets
+
+    ttl = max(1, math.ceil((next_boundary - now).total_seconds()))
+    try:
+        tiered_cache.set(key, buckets, timeout=ttl)
+    except Exception as e:
+        logger.warning(f"Meeting cache write failed for {key}: {e}")
+    return buckets
+
+
+def invalidate():
+    """Invalidate every cached meeting (call after any meeting change)"""
+    try:
+        tiered_cache.inc(VERSION_KEY)
+    except Exception as e:
+        logger.error(f"Cannot bump meeting cache version: {e}")
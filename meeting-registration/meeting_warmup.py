@@ -0,0 +1,222 @@
+# meeting_warmup.py
+"""
+Pre-meeting cache warming
+
+เรารู้ล่วงหน้าว่าช่วงลงทะเบียนหนาแน่นจะเกิดเมื่อไร (meeting_date + start_time) จึงตั้ง RQ job
+(queue default ของ rq_worker.py ซึ่งรันพร้อม scheduler) ไว้ MEETING_WARMUP_LEAD_MINUTES นาที
+ก่อนเริ่มการประชุม เพื่อให้ผู้ลงทะเบียนคนแรกเร็วเท่ากับคนที่ร้อย
+
+ข้อมูลที่ใช้ร่วมกันใน Redis (ทำครั้งเดียวใน job):
+- MeetingDTO, รายการการประชุมที่ active และหน้าแรก (meeting_cache)
+- ตัวนับผู้ลงทะเบียน (registration_stats) และรายชื่อที่ลงทะเบียนแล้ว (registration_cache)
+- รูป QR Code (qrcode_cache) - ต้องตั้ง PUBLIC_BASE_URL เพราะ URL ใน QR มาจาก host ของ request
+
+ข้อมูลใน memory ของแต่ละ worker (ส่งคำสั่งผ่าน tiered_cache.broadcast_warm ให้ทุก worker ทุก node):
+- employee directory index, template ของหน้าลงทะเบียน และ database connection ใน pool
+
+job ถูกตั้งใหม่ทุกครั้งที่สร้าง/แก้ไข/เปิดการประชุม (job id เดิม จึงไม่ซ้ำ) และควรรัน
+`python meeting_warmup.py` เป็นระยะ (cron) เพื่อครอบคลุมการประชุมที่ถูกเพิ่มทางอื่น
+เช่น import_data.py หรือ sync_schedule.py
+"""
+
+import logging
+import time
+from datetime import datetime, timedelta
+
+import pytz
+from flask import current_app
+
+from tiered_cache import tiered_cache
+
+logger = logging.getLogger(__name__)
+
+# template ที่ใช้ระหว่างลงทะเบียน (compile ครั้งแรกใช้เวลาหลายสิบ ms ต่อ worker)
+TEMPLATES = ('index.html', 'index_multi.html', 'registration_success.html', 'qrcode_display.html')
+
+
+def _job_id(meeting_id):
+    return f'warm_meeting_{meeting_id}'
+
+
+def _timezone():
+    return pytz.timezone(current_app.config.get('TIMEZONE', 'Asia/Bangkok'))
+
+
+def meeting_window(meeting):
+    """(start, end) of a meeting as aware datetimes"""
+    tz = _timezone()
+    start = tz.localize(datetime.combine(meeting.meeting_date, meeting.start_time))
+    end = tz.localize(datetime.combine(meeting.meeting_date, meeting.end_time))
+    return start, end
+
+
+def warm_at(meeting):
+    """When the warming job of a meeting should run"""
+    lead = current_app.config.get('MEETING_WARMUP_LEAD_MINUTES', 15)
+    start, _ = meeting_window(meeting)
+    return start - timedelta(minutes=lead)
+
+
+def schedule(meeting):
+    """
+    Schedule (or reschedule) the warming job of a meeting
+
+    Args:
+        meeting: Meeting หรือ MeetingDTO
+
+    Returns:
+        เวลาที่ job จะรัน หรือ None ถ้าไม่ต้อง warm (ปิดใช้งาน / ไม่ active / จบไปแล้ว)
+    """
+    if not current_app.config.get('MEETING_WARMUP_ENABLED', True):
+        return None
+
+    from tasks import default_queue, warm_meeting_task
+
+    job_id = _job_id(meeting.id)
+    now = datetime.now(pytz.utc)
+    run_at = warm_at(meeting)
+    _, end = meeting_window(meeting)
+
+    try:
+        # ยกเลิก job เดิม (เวลาเริ่มอาจถูกแก้ไข)
+        default_queue.scheduled_job_registry.remove(job_id)
+        if not meeting.is_active or end <= now:
+            return None
+
+        if run_at <= now:
+            default_queue.enqueue(warm_meeting_task, meeting.id, job_id=job_id)
+            return now
+        default_queue.enqueue_at(run_at.astimezone(pytz.utc), warm_meeting_task, meeting.id, job_id=job_id)
+        return run_at
+    except Exception as e:
+        # ไม่ warm ก็ยังทำงานได้ แค่ผู้ลงทะเบียนกลุ่มแรกช้ากว่า
+        logger.warning(f"Cannot schedule cache warming for meeting {meeting.id}: {e}")
+        return None
+
+
+def schedule_upcoming(hours=24):
+    """
+    Schedule warming for every active meeting that starts within the next `hours`
+
+    Returns:
+        dict ของ meeting_id -> เวลาที่ job จะรัน
+    """
+    import meeting_cache
+
+    horizon = datetime.now(pytz.utc) + timedelta(hours=hours)
+    scheduled = {}
+    for meeting in meeting_cache.get_active_meetings():
+        start, _ = meeting_window(meeting)
+        if start <= horizon:
+            run_at = schedule(meeting)
+            if run_at is not None:
+                scheduled[meeting.id] = run_at
+    return scheduled
+
+
+def _step(results, name, func, *args):
+    started = time.perf_counter()
+    try:
+        func(*args)
+        results[name] = round((time.perf_counter() - started) * 1000, 1)
+    except Exception as e:
+        logger.warning(f"Cache warming step {name} failed: {e}")
+        results[name] = f'error: {e}'
+
+
+def _warm_qrcode(meeting_id):
+    base_url = current_app.config.get('PUBLIC_BASE_URL')
+    if not base_url:
+        raise ValueError('PUBLIC_BASE_URL is not set')
+
+    # เรียก view เดียวกับที่ browser ใช้ เพื่อให้ URL, logo และ fingerprint ตรงกันทุกประการ
+    path = f'/meeting/{meeting_id}/qrcode.png'
+    with current_app.test_request_context(path, base_url=base_url):
+        current_app.view_functions['meeting_qrcode_image'](meeting_id=meeting_id)
+
+
+def warm_shared(meeting_id):
+    """
+    Warm everything that lives in Redis (ครั้งเดียวต่อการประชุม)
+
+    Returns:
+        dict ของขั้นตอน -> เวลาที่ใช้ (ms) หรือข้อความ error
+    """
+    import meeting_cache
+    import registration_cache
+    import registration_stats
+    from models import db
+
+    results = {}
+    _step(results, 'meeting', meeting_cache.get_meeting, meeting_id)
+    _step(results, 'active_meetings', meeting_cache.get_active_meetings)
+    _step(results, 'index', meeting_cache.get_index_buckets)
+    _step(results, 'registration_stats', registration_stats.get_stats, meeting_id)
+    _step(results, 'registered_set', registration_cache.ensure_loaded, meeting_id)
+    _step(results, 'qrcode', _warm_qrcode, meeting_id)
+    db.session.remove()
+    return results
+
+
+@tiered_cache.on_warm
+def warm_worker(meeting_id):
+    """Warm the in-memory state of this worker (รันในทุก worker ผ่าน broadcast_warm)"""
+    import meeting_cache
+    from employee_directory import count_employees
+    from models import db
+
+    meeting_id = int(meeting_id)
+    results = {}
+    _step(results, 'database', db.session.execute, db.text('SELECT 1'))
+    _step(results, 'employee_directory', count_employees)
+    _step(results, 'meeting', meeting_cache.get_meeting, meeting_id)
+    for template in TEMPLATES:
+        _step(results, template, current_app.jinja_env.get_template, template)
+    db.session.remove()
+    logger.info(f"Warmed worker for meeting {meeting_id}: {results}")
+    return results
+
+
+def warm_meeting(meeting_id):
+    """
+    Warm caches for a meeting that is about to start
+
+    Returns:
+        dict ผลของแต่ละขั้นตอน หรือ None ถ้าการประชุมไม่ active แล้ว
+    """
+    import meeting_cache
+
+    meeting = meeting_cache.get_meeting(meeting_id)
+    if meeting is None or not meeting.is_active:
+        logger.info(f"Skip cache warming for meeting {meeting_id}: not active")
+        return None
+
+    results = warm_shared(meeting_id)
+    try:
+        tiered_cache.broadcast_warm(meeting_id)
+        results['workers'] = 'broadcast'
+    except Exception as e:
+        logger.warning(f"Cannot broadcast cache warming for meeting {meeting_id}: {e}")
+        results['workers'] = f'error: {e}'
+
+    logger.info(f"Warmed caches for meeting {meeting_id}: {results}")
+    return results
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from app import create_app
+
+    parser = argparse.ArgumentParser(description='Schedule cache warming before upcoming meetings')
+    parser.add_argument('--hours', type=int, default=24, help='Schedule meetings starting within this many hours')
+    parser.add_argument('--now', type=int, metavar='MEETING_ID', help='Warm one meeting immediately')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        if args.now:
+            print(f" Meeting {args.now}: {warm_meeting(args.now)}")
+        else:
+            for meeting_id, run_at in schedule_upcoming(args.hours).items():
+                print(f" Meeting {meeting_id}: warming at {run_at.astimezone(_timezone()):%Y-%m-%d %H:%M}")
@@ -2,15 +2,24 @@
 
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime, timezone, timedelta
-from sqlalchemy import UniqueConstraint, Index
-from extensions import cache
-from sqlalchemy.exc import OperationalError
-import time
+from sqlalchemy import UniqueConstraint, Index, func, select
+from sqlalchemy.orm import joinedload, query_expression, with_expression
 import logging
 from flask import current_app
+from db_resilience import retry, with_retry
+from db_routing import RoutingSession, on_primary
 
 logger = logging.getLogger(__name__)
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+
+def dialect_insert(table):
+    """INSERT construct that supports ON CONFLICT for the current database"""
+    if db.engine.dialect.name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert(table)
 
 class Employee(db.Model):
     """Employee model for storing employee information"""
@@ -33,12 +42,18 @@ class Employee(db.Model):
     division_full = db.Column(db.String(255))
     cost_center_code = db.Column(db.String(50))
     cc_name = db.Column(db.String(255))
+    content_hash = db.Column(db.String(32))  # hash ของข้อมูลจากไฟล์ HR (ใช้ตรวจว่าข้อมูลเปลี่ยนตอน import)
+    deleted_at = db.Column(db.DateTime)  # soft delete - ไม่อยู่ในไฟล์ HR ล่าสุด
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
     updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None), onupdate=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
     
     # Relationships
     registrations = db.relationship('Registration', backref='employee', lazy='dynamic')
     
+    # ลำดับความตรงของผลค้นหา - มีค่าเฉพาะใน query ของ employee_search (ใช้เป็น key ของ keyset pagination)
+    search_rank = query_expression()
+    search_score = query_expression()
+    
     def __repr__(self):
         return f'<Employee {self.emp_id}: {self.emp_name}>'
     
@@ -55,47 +70,36 @@ class Employee(db.Model):
     @classmethod
     def search_by_id(cls, emp_id):
         """Search employee by ID with various formats"""
-        max_retries = current_app.config.get('DATABASE_RETRY_COUNT', 3)
-        retry_delay = current_app.config.get('DATABASE_RETRY_DELAY', 1)
-        
-        for attempt in range(max_retries):
+        if current_app.config.get('EMPLOYEE_DIRECTORY_ENABLED'):
+            from employee_directory import directory
             try:
-                emp_id = str(emp_id).strip()
-                
-                # ค้นหาแบบตรงกัน
-                employee = cls.query.filter_by(emp_id=emp_id).first()
-                if employee:
-                    return employee
-                
-                # ลอง trim leading zeros
-                emp_id_no_leading = emp_id.lstrip('0')
-                if len(emp_id_no_leading) >= 6:
-                    employee = cls.query.filter_by(emp_id=emp_id_no_leading).first()
-                    if employee:
-                        return employee
-                
-                # ลองเติม 0 ข้างหน้าให้ครบ 8 หลัก
-                if len(emp_id) < 8:
-                    emp_id_padded = emp_id.zfill(8)
-                    employee = cls.query.filter_by(emp_id=emp_id_padded).first()
-                    if employee:
-                        return employee
-                
-                return None
-                
-            except OperationalError as e:
-                logger.warning(f"Database error on attempt {attempt + 1}: {e}")
-                if attempt < max_retries - 1:
-                    try:
-                        db.session.rollback()
-                        db.session.remove()
-                        time.sleep(retry_delay * (attempt + 1))
-                    except:
-                        pass
-                else:
-                    logger.error(f"Failed after {max_retries} attempts")
-                    return None
-        
+                return directory.lookup(emp_id)
+            except Exception as e:
+                logger.warning(f"Employee directory unavailable, falling back to database: {e}")
+
+        return retry(cls._search_in_database, str(emp_id).strip())
+
+    @classmethod
+    def _search_in_database(cls, emp_id):
+        # ค้นหาแบบตรงกัน
+        employee = cls.query.filter_by(emp_id=emp_id, deleted_at=None).first()
+        if employee:
+            return employee
+
+        # ลอง trim leading zeros
+        emp_id_no_leading = emp_id.lstrip('0')
+        if len(emp_id_no_leading) >= 6:
+            employee = cls.query.filter_by(emp_id=emp_id_no_leading, deleted_at=None).first()
+            if employee:
+                return employee
+
+        # ลองเติม 0 ข้างหน้าให้ครบ 8 หลัก
+        if len(emp_id) < 8:
+            emp_id_padded = emp_id.zfill(8)
+            employee = cls.query.filter_by(emp_id=emp_id_padded, deleted_at=None).first()
+            if employee:
+                return employee
+
         return None
 
 
@@ -130,6 +134,10 @@ class Meeting(db.Model):
     # Relationships
     registrations = db.relationship('Registration', backref='meeting', lazy='dynamic', cascade='all, delete-orphan')
     
+    # จำนวนผู้ลงทะเบียน - มีค่าเฉพาะเมื่อ query ด้วย options(Meeting.with_registration_count())
+    # (แทน meeting.registrations.count() ใน template ที่ยิง COUNT ทีละการประชุม)
+    registration_count = query_expression()
+    
     def __repr__(self):
         return f'<Meeting {self.id}: {self.topic}>'
     
@@ -148,35 +156,41 @@ class Meeting(db.Model):
         }
     
     @classmethod
-    @cache.cached(timeout=60, key_prefix='active_meeting')
     def get_active_meeting(cls):
-        """Get the currently active meeting (cached for 60 seconds)"""
-        max_retries = current_app.config.get('DATABASE_RETRY_COUNT', 3)
-        retry_delay = current_app.config.get('DATABASE_RETRY_DELAY', 1)
+        """Get the currently active meeting (MeetingDTO from meeting_cache)"""
+        from meeting_cache import get_active_meeting
+        return get_active_meeting()
 
-        for attempt in range(max_retries):
-            try:
-                logger.debug(f"Fetching active meeting from DB (attempt {attempt + 1})")
-                result = cls.query.filter_by(is_active=True).order_by(cls.created_at.desc()).first()
-                return result
-            except OperationalError as e:
-                logger.warning(f"Database connection error on attempt {attempt + 1}: {e}")
-                
-                if attempt < max_retries - 1:
-                    # Try to reconnect
-                    try:
-                        db.session.rollback()
-                        db.session.remove()
-                        time.sleep(retry_delay * (attempt + 1))
-                    except:
-                        pass
-                else:
-                    # Clear cache on final failure
-                    cache.delete('active_meeting')
-                    logger.error(f"Failed to get active meeting after {max_retries} attempts")
-                    return None
-        
-        return None
+    @classmethod
+    def with_registration_count(cls):
+        """Loader option that fills registration_count with a correlated COUNT in the same SELECT"""
+        count = select(func.count(Registration.id)).where(
+            Registration.meeting_id == cls.id
+        ).correlate_except(Registration).scalar_subquery()
+        return with_expression(cls.registration_count, count)
+
+    @classmethod
+    @on_primary
+    @with_retry
+    def load(cls, meeting_id):
+        """Load a meeting with its organizer (used by meeting_cache on a miss)"""
+        return cls.query.options(joinedload(cls.organizer)).filter_by(id=meeting_id).first()
+
+    @classmethod
+    @on_primary
+    def load_active(cls):
+        """
+        Load all active meetings, newest first (used by meeting_cache on a miss)
+
+        Raises:
+            OperationalError / CircuitOpenError ถ้า database ใช้งานไม่ได้ (meeting_cache จะใช้ค่าเดิม)
+        """
+        def active_meetings():
+            return cls.query.options(joinedload(cls.organizer)).filter_by(
+                is_active=True
+            ).order_by(cls.created_at.desc()).all()
+
+        return retry(active_meetings)
 
 
 class Registration(db.Model):
@@ -199,6 +213,8 @@ class Registration(db.Model):
     __table_args__ = (
         UniqueConstraint('meeting_id', 'emp_id', name='unique_meeting_employee'),
         Index('idx_registration_time', 'registration_time'),
+        # keyset pagination ของหน้า admin (ORDER BY registration_time DESC, id DESC)
+        Index('idx_registrations_meeting_time_id', 'meeting_id', 'registration_time', 'id'),
     )
     
     def __repr__(self):
@@ -226,6 +242,33 @@ class Registration(db.Model):
             emp_id=emp_id
         ).first() is not None
 
+    @classmethod
+    def create_or_get(cls, meeting_id, emp_id, **fields):
+        """
+        Insert registration with duplicate detection in a single statement
+
+        ใช้ INSERT ... ON CONFLICT (meeting_id, emp_id) DO NOTHING RETURNING
+        จะอ่าน registration เดิมจาก database เฉพาะกรณีที่ลงทะเบียนซ้ำเท่านั้น
+
+        Returns:
+            (registration, created) - registration เป็น object ที่ไม่ผูกกับ session
+        """
+        table = cls.__table__
+        values = dict(fields, meeting_id=meeting_id, emp_id=emp_id)
+
+        stmt = dialect_insert(table).values(**values).on_conflict_do_nothing(
+            index_elements=['meeting_id', 'emp_id']
+        ).returning(*table.c)
+
+        row = db.session.execute(stmt).first()
+        db.session.commit()
+
+        if row is not None:
+            return cls(**row._mapping), True
+
+        existing = cls.query.filter_by(meeting_id=meeting_id, emp_id=emp_id).first()
+        return existing, False
+
 class User(db.Model):
     """User model for meeting organizers"""
     __tablename__ = 'users'
@@ -1,8 +1,16 @@
 # organizer.py - ปรับปรุงใหม่
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify, abort
 from models import db, Meeting, Registration, User
+from db_routing import use_replica
 from functools import wraps
 from datetime import datetime
+import live_feed
+import meeting_cache
+import meeting_warmup
+import registration_stats
+from export_utils import csv_response, iter_registrations, registration_row, xlsx_response
+from pagination import keyset_paginate
+from query_budget import query_budget
 
 organizer_bp = Blueprint('organizer', __name__, url_prefix='/organizer')
 
@@ -19,13 +27,16 @@ def organizer_required(f):
     return decorated_function
 
 @organizer_bp.route('/')
+@use_replica
+@query_budget(2)
 @organizer_required
 def dashboard(current_user):
     """Organizer dashboard"""
     # Get user's meetings
-    meetings = Meeting.query.filter_by(organizer_id=current_user.id).order_by(
-        Meeting.created_at.desc()
-    ).all()
+    # จำนวนผู้ลงทะเบียนมากับ SELECT เดียวกัน (ไม่ COUNT ทีละการประชุม)
+    meetings = Meeting.query.options(Meeting.with_registration_count()).filter_by(
+        organizer_id=current_user.id
+    ).order_by(Meeting.created_at.desc()).all()
     
     return render_template('organizer/dashboard.html', 
                          user=current_user,
@@ -58,6 +69,8 @@ def create_meeting(current_user):
         
         db.session.add(meeting)
         db.session.commit()
+        meeting_cache.invalidate()
+        meeting_warmup.schedule(meeting)
         
         flash('สร้างการประชุมสำเร็จ', 'success')
         return redirect(url_for('organizer.dashboard'))
@@ -65,10 +78,13 @@ def create_meeting(current_user):
     return render_template('organizer/create_meeting.html', current_user=current_user)
 
 @organizer_bp.route('/meeting/<int:meeting_id>/edit', methods=['GET', 'POST'])
+@query_budget(3)
 @organizer_required
 def edit_meeting(meeting_id, current_user):
     """Edit meeting (only owner)"""
-    meeting = Meeting.query.filter_by(id=meeting_id, organizer_id=current_user.id).first_or_404()
+    meeting = Meeting.query.options(Meeting.with_registration_count()).filter_by(
+        id=meeting_id, organizer_id=current_user.id
+    ).first_or_404()
     
     if request.method == 'POST':
         meeting.topic = request.form.get('topic')
@@ -88,6 +104,8 @@ def edit_meeting(meeting_id, current_user):
         meeting.is_active = request.form.get('is_active') == 'on'
         
         db.session.commit()
+        meeting_cache.invalidate()
+        meeting_warmup.schedule(meeting)
         flash('แก้ไขการประชุมสำเร็จ', 'success')
         return redirect(url_for('organizer.dashboard'))
     
@@ -95,94 +113,144 @@ def edit_meeting(meeting_id, current_user):
                          meeting=meeting, 
                          current_user=current_user)
 
+# การเรียงที่รองรับ: ชื่อ -> (คอลัมน์ key, เรียงจากมากไปน้อยเป็นค่าเริ่มต้นหรือไม่)
+REGISTRATION_SORTS = {
+    'time': (Registration.registration_time, True),
+    'name': (Registration.emp_name, False),
+}
+REGISTRATIONS_PAGE_SIZE = 50
+REGISTRATIONS_MAX_PAGE_SIZE = 200
+
+def registration_filters(args):
+    """Normalized sort/filter options from request args (ใช้ทั้งหน้า HTML และ JSON API)"""
+    sort = args.get('sort', 'time')
+    if sort not in REGISTRATION_SORTS:
+        sort = 'time'
+    
+    order = args.get('order')
+    if order not in ('asc', 'desc'):
+        order = 'desc' if REGISTRATION_SORTS[sort][1] else 'asc'
+    
+    entry_type = args.get('type', '')
+    if entry_type not in ('manual', 'auto'):
+        entry_type = ''
+    
+    return {'sort': sort, 'order': order, 'q': args.get('q', '').strip(), 'type': entry_type}
+
+def registrations_page(meeting_id, filters, after=None, per_page=REGISTRATIONS_PAGE_SIZE):
+    """One keyset page of a meeting's registrations"""
+    query = Registration.query.filter_by(meeting_id=meeting_id)
+    
+    if filters['q']:
+        query = query.filter(db.or_(
+            Registration.emp_id.contains(filters['q'], autoescape=True),
+            Registration.emp_name.contains(filters['q'], autoescape=True),
+            Registration.sec_short.contains(filters['q'], autoescape=True),
+            Registration.cc_name.contains(filters['q'], autoescape=True)
+        ))
+    
+    if filters['type'] == 'manual':
+        query = query.filter(Registration.is_manual_entry.is_(True))
+    elif filters['type'] == 'auto':
+        query = query.filter(Registration.is_manual_entry.isnot(True))
+    
+    # id ต่อท้ายเพื่อให้ key unique (เวลา/ชื่อซ้ำกันได้)
+    column = REGISTRATION_SORTS[filters['sort']][0]
+    return keyset_paginate(query, (column, Registration.id), per_page=per_page,
+                           after=after, descending=filters['order'] == 'desc')
+
 @organizer_bp.route('/meeting/<int:meeting_id>/registrations')
+@use_replica
 @organizer_required
 def view_registrations(meeting_id, current_user):
-    """View registrations for organizer's meeting"""
+    """View registrations for organizer's meeting (render เฉพาะหน้าแรก ที่เหลือโหลดผ่าน JSON API)"""
     meeting = Meeting.query.filter_by(id=meeting_id, organizer_id=current_user.id).first_or_404()
     
-    # ดึงข้อมูลผู้ลงทะเบียนทั้งหมด (ไม่ใช้ pagination ก่อน)
-    registrations = Registration.query.filter_by(
-        meeting_id=meeting_id
-    ).order_by(Registration.registration_time.desc()).all()
+    filters = registration_filters(request.args)
+    registrations = registrations_page(meeting_id, filters)
     
     return render_template('organizer/registrations.html', 
                          meeting=meeting, 
                          registrations=registrations,
+                         total=registration_stats.get_stats(meeting_id).total,
+                         filters=filters,
                          current_user=current_user)
 
+@organizer_bp.route('/meeting/<int:meeting_id>/registrations.json')
+@use_replica
+@organizer_required
+def registrations_api(meeting_id, current_user):
+    """
+    Registrations of organizer's meeting (JSON, keyset pagination)
+    
+    Query: after (cursor), limit, sort (time|name), order (asc|desc), q, type (manual|auto)
+    """
+    Meeting.query.filter_by(id=meeting_id, organizer_id=current_user.id).first_or_404()
+    
+    filters = registration_filters(request.args)
+    per_page = min(max(request.args.get('limit', REGISTRATIONS_PAGE_SIZE, type=int), 1),
+                   REGISTRATIONS_MAX_PAGE_SIZE)
+    page = registrations_page(meeting_id, filters, after=request.args.get('after'), per_page=per_page)
+    
+    filtered = bool(filters['q'] or filters['type'])
+    return jsonify({
+        'items': [registration_row(registration) for registration in page.items],
+        'first_index': page.first_index,
+        'has_next': page.has_next,
+        'next_cursor': page.next_cursor,
+        # จำนวนทั้งหมดมีเฉพาะเมื่อไม่ได้กรอง (อ่านจากตัวนับ ไม่ต้อง COUNT)
+        'total': None if filtered else registration_stats.get_stats(meeting_id).total,
+        'filters': filters
+    })
+
+@organizer_bp.route('/meeting/<int:meeting_id>/stream')
+def registrations_stream(meeting_id):
+    """
+    Live registration feed of organizer's meeting (Server-Sent Events)
+    
+    ไม่ใช้ organizer_required เพราะ EventSource ต่อใหม่ทุกไม่กี่วินาที
+    ตรวจสิทธิ์จาก session และ meeting_cache จึงไม่ต้อง query database
+    """
+    if 'user_id' not in session:
+        abort(401)
+    
+    meeting = meeting_cache.get_meeting(meeting_id)
+    if not live_feed.is_enabled() or meeting is None or meeting.organizer_id != session['user_id']:
+        abort(404)
+    return live_feed.stream_response(meeting_id, request.headers.get('Last-Event-ID'))
+
 @organizer_bp.route('/meeting/<int:meeting_id>/export/<format>')
+@use_replica
 @organizer_required
 def export_registrations(meeting_id, format, current_user):
     """Export registrations to CSV or Excel"""
-    import csv
-    import io
-    from flask import send_file
-    
     meeting = Meeting.query.filter_by(id=meeting_id, organizer_id=current_user.id).first_or_404()
-    registrations = Registration.query.filter_by(meeting_id=meeting_id).all()
     
-    if format == 'csv':
-        # Create CSV
-        output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerow(['ลำดับ', 'รหัสพนักงาน', 'ชื่อ', 'ตำแหน่ง', 'หน่วยงาน', 'ศูนย์ต้นทุน', 'เวลาลงทะเบียน', 'ลงทะเบียนด้วยตนเอง'])
-        
-        for idx, reg in enumerate(registrations, 1):
-            writer.writerow([
-                idx, 
-                reg.emp_id or '', 
+    def rows():
+        for idx, reg in enumerate(iter_registrations(meeting_id), 1):
+            yield [
+                idx,
+                reg.emp_id or '',
                 reg.emp_name,
-                reg.position or '', 
+                reg.position or '',
                 reg.sec_short or '',
                 reg.cc_name or '',
                 reg.registration_time.strftime('%Y-%m-%d %H:%M:%S'),
                 'ใช่' if reg.is_manual_entry else 'ไม่'
-            ])
-        
-        output.seek(0)
-        output_bytes = io.BytesIO()
-        output_bytes.write(output.getvalue().encode('utf-8-sig'))
-        output_bytes.seek(0)
+            ]
+    
+    if format == 'csv':
+        header = ['ลำดับ', 'รหัสพนักงาน', 'ชื่อ', 'ตำแหน่ง', 'หน่วยงาน', 'ศูนย์ต้นทุน', 'เวลาลงทะเบียน', 'ลงทะเบียนด้วยตนเอง']
         
-        return send_file(
-            output_bytes,
-            mimetype='text/csv',
-            as_attachment=True,
-            download_name=f"registrations_{meeting.topic}_{meeting.meeting_date}.csv"
-        )
+        return csv_response(header, rows(),
+                            f"registrations_{meeting.topic}_{meeting.meeting_date}.csv")
     
     elif format == 'excel':
-        # Create Excel using pandas
-        import pandas as pd
-        
-        data = []
-        for idx, reg in enumerate(registrations, 1):
-            data.append({
-                'ลำดับ': idx,
-                'รหัสพนักงาน': reg.emp_id or '',
-                'ชื่อ-สกุล': reg.emp_name,
-                'ตำแหน่ง': reg.position or '',
-                'ส่วนงาน': reg.sec_short or '',
-                'ศูนย์ต้นทุน': reg.cc_name or '',
-                'เวลาลงทะเบียน': reg.registration_time.strftime('%Y-%m-%d %H:%M:%S'),
-                'ลงทะเบียนด้วยตนเอง': 'ใช่' if reg.is_manual_entry else 'ไม่'
-            })
-        
-        df = pd.DataFrame(data)
+        header = ['ลำดับ', 'รหัสพนักงาน', 'ชื่อ-สกุล', 'ตำแหน่ง', 'ส่วนงาน', 'ศูนย์ต้นทุน', 'เวลาลงทะเบียน', 'ลงทะเบียนด้วยตนเอง']
         
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='รายชื่อผู้ลงทะเบียน')
-        
-        output.seek(0)
-        
-        return send_file(
-            output,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            as_attachment=True,
-            download_name=f"registrations_{meeting.topic}_{meeting.meeting_date}.xlsx"
-        )
+        return xlsx_response(header, rows(),
+                             f"registrations_{meeting.topic}_{meeting.meeting_date}.xlsx",
+                             sheet_name='รายชื่อผู้ลงทะเบียน')
     
     flash('รูปแบบไฟล์ไม่ถูกต้อง', 'error')
     return redirect(url_for('organizer.view_registrations', meeting_id=meeting_id))
\ No newline at end of file
@@ -0,0 +1,180 @@
+# pagination.py
+"""
+Keyset (cursor) pagination for long admin listings
+
+แทน paginate() ที่ใช้ OFFSET + COUNT(*) ทุกหน้า: แต่ละหน้าอ่านต่อจากค่า key ของแถวสุดท้าย
+(WHERE (key) < (cursor) ORDER BY key LIMIT n+1) จึงใช้ index ได้ตรง ๆ
+และหน้าที่ลึกแค่ไหนก็ใช้เวลาเท่าหน้าแรก
+
+cursor เป็น base64 ของ JSON (ค่า key + ลำดับของแถว) ส่งใน URL เป็น ?after= หรือ ?before=
+"""
+
+import base64
+import hashlib
+import json
+import logging
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+from db_routing import primary
+from extensions import cache
+
+logger = logging.getLogger(__name__)
+
+# เวลาที่ cache ค่าประมาณจำนวนแถว (วินาที)
+COUNT_ESTIMATE_TIMEOUT = 300
+
+
+def encode_cursor(values, position):
+    """Opaque URL-safe cursor for a row's key values"""
+    data = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps({'k': data, 'n': position}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, columns):
+    """
+    Decode a cursor back into typed key values
+
+    Returns:
+        (values, position) หรือ None ถ้า cursor ไม่ถูกต้อง
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        data = json.loads(raw)
+        values = []
+        for column, value in zip(columns, data['k'], strict=True):
+            if value is not None and column.type.python_type is datetime:
+                value = datetime.fromisoformat(value)
+            values.append(value)
+        return values, int(data['n'])
+    except (ValueError, KeyError, TypeError, NotImplementedError) as e:
+        logger.debug(f"Invalid pagination cursor {cursor!r}: {e}")
+        return None
+
+
+class KeysetPage:
+    """
+    One page of a keyset-paginated query
+
+    Attributes:
+        items: แถวในหน้านี้ (เรียงตาม key)
+        first_index: ลำดับ (เริ่มที่ 1) ของแถวแรกในหน้า ใช้แสดงเลขลำดับ
+        next_cursor / prev_cursor: ค่าสำหรับ ?after= / ?before= (None ถ้าไม่มีหน้าถัดไป/ก่อนหน้า)
+        total: จำนวนทั้งหมด (ถ้าผู้เรียกกำหนด) และ total_is_estimate
+    """
+
+    def __init__(self, items, columns, per_page, first_index, has_next, has_prev):
+        self.items = items
+        self.per_page = per_page
+        self.first_index = first_index
+        self.has_next = has_next
+        self.has_prev = has_prev
+        self.total = None
+        self.total_is_estimate = False
+
+        keys = [column.key for column in columns]
+        self.next_cursor = None
+        self.prev_cursor = None
+        if items and has_next:
+            self.next_cursor = encode_cursor([getattr(items[-1], key) for key in keys],
+                                             first_index + len(items) - 1)
+        if items and has_prev:
+            self.prev_cursor = encode_cursor([getattr(items[0], key) for key in keys], first_index)
+
+    @property
+    def last_index(self):
+        return self.first_index + len(self.items) - 1
+
+
+def keyset_paginate(query, columns, per_page=50, after=None, before=None, descending=False):
+    """
+    Fetch one page of query ordered by columns (ซึ่งรวมกันต้อง unique เช่น (registration_time, id))
+
+    Args:
+        query: SQLAlchemy query (ยังไม่ order_by)
+        columns: คอลัมน์ key เรียงตามลำดับความสำคัญ
+        after: cursor ของแถวสุดท้ายในหน้าก่อน (หน้าถัดไป)
+        before: cursor ของแถวแรกในหน้าหลัง (หน้าก่อนหน้า)
+        descending: เรียงจากมากไปน้อยทุกคอลัมน์
+
+    Returns:
+        KeysetPage
+    """
+    key = tuple_(*columns)
+
+    cursor = None
+    backwards = False
+    if before:
+        cursor = decode_cursor(before, columns)
+        backwards = cursor is not None
+    if cursor is None and after:
+        cursor = decode_cursor(after, columns)
+
+    # การย้อนกลับ (?before=) คือการอ่านในทิศตรงข้ามแล้วกลับลำดับผลลัพธ์
+    reverse = descending != backwards
+
+    if cursor is None:
+        position = 0
+    else:
+        values, position = cursor
+        query = query.filter(key < tuple_(*values) if reverse else key > tuple_(*values))
+
+    query = query.order_by(*[column.desc() if reverse else column.asc() for column in columns])
+
+    rows = query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    if backwards:
+        rows.reverse()
+        first_index = max(position - len(rows), 1)
+        # ถ้าย้อนจนถึงแถวแรก ให้ลำดับเริ่มที่ 1 เสมอ
+        if not has_more:
+            first_index = 1
+        return KeysetPage(rows, columns, per_page, first_index,
+                          has_next=True, has_prev=has_more)
+
+    return KeysetPage(rows, columns, per_page, position + 1,
+                      has_next=has_more, has_prev=cursor is not None)
+
+
+def estimate_count(query):
+    """
+    Approximate row count of a query, cached for COUNT_ESTIMATE_TIMEOUT
+
+    PostgreSQL ใช้จำนวนแถวที่ planner ประมาณจาก EXPLAIN (ไม่ต้อง scan ตาราง)
+    database อื่นใช้ COUNT(*) แต่ยัง cache ไว้เหมือนกัน
+    """
+    session = query.session
+    dialect = session.get_bind().dialect
+
+    compiled = query.statement.compile(dialect=dialect)
+    params = compiled.params
+    key = 'count_estimate:' + hashlib.sha1(
+        f"{compiled}\0{sorted(params.items())}".encode('utf-8')
+    ).hexdigest()
+
+    try:
+        count = cache.get(key)
+        if count is not None:
+            return count
+    except Exception as e:
+        logger.warning(f"Cannot read count estimate: {e}")
+
+    # ผลถูก cache ใช้ร่วมกันทุก request จึงนับจาก primary (ดู db_routing)
+    with primary():
+        if dialect.name == 'postgresql':
+            plan = session.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", params).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            count = int(plan[0]['Plan']['Plan Rows'])
+        else:
+            count = query.order_by(None).count()
+
+    try:
+        cache.set(key, count, timeout=COUNT_ESTIMATE_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"Cannot cache count estimate: {e}")
+    return count
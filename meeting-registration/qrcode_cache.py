@@ -0,0 +1,83 @@
+# qrcode_cache.py
+"""
+Content-addressed QR Code PNG cache
+
+PNG ที่สร้างแล้วถูกเก็บใน Redis โดยใช้ hash ของ (registration URL, logo path,
+logo mtime, scale) เป็น key ภาพเดิมจะไม่ถูกสร้างใหม่จนกว่าข้อมูลเหล่านี้จะเปลี่ยน
+และ hash เดียวกันใช้เป็น ETag ของ endpoint รูปภาพ
+
+ควรตั้ง maxmemory-policy ของ Redis เป็น allkeys-lru (หรือ volatile-lru) เพื่อให้
+ภาพที่ไม่ได้ใช้นานถูก evict ก่อน นอกเหนือจาก QR_CACHE_TTL
+"""
+
+import hashlib
+import logging
+import os
+from io import BytesIO
+
+from flask import current_app
+from redis.exceptions import RedisError
+
+from extensions import redis_store
+from qrcode_utils import generate_qr_code
+
+logger = logging.getLogger(__name__)
+
+QR_KEY = 'qr_png'
+DEFAULT_SCALE = 8
+
+
+def fingerprint(registration_url, logo_path=None, scale=DEFAULT_SCALE):
+    """
+    Content hash of everything that affects the PNG (ใช้เป็นทั้ง cache key และ ETag)
+    """
+    logo_mtime = None
+    if logo_path:
+        try:
+            logo_mtime = os.path.getmtime(logo_path)
+        except OSError:
+            logo_path = None
+
+    raw = f"{registration_url}\0{logo_path}\0{logo_mtime}\0{scale}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+
+
+def _render(registration_url, logo_path, scale):
+    img = generate_qr_code(registration_url, with_logo=bool(logo_path), logo_path=logo_path, scale=scale)
+    buffered = BytesIO()
+    img.save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+def get_png(registration_url, logo_path=None, scale=DEFAULT_SCALE, digest=None):
+    """
+    Get QR Code PNG bytes (generate only on cache miss)
+
+    Args:
+        registration_url: URL ที่อยู่ใน QR Code
+        logo_path: path ของ logo (None = ไม่มี logo)
+        scale: pixels ต่อ module
+        digest: ค่า fingerprint ที่คำนวณไว้แล้ว (ถ้ามี)
+
+    Returns:
+        (png_bytes, digest)
+    """
+    digest = digest or fingerprint(registration_url, logo_path, scale)
+    key = redis_store.key(QR_KEY, digest)
+
+    try:
+        png = redis_store.get(key)
+        if png is not None:
+            return png, digest
+    except RedisError as e:
+        logger.warning(f"QR cache read failed: {e}")
+
+    png = _render(registration_url, logo_path, scale)
+    logger.debug(f"Generated QR PNG for {registration_url} ({len(png)} bytes)")
+
+    try:
+        redis_store.set(key, png, ex=current_app.config.get('QR_CACHE_TTL', 2592000))
+    except RedisError as e:
+        logger.warning(f"QR cache write failed: {e}")
+
+    return png, digest
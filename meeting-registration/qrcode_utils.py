@@ -6,11 +6,60 @@ from PIL import Image, ImageDraw
 from qrcodegen import QrCode
 import os
 import logging
+from functools import lru_cache
 
 # Setup logger
 logger = logging.getLogger(__name__)
 
-def generate_qr_code(data: str, with_logo: bool = False, logo_path: str = None):
+def rasterize_qr(qr: QrCode, scale: int = 8):
+    """
+    Render a QrCode as an RGB image (black modules on white, no border)
+    
+    สร้าง module matrix เป็น bytes หนึ่งครั้ง แล้วขยายด้วย nearest-neighbour resize
+    ครั้งเดียว แทนการเรียก putpixel ทีละ pixel
+    
+    Args:
+        qr: Encoded QrCode
+        scale: Pixels per module
+    
+    Returns:
+        PIL Image object (RGB)
+    """
+    size = qr.get_size()
+    modules = bytes(
+        0 if qr.get_module(x, y) else 255
+        for y in range(size)
+        for x in range(size)
+    )
+    img = Image.frombytes('L', (size, size), modules)
+    img = img.resize((size * scale, size * scale), Image.Resampling.NEAREST)
+    return img.convert("RGB")
+
+@lru_cache(maxsize=8)
+def _load_scaled_logo(logo_path: str, mtime: float, max_logo_size: int):
+    """
+    Open and resize the logo (cached per file version and target size)
+    
+    mtime เป็นส่วนหนึ่งของ cache key เพื่อให้โหลดใหม่เมื่อไฟล์ logo ถูกเปลี่ยน
+    """
+    logo = Image.open(logo_path)
+    
+    # Maintain logo ratio
+    logo_width, logo_height = logo.size
+    logo_ratio = logo_width / logo_height
+    
+    if logo_width > logo_height:
+        new_logo_width = max_logo_size
+        new_logo_height = int(max_logo_size / logo_ratio)
+    else:
+        new_logo_height = max_logo_size
+        new_logo_width = int(max_logo_size * logo_ratio)
+    
+    logo = logo.resize((new_logo_width, new_logo_height), Image.Resampling.LANCZOS)
+    logger.info(f"Logo resized to: {new_logo_width}x{new_logo_height}")
+    return logo
+
+def generate_qr_code(data: str, with_logo: bool = False, logo_path: str = None, scale: int = 8):
     """
     Generate QR Code with optional logo
     
@@ -18,6 +67,7 @@ def generate_qr_code(data: str, with_logo: bool = False, logo_path: str = None):
         data: Text or URL to encode
         with_logo: Whether to add logo
         logo_path: Path to logo file
+        scale: Pixels per module
     
     Returns:
         PIL Image object
@@ -26,21 +76,8 @@ def generate_qr_code(data: str, with_logo: bool = False, logo_path: str = None):
     
     # Generate QR Code with high error correction for logo overlay
     qr = QrCode.encode_text(data, QrCode.Ecc.QUARTILE)
-    size = qr.get_size()
-    scale = 8
-    img_size = size * scale
-    img = Image.new('1', (img_size, img_size), 'white')
-    
-    # Draw QR Code
-    for y in range(size):
-        for x in range(size):
-            if qr.get_module(x, y):
-                for dy in range(scale):
-                    for dx in range(scale):
-                        img.putpixel((x * scale + dx, y * scale + dy), 0)
-    
-    # Convert to RGB
-    img = img.convert("RGB")
+    img = rasterize_qr(qr, scale)
+    img_size = img.size[0]
     
     # Add logo if requested and file exists
     if with_logo:
@@ -50,23 +87,9 @@ def generate_qr_code(data: str, with_logo: bool = False, logo_path: str = None):
             if os.path.exists(logo_path):
                 logger.info(f"Logo file found at: {logo_path}")
                 try:
-                    logo = Image.open(logo_path)
-                    logger.info(f"Logo opened successfully - size: {logo.size}, mode: {logo.mode}")
-                    
-                    # Maintain logo ratio
-                    logo_width, logo_height = logo.size
-                    logo_ratio = logo_width / logo_height
-                    max_logo_size = img_size // 5
-                    
-                    if logo_width > logo_height:
-                        new_logo_width = max_logo_size
-                        new_logo_height = int(max_logo_size / logo_ratio)
-                    else:
-                        new_logo_height = max_logo_size
-                        new_logo_width = int(max_logo_size * logo_ratio)
-                    
-                    logo = logo.resize((new_logo_width, new_logo_height), Image.Resampling.LANCZOS)
-                    logger.info(f"Logo resized to: {new_logo_width}x{new_logo_height}")
+                    logo = _load_scaled_logo(logo_path, os.path.getmtime(logo_path), img_size // 5)
+                    new_logo_width, new_logo_height = logo.size
+                    logger.info(f"Logo ready - size: {logo.size}, mode: {logo.mode}")
                     
                     # Add white background padding around logo
                     padding = 10
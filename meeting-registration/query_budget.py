@@ -0,0 +1,117 @@
+# query_budget.py
+"""
+Count SQL statements and enforce per-view query budgets
+
+ใช้จับ N+1 query (เช่น COUNT หรือ lazy load ต่อแถวใน template) ไม่ให้กลับมาอีก:
+
+    # ใน test / shell
+    with assert_max_queries(2):
+        client.get('/organizer/')
+
+    # ที่ view (ไว้เหนือ decorator ตรวจสิทธิ์ เพื่อให้นับ query ของการ login ด้วย)
+    # จำนวน query ต้องคงที่ไม่ว่าจะมีกี่แถว
+    @organizer_bp.route('/')
+    @query_budget(2)
+    @organizer_required
+    def dashboard(current_user): ...
+
+@query_budget ทำงานตาม config QUERY_BUDGET:
+  'off'   ไม่นับ (production default)
+  'warn'  log warning พร้อม SQL ที่รัน (development)
+  'raise' raise QueryBudgetExceeded (testing)
+"""
+
+import logging
+import threading
+from functools import wraps
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A block ran more SQL statements than its budget"""
+
+
+class QueryCounter:
+    """
+    Context manager that records SQL statements run by the current thread
+
+    Attributes:
+        statements: SQL ที่รันภายใน block (เรียงตามลำดับ)
+    """
+
+    def __init__(self):
+        self.statements = []
+        self._thread = None
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # นับเฉพาะ thread ของ request นี้ (worker อื่นใช้ engine เดียวกัน)
+        if threading.get_ident() == self._thread:
+            self.statements.append(statement)
+
+    def __enter__(self):
+        self._thread = threading.get_ident()
+        event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        event.remove(Engine, 'before_cursor_execute', self._before_cursor_execute)
+        return False
+
+    def report(self):
+        return '\n'.join(f"  {idx}. {' '.join(sql.split())[:200]}"
+                         for idx, sql in enumerate(self.statements, 1))
+
+
+class assert_max_queries(QueryCounter):
+    """
+    QueryCounter that raises QueryBudgetExceeded if the block runs more than limit statements
+
+    Args:
+        limit: จำนวน statement สูงสุด
+        label: ชื่อที่แสดงในข้อความ error (default: "block")
+    """
+
+    def __init__(self, limit, label='block'):
+        super().__init__()
+        self.limit = limit
+        self.label = label
+
+    def __exit__(self, exc_type, exc, tb):
+        super().__exit__(exc_type, exc, tb)
+        if exc_type is None and self.count > self.limit:
+            raise QueryBudgetExceeded(
+                f"{self.label} ran {self.count} queries (budget {self.limit}):\n{self.report()}"
+            )
+        return False
+
+
+def query_budget(limit):
+    """View decorator: check the number of SQL statements per request against limit (ดู QUERY_BUDGET)"""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            mode = current_app.config.get('QUERY_BUDGET', 'off')
+            if mode == 'off':
+                return f(*args, **kwargs)
+
+            label = f"{f.__module__}.{f.__name__}"
+            if mode == 'raise':
+                with assert_max_queries(limit, label):
+                    return f(*args, **kwargs)
+
+            with QueryCounter() as counter:
+                response = f(*args, **kwargs)
+            if counter.count > limit:
+                logger.warning(f"{label} ran {counter.count} queries (budget {limit}):\n{counter.report()}")
+            return response
+        return decorated_function
+    return decorator
@@ -0,0 +1,311 @@
+# registration_buffer.py
+"""
+Write-behind buffer for registration bursts
+
+เมื่อเปิด REGISTRATION_WRITE_BEHIND การลงทะเบียนจะถูกเขียนลง Redis Stream
+และตอบผู้ใช้ทันที จากนั้น RQ worker จะ flush ลงตาราง registrations
+เป็น batch (multi-row INSERT ... ON CONFLICT DO NOTHING) ทำให้ commit
+หนึ่งครั้งต่อหลายคนแทนที่จะเป็นหนึ่งครั้งต่อคน
+
+Stream ใช้ consumer group ดังนั้นรายการที่ worker อ่านไปแล้วแต่ยัง flush
+ไม่สำเร็จ (เช่น worker ตาย) จะถูก claim กลับมา flush ใหม่ในรอบถัดไป
+และจะมีการ schedule flush รอบถัดไปตราบใดที่ stream ยังมีรายการค้างอยู่
+
+ถ้า INSERT ทั้ง batch ล้มเหลวด้วยข้อผิดพลาดที่ไม่ใช่ชั่วคราว (เช่น ข้อมูลผิด constraint)
+จะลอง insert ทีละแถว แถวที่ยังล้มเหลวถูกย้ายไป dead-letter stream
+(registration_dead_letter) แล้ว ack และถอนออกจาก registered set
+เพื่อให้พนักงานคนนั้นลงทะเบียนใหม่ได้ และไม่ขวางรายการอื่นใน stream
+"""
+
+import json
+import logging
+import os
+import socket
+import time
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from redis.exceptions import RedisError, ResponseError
+
+import live_feed
+import registration_cache
+import registration_stats
+from db_resilience import TRANSIENT_ERRORS, CircuitOpenError
+from extensions import redis_store
+
+logger = logging.getLogger(__name__)
+
+STREAM_KEY = 'registration_stream'
+GROUP_NAME = 'registration_flushers'
+FLUSH_SCHEDULED_KEY = 'registration_flush_scheduled'
+STATS_KEY = 'registration_flush_stats'
+DEAD_LETTER_KEY = 'registration_dead_letter'
+
+# ระยะเวลาสูงสุดที่ถือว่ามี flush job รออยู่ในคิวแล้ว (กันกรณี worker ไม่เคยหยิบ job ไปทำ)
+FLUSH_SCHEDULE_TTL = 30
+
+_group_ready = False
+
+
+def is_enabled():
+    return current_app.config.get('REGISTRATION_WRITE_BEHIND', False)
+
+
+def _ensure_group(force=False):
+    global _group_ready
+    if _group_ready and not force:
+        return
+    try:
+        redis_store.xgroup_create(redis_store.key(STREAM_KEY), GROUP_NAME, id='0', mkstream=True)
+    except ResponseError as e:
+        if 'BUSYGROUP' not in str(e):
+            raise
+    _group_ready = True
+
+
+def accept(meeting_id, emp_id, **fields):
+    """
+    Accept a registration into the buffer
+
+    Returns:
+        (registration, created) - registration เป็น object ชั่วคราว (ยังไม่มี id)
+        created เป็น False ถ้ารหัสนี้ลงทะเบียนไว้แล้วหรือรอ flush อยู่
+
+    Raises:
+        RedisError ถ้า Redis ใช้งานไม่ได้ (ผู้เรียกควร fallback ไปเขียน database ตรง)
+    """
+    from models import Registration
+
+    _ensure_group()
+
+    registration_time = datetime.now(timezone.utc).replace(tzinfo=None)
+    registration = Registration(**dict(fields, meeting_id=meeting_id, emp_id=emp_id,
+                                       registration_time=registration_time))
+
+    # ป้องกันการสแกนซ้ำ (รวมถึงรายการที่ยังรอ flush) ด้วย registered set ของการประชุม
+    if not registration_cache.claim(registration):
+        return None, False
+
+    payload = dict(fields, meeting_id=meeting_id, emp_id=emp_id,
+                   registration_time=registration_time.isoformat())
+
+    redis_store.xadd(redis_store.key(STREAM_KEY), {'data': json.dumps(payload, ensure_ascii=False)})
+    schedule_flush()
+
+    return registration, True
+
+
+def schedule_flush(delay=0):
+    """
+    Enqueue one flush job for the current burst (subsequent accepts join the same batch)
+
+    Args:
+        delay: วินาทีก่อนเริ่ม flush (ใช้เมื่อ flush รอบก่อนยังเหลือรายการค้าง)
+    """
+    scheduled = redis_store.set(redis_store.key(FLUSH_SCHEDULED_KEY), 1, nx=True,
+                                ex=FLUSH_SCHEDULE_TTL + delay)
+    if scheduled:
+        from tasks import default_queue, flush_registrations_task
+        if delay:
+            default_queue.enqueue_in(timedelta(seconds=delay), flush_registrations_task)
+        else:
+            default_queue.enqueue(flush_registrations_task)
+
+
+def _has_pending(stream):
+    """True ถ้ายังมีรายการที่ไม่ได้ ack (ทั้งที่ยังไม่ถูกอ่านและที่ค้างอยู่กับ consumer)"""
+    return redis_store.xlen(stream) > 0
+
+
+def _decode(fields):
+    data = fields.get(b'data') or fields.get('data')
+    if isinstance(data, bytes):
+        data = data.decode('utf-8')
+    payload = json.loads(data)
+    payload['registration_time'] = datetime.fromisoformat(payload['registration_time'])
+    return payload
+
+
+def _insert_batch(rows):
+    """Multi-row insert that skips rows violating unique_meeting_employee"""
+    from models import db, Registration, dialect_insert
+
+    table = Registration.__table__
+
+    # ตัดรายการซ้ำภายใน batch เดียวกันออกก่อน (ON CONFLICT ใช้กับแถวซ้ำใน statement เดียวกันไม่ได้)
+    unique_rows = {}
+    for row in rows:
+        unique_rows.setdefault((row['meeting_id'], row['emp_id']), row)
+
+    stmt = dialect_insert(table).values(list(unique_rows.values())).on_conflict_do_nothing(
+        index_elements=['meeting_id', 'emp_id']
+    ).returning(*table.c)
+
+    inserted = db.session.execute(stmt).fetchall()
+    db.session.commit()
+    return [Registration(**row._mapping) for row in inserted]
+
+
+def _dead_letter(stream, entry_id, row, error):
+    """Move an entry that cannot be inserted out of the stream and release its claim"""
+    payload = dict(row, registration_time=row['registration_time'].isoformat())
+    redis_store.xadd(redis_store.key(DEAD_LETTER_KEY), {
+        'entry_id': entry_id,
+        'data': json.dumps(payload, ensure_ascii=False),
+        'error': str(error)[:1000],
+        'failed_at': datetime.now(timezone.utc).isoformat(),
+    })
+    redis_store.xack(stream, GROUP_NAME, entry_id)
+    redis_store.xdel(stream, entry_id)
+    registration_cache.release(row['meeting_id'], row['emp_id'])
+    redis_store.hincrby(redis_store.key(STATS_KEY), 'dead_lettered', 1)
+    logger.error(f"Registration {row['meeting_id']}/{row['emp_id']} moved to dead letter: {error}")
+
+
+def _insert_one_by_one(stream, pending, rows):
+    """
+    Fallback หลัง INSERT ทั้ง batch ล้มเหลว: insert ทีละแถว แถวที่ล้มเหลวไป dead letter
+
+    Returns:
+        list of Registration ที่ insert สำเร็จ
+
+    Raises:
+        ข้อผิดพลาดชั่วคราวของ database (รายการที่ทำไปแล้วถูก ack ก่อน ส่วนที่เหลือรอ flush รอบถัดไป)
+    """
+    from models import db
+
+    inserted = []
+    for (entry_id, _), row in zip(pending, rows):
+        try:
+            inserted += _insert_batch([row])
+        except (*TRANSIENT_ERRORS, CircuitOpenError):
+            db.session.rollback()
+            raise
+        except Exception as e:
+            db.session.rollback()
+            _dead_letter(stream, entry_id, row, e)
+            continue
+        redis_store.xack(stream, GROUP_NAME, entry_id)
+        redis_store.xdel(stream, entry_id)
+    return inserted
+
+
+def flush(batch_size=None, on_inserted=None):
+    """
+    Drain the stream into the registrations table
+
+    Args:
+        batch_size: จำนวนรายการต่อ INSERT หนึ่งครั้ง
+        on_inserted: callback(list of Registration) สำหรับรายการที่ insert สำเร็จ
+
+    Returns:
+        จำนวนแถวที่ insert จริง
+    """
+    stream = redis_store.key(STREAM_KEY)
+
+    _ensure_group(force=True)
+
+    # อนุญาตให้ schedule flush รอบใหม่ได้ รายการที่เข้ามาหลังจากนี้จะถูก flush ในรอบนี้หรือรอบถัดไป
+    redis_store.delete(redis_store.key(FLUSH_SCHEDULED_KEY))
+
+    try:
+        return _drain(stream, batch_size, on_inserted)
+    finally:
+        # flush ล้มเหลวกลางทาง หรือมีรายการที่ consumer อื่นถืออยู่: ลองใหม่ภายหลัง
+        if _has_pending(stream):
+            schedule_flush(delay=current_app.config.get('REGISTRATION_FLUSH_RETRY_SECONDS', 30))
+
+
+def _drain(stream, batch_size, on_inserted):
+    from models import db
+
+    batch_size = batch_size or current_app.config.get('REGISTRATION_FLUSH_BATCH_SIZE', 500)
+    consumer = f"{socket.gethostname()}-{os.getpid()}"
+
+    # รายการที่ consumer อื่นอ่านไปแล้วแต่ไม่ได้ ack เกินเวลาที่กำหนด
+    min_idle_ms = current_app.config.get('REGISTRATION_FLUSH_RECLAIM_MS', 60000)
+    reclaimed = redis_store.xautoclaim(stream, GROUP_NAME, consumer, min_idle_ms, '0-0', count=batch_size)
+    pending = [(entry_id, fields) for entry_id, fields in reclaimed[1] if fields]
+
+    total_inserted = 0
+    while True:
+        if not pending:
+            response = redis_store.xreadgroup(GROUP_NAME, consumer, {stream: '>'}, count=batch_size)
+            if not response:
+                break
+            pending = response[0][1]
+
+        entry_ids = [entry_id for entry_id, _ in pending]
+        rows = [_decode(fields) for _, fields in pending]
+
+        try:
+            inserted = _insert_batch(rows)
+        except (*TRANSIENT_ERRORS, CircuitOpenError) as e:
+            db.session.rollback()
+            logger.error(f"Registration flush failed ({len(rows)} rows), will retry: {e}")
+            raise
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"Registration batch insert failed ({len(rows)} rows), inserting one by one: {e}")
+            inserted = _insert_one_by_one(stream, pending, rows)
+        else:
+            redis_store.xack(stream, GROUP_NAME, *entry_ids)
+            redis_store.xdel(stream, *entry_ids)
+
+        total_inserted += len(inserted)
+        registration_stats.record(inserted)
+        live_feed.publish_registrations(inserted)
+        redis_store.hset(redis_store.key(STATS_KEY), mapping={
+            'last_flush_at': time.time(),
+            'last_flush_rows': len(rows),
+        })
+        redis_store.hincrby(redis_store.key(STATS_KEY), 'total_flushed', len(inserted))
+
+        if len(inserted) < len(rows):
+            logger.info(f"Registration flush skipped {len(rows) - len(inserted)} duplicate or failed rows")
+
+        if on_inserted and inserted:
+            on_inserted(inserted)
+
+        pending = []
+
+    return total_inserted
+
+
+def get_metrics():
+    """
+    Flush-lag metrics
+
+    - pending: จำนวนรายการใน stream ที่ยังไม่ได้เขียนลง database
+    - lag_seconds: อายุของรายการที่เก่าที่สุดที่ยังไม่ได้ flush
+    - dead_letter: จำนวนรายการที่ insert ไม่ได้และรอตรวจสอบใน dead-letter stream
+    """
+    try:
+        stream = redis_store.key(STREAM_KEY)
+        pending = redis_store.xlen(stream)
+        lag_seconds = 0.0
+        if pending:
+            oldest = redis_store.xrange(stream, count=1)
+            if oldest:
+                entry_id = oldest[0][0]
+                if isinstance(entry_id, bytes):
+                    entry_id = entry_id.decode()
+                oldest_ms = int(entry_id.split('-')[0])
+                lag_seconds = max(0.0, time.time() - oldest_ms / 1000.0)
+
+        stats = {
+            (k.decode() if isinstance(k, bytes) else k): float(v)
+            for k, v in redis_store.hgetall(redis_store.key(STATS_KEY)).items()
+        }
+        return {
+            'enabled': is_enabled(),
+            'pending': pending,
+            'lag_seconds': round(lag_seconds, 3),
+            'last_flush_at': stats.get('last_flush_at'),
+            'last_flush_rows': int(stats.get('last_flush_rows', 0)),
+            'total_flushed': int(stats.get('total_flushed', 0)),
+            'dead_letter': redis_store.xlen(redis_store.key(DEAD_LETTER_KEY)),
+        }
+    except RedisError as e:
+        logger.warning(f"Cannot read registration buffer metrics: {e}")
+        return {'enabled': is_enabled(), 'error': str(e)}
@@ -0,0 +1,136 @@
+# registration_cache.py
+"""
+Per-meeting registered set in Redis
+
+เก็บ Redis hash ต่อการประชุม: emp_id -> สรุปข้อมูลการลงทะเบียน (JSON)
+ใช้ตอบการสแกนซ้ำและ /api/registration_status โดยไม่ต้องถาม PostgreSQL
+
+Hash จะถูกสร้างจากตาราง registrations เมื่อถูกใช้ครั้งแรก (lazy rebuild)
+และเพิ่มรายการทุกครั้งที่ insert สำเร็จ field พิเศษ __loaded__ บอกว่า
+hash มีข้อมูลครบตาม database แล้ว ถ้าไม่มี field นี้ต้อง rebuild ก่อนใช้
+"""
+
+import json
+import logging
+
+from flask import current_app
+from redis.exceptions import RedisError
+
+from db_routing import on_primary
+from extensions import redis_store
+
+logger = logging.getLogger(__name__)
+
+REGISTERED_KEY = 'registered'
+LOADED_FIELD = '__loaded__'
+
+
+def _key(meeting_id):
+    return redis_store.key(REGISTERED_KEY, meeting_id)
+
+
+def summarize(registration):
+    """Compact summary stored in the hash (same keys as registration_data in templates)"""
+    return {
+        'emp_id': registration.emp_id,
+        'emp_name': registration.emp_name,
+        'position': registration.position,
+        'sec_short': registration.sec_short,
+        'cc_name': registration.cc_name,
+        'registration_time': registration.registration_time.isoformat() if registration.registration_time else None,
+        'is_manual_entry': bool(registration.is_manual_entry),
+    }
+
+
+@on_primary
+def _rebuild(meeting_id):
+    """Load every registration of the meeting into the hash"""
+    from models import db, Registration
+
+    rows = db.session.query(
+        Registration.emp_id,
+        Registration.emp_name,
+        Registration.position,
+        Registration.sec_short,
+        Registration.cc_name,
+        Registration.registration_time,
+        Registration.is_manual_entry
+    ).filter_by(meeting_id=meeting_id).all()
+
+    mapping = {
+        row.emp_id: json.dumps(summarize(row), ensure_ascii=False)
+        for row in rows if row.emp_id
+    }
+    mapping[LOADED_FIELD] = '1'
+
+    key = _key(meeting_id)
+    pipe = redis_store.pipeline()
+    pipe.hset(key, mapping=mapping)
+    pipe.expire(key, current_app.config.get('REGISTRATION_CACHE_TTL', 86400))
+    pipe.execute()
+    logger.debug(f"Rebuilt registered set for meeting {meeting_id}: {len(mapping) - 1} entries")
+
+
+def ensure_loaded(meeting_id):
+    if not redis_store.hexists(_key(meeting_id), LOADED_FIELD):
+        _rebuild(meeting_id)
+
+
+def get(meeting_id, emp_id):
+    """
+    Look up a registration summary
+
+    Returns:
+        summary dict ถ้าลงทะเบียนแล้ว, None ถ้ายังไม่ได้ลงทะเบียน
+
+    Raises:
+        RedisError ถ้า Redis ใช้งานไม่ได้ (ผู้เรียกควร fallback ไปถาม database)
+    """
+    value, loaded = redis_store.hmget(_key(meeting_id), [emp_id, LOADED_FIELD])
+    if value is None and loaded is None:
+        _rebuild(meeting_id)
+        value = redis_store.hget(_key(meeting_id), emp_id)
+
+    return json.loads(value) if value is not None else None
+
+
+def add(registration):
+    """Record a successful insert"""
+    key = _key(registration.meeting_id)
+    try:
+        pipe = redis_store.pipeline()
+        pipe.hset(key, registration.emp_id, json.dumps(summarize(registration), ensure_ascii=False))
+        pipe.expire(key, current_app.config.get('REGISTRATION_CACHE_TTL', 86400))
+        pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Cannot update registered set for meeting {registration.meeting_id}: {e}")
+        invalidate(registration.meeting_id)
+
+
+def claim(registration):
+    """
+    Atomically mark an employee as registered (used by the write-behind buffer)
+
+    Returns:
+        True ถ้าเป็นการลงทะเบียนใหม่, False ถ้ามีอยู่แล้ว
+    """
+    ensure_loaded(registration.meeting_id)
+    return bool(redis_store.hsetnx(_key(registration.meeting_id), registration.emp_id,
+                                   json.dumps(summarize(registration), ensure_ascii=False)))
+
+
+def release(meeting_id, emp_id):
+    """Undo claim() for a buffered registration that could not be written"""
+    try:
+        redis_store.hdel(_key(meeting_id), emp_id)
+    except RedisError as e:
+        logger.error(f"Cannot release {emp_id} from registered set for meeting {meeting_id}: {e}")
+        invalidate(meeting_id)
+
+
+def invalidate(meeting_id):
+    """Drop the hash so it is rebuilt from the database on next use"""
+    try:
+        redis_store.delete(_key(meeting_id))
+    except RedisError as e:
+        logger.error(f"Cannot invalidate registered set for meeting {meeting_id}: {e}")
@@ -0,0 +1,305 @@
+# registration_stats.py
+"""
+Live registration counters per meeting
+
+เก็บ Redis hash ต่อการประชุม ที่นับจำนวนการลงทะเบียนแบบ incremental:
+  total            จำนวนทั้งหมด
+  manual:0/1       ลงทะเบียนจากข้อมูลพนักงาน / ลงทะเบียนด้วยตนเอง
+  hour:<ISO hour>  จำนวนต่อชั่วโมง (เหมือน date_trunc('hour', registration_time))
+  sec:<sec_short>  จำนวนต่อส่วนงาน
+
+ทุก insert/delete ปรับตัวนับด้วย HINCRBY ใน MULTI เดียว ทำให้ dashboard และหน้าสถิติ
+อ่านได้ด้วย HGETALL ครั้งเดียวโดยไม่ต้อง aggregate ตาราง registrations
+
+เหมือน registration_cache: hash ถูกสร้างจาก database เมื่อใช้ครั้งแรก (field __loaded__)
+ตัวนับอาจคลาดเคลื่อนได้ถ้า process ตายระหว่าง commit กับ HINCRBY จึงมี reconcile()
+สำหรับสร้างใหม่จาก SQL เป็นระยะ: rq_worker.py ตั้ง tasks.reconcile_registration_stats_task
+ทุก REGISTRATION_STATS_RECONCILE_MINUTES นาที (ดู schedule_reconcile)
+
+rebuild() WATCH hash ระหว่าง aggregate จาก SQL ถ้า record() เปลี่ยนตัวนับในช่วงนั้นจะอ่านใหม่
+แทนการเขียนทับ ยังเหลือกรณีที่ insert commit ก่อน SQL อ่าน แต่ HINCRBY ตามมาหลัง rebuild
+เขียนเสร็จ (นับซ้ำหนึ่งครั้ง) ซึ่ง reconcile รอบถัดไปจะแก้ให้
+"""
+
+import logging
+import uuid
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from flask import current_app
+from redis.exceptions import RedisError, WatchError
+
+from db_routing import on_primary
+from extensions import redis_store
+
+logger = logging.getLogger(__name__)
+
+STATS_KEY = 'reg_stats'
+LOADED_FIELD = '__loaded__'
+# job id ของ reconcile รอบถัดไปที่ตั้งไว้แล้ว (มีได้ชุดเดียวแม้มีหลาย rq worker)
+RECONCILE_SCHEDULED_KEY = 'reg_stats_reconcile_scheduled'
+
+# จำนวนครั้งที่ rebuild อ่าน SQL ใหม่เมื่อตัวนับถูกเปลี่ยนระหว่างอ่าน
+REBUILD_ATTEMPTS = 3
+
+HourCount = namedtuple('HourCount', ['hour', 'count'])
+SectionCount = namedtuple('SectionCount', ['sec_short', 'count'])
+ManualCount = namedtuple('ManualCount', ['is_manual_entry', 'count'])
+MeetingStats = namedtuple('MeetingStats', ['total', 'hourly', 'by_section', 'manual'])
+
+# ค่าที่ใช้นับของการลงทะเบียนหนึ่งรายการ (เก็บไว้ก่อนลบ เพราะ object จะใช้ไม่ได้หลัง commit)
+Counted = namedtuple('Counted', ['meeting_id', 'is_manual_entry', 'sec_short', 'registration_time'])
+
+
+def _key(meeting_id):
+    return redis_store.key(STATS_KEY, meeting_id)
+
+
+def _hour_field(registration_time):
+    return 'hour:' + registration_time.replace(minute=0, second=0, microsecond=0).isoformat()
+
+
+def _fields(registration):
+    """Counter fields affected by one registration"""
+    fields = ['total', f'manual:{int(bool(registration.is_manual_entry))}',
+              f'sec:{registration.sec_short or ""}']
+    if registration.registration_time:
+        fields.append(_hour_field(registration.registration_time))
+    return fields
+
+
+def snapshot(registration):
+    return Counted(registration.meeting_id, registration.is_manual_entry,
+                   registration.sec_short, registration.registration_time)
+
+
+def _decode(value):
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+@on_primary
+def _from_database(meeting_id):
+    """Build the counter mapping with SQL aggregates"""
+    from sqlalchemy import func
+    from models import db, Registration
+
+    mapping = {'total': 0}
+
+    manual_rows = db.session.query(
+        Registration.is_manual_entry,
+        func.count(Registration.id)
+    ).filter_by(meeting_id=meeting_id).group_by(Registration.is_manual_entry).all()
+    for is_manual_entry, count in manual_rows:
+        field = f'manual:{int(bool(is_manual_entry))}'
+        mapping[field] = mapping.get(field, 0) + count
+        mapping['total'] += count
+
+    section_rows = db.session.query(
+        Registration.sec_short,
+        func.count(Registration.id)
+    ).filter_by(meeting_id=meeting_id).group_by(Registration.sec_short).all()
+    for sec_short, count in section_rows:
+        field = f'sec:{sec_short or ""}'
+        mapping[field] = mapping.get(field, 0) + count
+
+    hour_rows = db.session.query(
+        func.date_trunc('hour', Registration.registration_time).label('hour'),
+        func.count(Registration.id)
+    ).filter_by(meeting_id=meeting_id).group_by('hour').all()
+    for hour, count in hour_rows:
+        if hour is not None:
+            mapping[_hour_field(hour)] = count
+
+    return mapping
+
+
+def _to_stats(mapping):
+    """Convert a counter mapping into the shapes the templates use"""
+    hourly = []
+    by_section = []
+    manual = []
+
+    for field, count in mapping.items():
+        if count <= 0:
+            continue
+        if field.startswith('hour:'):
+            hourly.append(HourCount(datetime.fromisoformat(field[5:]), count))
+        elif field.startswith('sec:'):
+            by_section.append(SectionCount(field[4:] or None, count))
+        elif field.startswith('manual:'):
+            manual.append(ManualCount(field == 'manual:1', count))
+
+    hourly.sort()
+    by_section.sort(key=lambda stat: (-stat.count, stat.sec_short or ''))
+    manual.sort()
+
+    return MeetingStats(max(mapping.get('total', 0), 0), hourly, by_section, manual)
+
+
+def rebuild(meeting_id):
+    """
+    Replace the counters of a meeting with values from the database
+
+    Returns:
+        counter mapping ที่เขียนลง Redis
+    """
+    key = _key(meeting_id)
+    for _ in range(REBUILD_ATTEMPTS):
+        with redis_store.pipeline() as pipe:
+            # record() ที่รันระหว่าง aggregate จะทำให้ EXEC ล้มเหลว แทนที่จะถูกเขียนทับ
+            pipe.watch(key)
+            mapping = _from_database(meeting_id)
+            pipe.multi()
+            pipe.delete(key)
+            pipe.hset(key, mapping=dict(mapping, **{LOADED_FIELD: 1}))
+            pipe.expire(key, current_app.config.get('REGISTRATION_CACHE_TTL', 86400))
+            try:
+                pipe.execute()
+                break
+            except WatchError:
+                continue
+    else:
+        # ลงทะเบียนต่อเนื่องจนเขียนไม่ทัน: ให้ request ถัดไป rebuild ใหม่
+        logger.warning(f"Registration stats of meeting {meeting_id} kept changing during rebuild")
+        invalidate(meeting_id)
+
+    logger.debug(f"Rebuilt registration stats for meeting {meeting_id}: {mapping['total']} registrations")
+    return mapping
+
+
+def get_stats(meeting_id):
+    """
+    Registration statistics of a meeting
+
+    Returns:
+        MeetingStats(total, hourly, by_section, manual)
+        hourly/by_section/manual เป็น list ของ namedtuple ที่มี field .count
+        (เรียงเหมือน query เดิมของหน้า statistics)
+    """
+    try:
+        raw = redis_store.hgetall(_key(meeting_id))
+        mapping = {_decode(field): int(value) for field, value in raw.items()}
+        if LOADED_FIELD not in mapping:
+            mapping = rebuild(meeting_id)
+        else:
+            del mapping[LOADED_FIELD]
+    except RedisError as e:
+        logger.warning(f"Registration stats unavailable, counting in database: {e}")
+        mapping = _from_database(meeting_id)
+
+    return _to_stats(mapping)
+
+
+def record(registrations, delta=1):
+    """
+    Apply inserted (delta=1) or deleted (delta=-1) registrations to the counters
+
+    ถ้ายังไม่มี hash ของการประชุม ตัวนับที่เพิ่มจะถูกแทนที่ตอน rebuild จึงไม่ต้องตรวจสอบก่อน
+    """
+    keys = set()
+    try:
+        pipe = redis_store.pipeline()
+        for registration in registrations:
+            key = _key(registration.meeting_id)
+            keys.add((key, registration.meeting_id))
+            for field in _fields(registration):
+                pipe.hincrby(key, field, delta)
+        for key, _ in keys:
+            pipe.expire(key, current_app.config.get('REGISTRATION_CACHE_TTL', 86400))
+        pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Cannot update registration stats: {e}")
+        for _, meeting_id in keys:
+            invalidate(meeting_id)
+
+
+def invalidate(meeting_id):
+    """Drop the counters so they are rebuilt from the database on next read"""
+    try:
+        redis_store.delete(_key(meeting_id))
+    except RedisError as e:
+        logger.error(f"Cannot invalidate registration stats for meeting {meeting_id}: {e}")
+
+
+def reconcile(meeting_ids=None):
+    """
+    Rebuild counters from SQL and report drift
+
+    Args:
+        meeting_ids: การประชุมที่ต้องการ (default: การประชุมที่ active ทั้งหมด)
+
+    Returns:
+        dict ของ meeting_id -> จำนวน field ที่ค่าไม่ตรงกับ database
+    """
+    from models import Meeting
+
+    if meeting_ids is None:
+        meeting_ids = [meeting.id for meeting in Meeting.query.filter_by(is_active=True)]
+
+    drift = {}
+    for meeting_id in meeting_ids:
+        raw = redis_store.hgetall(_key(meeting_id))
+        cached = {_decode(field): int(value) for field, value in raw.items()}
+        loaded = cached.pop(LOADED_FIELD, None) is not None
+
+        expected = rebuild(meeting_id)
+        if loaded:
+            fields = set(cached) | set(expected)
+            mismatched = [field for field in fields if cached.get(field, 0) != expected.get(field, 0)]
+            drift[meeting_id] = len(mismatched)
+            if mismatched:
+                logger.warning(f"Registration stats drift for meeting {meeting_id}: {sorted(mismatched)[:10]}")
+        else:
+            drift[meeting_id] = 0
+
+    return drift
+
+
+def schedule_reconcile(previous_job_id=None):
+    """
+    Schedule the next periodic reconcile (rq_worker.py เรียกตอนเริ่ม และ job เรียกเมื่อรันเสร็จ)
+
+    Args:
+        previous_job_id: job ที่กำลังรันอยู่ ถ้า key ชี้ไปที่ job อื่นแปลว่ามี reconcile อีกชุดตั้งไว้แล้ว
+
+    Returns:
+        job id ที่ตั้งไว้ หรือ None ถ้าปิดใช้งาน / มี job ตั้งไว้แล้ว
+    """
+    minutes = current_app.config.get('REGISTRATION_STATS_RECONCILE_MINUTES', 60)
+    if minutes <= 0:
+        return None
+
+    from tasks import default_queue, reconcile_registration_stats_task
+
+    key = redis_store.key(RECONCILE_SCHEDULED_KEY)
+    job_id = f'reconcile_registration_stats_{uuid.uuid4().hex}'
+    try:
+        if previous_job_id is not None:
+            scheduled = _decode(redis_store.get(key))
+            if scheduled not in (None, previous_job_id):
+                return None
+            redis_store.delete(key)
+        # เผื่อเวลาให้ scheduler ย้าย job เข้า queue ช้ากว่ากำหนด ก่อนยอมให้ worker ตั้งชุดใหม่
+        if not redis_store.set(key, job_id, nx=True, ex=minutes * 60 * 2):
+            return None
+        default_queue.enqueue_in(timedelta(minutes=minutes), reconcile_registration_stats_task,
+                                 periodic=True, job_id=job_id)
+        return job_id
+    except Exception as e:
+        logger.warning(f"Cannot schedule registration stats reconcile: {e}")
+        return None
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from app import create_app
+
+    parser = argparse.ArgumentParser(description='Rebuild live registration counters from the database')
+    parser.add_argument('--meeting', type=int, help='Meeting id (default: all active meetings)')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        for meeting_id, mismatched in reconcile([args.meeting] if args.meeting else None).items():
+            print(f" Meeting {meeting_id}: {mismatched} counters corrected")
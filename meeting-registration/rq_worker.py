@@ -17,6 +17,11 @@ app.app_context().push()
 redis_conn = Redis.from_url(os.environ.get('REDIS_URL', 'redis://localhost:6379'))
 
 if __name__ == '__main__':
+    import registration_stats
+
+    # reconcile ตัวนับการลงทะเบียนเป็นระยะ (ไม่ตั้งซ้ำถ้า worker อื่นตั้งไว้แล้ว)
+    registration_stats.schedule_reconcile()
 
     worker = Worker(['email', 'default'], connection=redis_conn) 
-    worker.work()
\ No newline at end of file
+    # scheduler ย้าย job ที่ตั้งเวลาไว้ (enqueue_at เช่น meeting_warmup) เข้า queue เมื่อถึงเวลา
+    worker.work(with_scheduler=True)
\ No newline at end of file
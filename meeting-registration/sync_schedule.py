@@ -9,6 +9,7 @@ import sys
 from datetime import datetime
 from pathlib import Path
 from app import create_app
+import meeting_cache
 from models import db, Meeting
 
 def sync_schedule_from_json(json_file='schedule.json'):
@@ -86,6 +87,7 @@ def sync_schedule_from_json(json_file='schedule.json'):
                 print(f"✅ Created new meeting: {new_meeting.topic}")
             
             db.session.commit()
+            meeting_cache.invalidate()
             return True
             
         except Exception as e:
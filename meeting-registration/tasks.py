@@ -1,5 +1,5 @@
 # tasks.py
-from rq import Queue
+from rq import Queue, get_current_job
 from redis import Redis
 from email_service import EmailService
 from email.mime.text import MIMEText
@@ -16,6 +16,7 @@ logger = logging.getLogger(__name__)
 # Initialize Redis connection
 redis_conn = Redis.from_url(os.environ.get('REDIS_URL', 'redis://localhost:6379'))
 email_queue = Queue('email', connection=redis_conn)
+default_queue = Queue('default', connection=redis_conn)
 
 def send_otp_email_task(recipient_email: str, recipient_name: str, otp: str, purpose: str = 'login'):
     """Background task to send OTP email"""
@@ -61,4 +62,56 @@ def send_registration_notification(registration_data: dict, meeting_data: dict):
         return True
     except Exception as e:
         logger.error(f"❌ Failed to send registration email: {str(e)}")
-        return False
\ No newline at end of file
+        return False
+
+def flush_registrations_task():
+    """Background task to flush write-behind registrations into the database"""
+    from registration_buffer import flush
+    inserted = flush(on_inserted=queue_google_sheets)
+    logger.info(f"Flushed {inserted} buffered registrations")
+    return inserted
+
+def reconcile_registration_stats_task(meeting_id=None, periodic=False):
+    """
+    Background task to rebuild live registration counters from the database
+
+    periodic=True เมื่อถูกตั้งโดย registration_stats.schedule_reconcile (ตั้งรอบถัดไปเมื่อเสร็จ)
+    """
+    from registration_stats import reconcile, schedule_reconcile
+    try:
+        drift = reconcile([meeting_id] if meeting_id else None)
+        logger.info(f"Reconciled registration stats: {drift}")
+        return drift
+    finally:
+        if periodic:
+            job = get_current_job()
+            schedule_reconcile(previous_job_id=job.id if job else None)
+
+def warm_meeting_task(meeting_id):
+    """Background task to warm caches shortly before a meeting starts (scheduled by meeting_warmup)"""
+    from meeting_warmup import warm_meeting
+    return warm_meeting(meeting_id)
+
+def queue_google_sheets(registrations):
+    """Queue Google Sheets sync (Celery) for registrations written by a worker"""
+    from flask import current_app
+    from extensions import celery_app
+    
+    google_script_url = current_app.config.get('GOOGLE_SCRIPT_URL')
+    if not google_script_url:
+        return
+    
+    for registration in registrations:
+        reg_data_for_task = {
+            'รหัสพนักงาน': registration.emp_id,
+            'ชื่อ': registration.emp_name,
+            'ตำแหน่ง': registration.position or '',
+            'ส่วนงานย่อ': registration.sec_short or '',
+            'ชื่อศูนย์ต้นทุน': registration.cc_name or '',
+            'เวลาลงทะเบียน': registration.registration_time.isoformat(),
+            'ลงทะเบียนด้วยตนเอง': 'ใช่' if registration.is_manual_entry else 'ไม่ใช่'
+        }
+        try:
+            celery_app.send_task('tasks.send_to_google_sheets', args=[reg_data_for_task, google_script_url])
+        except Exception as e:
+            logger.error(f"Failed to queue task for Google Sheets: {e}")
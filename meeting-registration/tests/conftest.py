@@ -0,0 +1,28 @@
+# tests/conftest.py
+"""
+Shared fixtures: TestingConfig app (SQLite ใน memory) ต้องมี Redis ตาม REDIS_URL ไม่อย่างนั้นข้าม test
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def app():
+    from app import create_app
+    from extensions import redis_store
+    from models import db
+
+    app = create_app('testing')
+    with app.app_context():
+        try:
+            redis_store.ping()
+        except Exception as e:
+            pytest.skip(f"Redis is not available: {e}")
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
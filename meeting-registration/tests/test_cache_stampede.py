@@ -0,0 +1,109 @@
+# tests/test_cache_stampede.py
+"""
+Cache stampede: 200 client พร้อมกันบน hot key ต้องคำนวณค่าเพียงครั้งเดียว
+
+ใช้สถานการณ์เดียวกับ tools/simulate_cache_stampede.py (ซึ่งยังใช้วัด latency ได้)
+"""
+import threading
+import time
+import uuid
+from datetime import date, time as dtime
+
+import pytest
+
+CLIENTS = 200
+COMPUTE_SECONDS = 0.1
+
+
+def run_clients(app, target, clients=CLIENTS):
+    """Run target() from `clients` threads at once, return results"""
+    barrier = threading.Barrier(clients)
+    results, errors = [], []
+    lock = threading.Lock()
+
+    def client():
+        with app.app_context():
+            barrier.wait()
+            try:
+                result = target()
+            except Exception as e:
+                with lock:
+                    errors.append(e)
+                return
+            with lock:
+                results.append(result)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors, errors[0]
+    return results
+
+
+@pytest.fixture
+def counted_compute():
+    computes = []
+    lock = threading.Lock()
+
+    def compute():
+        with lock:
+            computes.append(1)
+        time.sleep(COMPUTE_SECONDS)
+        return {'computed_at': time.time()}
+
+    compute.computes = computes
+    return compute
+
+
+def test_cold_key_is_computed_once(app, counted_compute):
+    from tiered_cache import tiered_cache
+
+    key = f'stampede_test:{uuid.uuid4().hex}'
+    results = run_clients(app, lambda: tiered_cache.get_or_compute(key, counted_compute, 60))
+
+    assert len(counted_compute.computes) == 1
+    assert len(results) == CLIENTS
+    assert len({result['computed_at'] for result in results}) == 1
+    tiered_cache.delete(key)
+
+
+def test_expired_key_is_recomputed_once(app, counted_compute):
+    from tiered_cache import CacheEntry, tiered_cache
+
+    # ค่าที่หมดอายุไปแล้ว 1 วินาที แต่ยังอยู่ใน Redis
+    key = f'stampede_test:{uuid.uuid4().hex}'
+    tiered_cache.set(key, CacheEntry({'computed_at': 0}, time.time() - 1, COMPUTE_SECONDS),
+                     timeout=60 + tiered_cache.stale_seconds)
+
+    results = run_clients(app, lambda: tiered_cache.get_or_compute(key, counted_compute, 60))
+
+    assert len(counted_compute.computes) == 1
+    assert len(results) == CLIENTS
+    tiered_cache.delete(key)
+
+
+def test_version_bump_loads_meetings_once(app, monkeypatch):
+    import meeting_cache
+    from models import Meeting, db
+
+    db.session.add(Meeting(topic='Stampede test', meeting_date=date.today(),
+                           start_time=dtime(0, 0), end_time=dtime(23, 59)))
+    db.session.commit()
+    meeting_cache.get_active_meetings()
+    meeting_cache.invalidate()
+
+    loads = []
+    load_active = Meeting.load_active.__func__
+
+    def counting_load_active(cls):
+        loads.append(1)
+        time.sleep(COMPUTE_SECONDS)
+        return load_active(cls)
+
+    monkeypatch.setattr(Meeting, 'load_active', classmethod(counting_load_active))
+    results = run_clients(app, meeting_cache.get_active_meetings)
+
+    assert len(loads) == 1
+    assert all([meeting.topic for meeting in result] == ['Stampede test'] for result in results)
@@ -0,0 +1,87 @@
+# tests/test_employee_search.py
+"""employee_search: คำนำหน้าชื่อ และการแบ่งหน้าผลค้นหาตามลำดับความตรง"""
+import pytest
+
+import employee_search
+
+
+@pytest.mark.parametrize('query, terms', [
+    ('นาย สมชาย', ['สมชาย']),
+    ('น.ส.สมหญิง', ['สมหญิง']),
+    ('Miss Jane', ['jane']),
+    ('mission', ['mission']),
+    ('missy', ['missy']),
+    ('นางรอง', ['นางรอง']),
+    ('นายก', ['นายก']),
+    ('นางสาวสมศรี ๑๒๓', ['นางสาวสมศรี', '123']),
+])
+def test_normalize_query_titles(query, terms):
+    assert employee_search.normalize_query(query) == terms
+
+
+def test_name_after_title():
+    assert employee_search.name_after_title('นายสมชาย') == 'สมชาย'
+    assert employee_search.name_after_title('นางรอง') == 'รอง'
+    assert employee_search.name_after_title('นายก') is None
+    assert employee_search.name_after_title('mission') is None
+
+
+def test_search_pages_cover_every_match(app):
+    from models import Employee, db
+
+    for i in range(45):
+        db.session.add(Employee(emp_id=f'{i:08d}', emp_name=f'สมชาย ทดสอบ{i}',
+                                position='นายกสมาคม' if i % 3 else 'พนักงาน'))
+    db.session.commit()
+
+    terms = employee_search.normalize_query('นายสมชาย')
+    expected = [employee.emp_id for employee in employee_search.ranked_query(terms)]
+    assert len(expected) == 45
+
+    found, after = [], None
+    while True:
+        page = employee_search.search_page(terms, after=after, per_page=20)
+        found += [employee.emp_id for employee in page.items]
+        if not page.has_next:
+            break
+        after = page.next_cursor
+    assert found == expected
+
+    # "นายก" ตรงกับตำแหน่งเท่านั้น ไม่ใช่ทุกชื่อที่ขึ้นต้นด้วย "ก"
+    terms = employee_search.normalize_query('นายก')
+    assert employee_search.ranked_query(terms).count() == 30
+
+
+def test_search_pages_with_tied_similarity(app, monkeypatch):
+    import struct
+
+    from sqlalchemy.dialects import postgresql
+
+    from models import Employee, db
+
+    def similarity(name, phrase):
+        # คะแนนซ้ำกันเป็นกลุ่ม และปัดเป็น float4 แบบ real ของ pg_trgm
+        return struct.unpack('f', struct.pack('f', 1 / (3 + len(name) % 4)))[0]
+
+    db.session.connection().connection.driver_connection.create_function('similarity', 2, similarity)
+    monkeypatch.setattr(employee_search, 'has_trigram', lambda: True)
+
+    for i in range(37):
+        db.session.add(Employee(emp_id=f'{i:08d}', emp_name=f'สมชาย ทดสอบ{"x" * (i % 5)}'))
+    db.session.commit()
+
+    terms = employee_search.normalize_query('สมชาย')
+    _, score = employee_search._ranking(terms)
+    assert 'AS FLOAT' in str(score.compile(dialect=postgresql.dialect()))
+
+    expected = [employee.emp_id for employee in employee_search.ranked_query(terms)]
+    assert len(expected) == 37
+
+    found, after = [], None
+    while True:
+        page = employee_search.search_page(terms, after=after, per_page=5)
+        found += [employee.emp_id for employee in page.items]
+        if not page.has_next:
+            break
+        after = page.next_cursor
+    assert found == expected
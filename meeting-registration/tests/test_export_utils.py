@@ -0,0 +1,24 @@
+# tests/test_export_utils.py
+"""export_utils: XLSX แบบ write-only ต้องไม่สะสมข้อความทั้งหมดไว้ใน memory"""
+import io
+import zipfile
+
+from openpyxl import load_workbook
+
+import export_utils
+
+
+def test_write_xlsx_uses_inline_strings():
+    rows = ([f'{i:08d}', f'ผู้เข้าร่วม {i}', i] for i in range(2000))
+    output = io.BytesIO()
+    export_utils.write_xlsx(output, ['รหัสพนักงาน', 'ชื่อ', 'ลำดับ'], rows, 'Registrations')
+
+    with zipfile.ZipFile(output) as archive:
+        assert 'xl/sharedStrings.xml' not in archive.namelist()
+        assert 't="inlineStr"' in archive.read('xl/worksheets/sheet1.xml').decode('utf-8')
+
+    sheet = load_workbook(output, read_only=True)['Registrations']
+    values = list(sheet.iter_rows(values_only=True))
+    assert values[0] == ('รหัสพนักงาน', 'ชื่อ', 'ลำดับ')
+    assert values[-1] == ('00001999', 'ผู้เข้าร่วม 1999', 1999)
+    assert len(values) == 2001
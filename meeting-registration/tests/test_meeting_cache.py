@@ -0,0 +1,30 @@
+# tests/test_meeting_cache.py
+"""
+meeting_cache tests (ต้องมี Redis ตาม REDIS_URL, database เป็น SQLite ใน memory ของ TestingConfig)
+
+Usage:
+    python -m pytest tests
+"""
+from datetime import date, time
+
+
+def test_deleted_meeting_is_not_served_from_previous_version(app):
+    import meeting_cache
+    from models import Meeting, db
+
+    meeting = Meeting(topic='Cache test', meeting_date=date(2030, 1, 1),
+                      start_time=time(9, 0), end_time=time(10, 0))
+    db.session.add(meeting)
+    db.session.commit()
+    meeting_id = meeting.id
+    meeting_cache.invalidate()
+
+    assert meeting_cache.get_meeting(meeting_id).topic == 'Cache test'
+
+    db.session.delete(meeting)
+    db.session.commit()
+    meeting_cache.invalidate()
+
+    assert meeting_cache.get_meeting(meeting_id) is None
+    # ผลว่าง (None) ถูก cache ใน version ใหม่ ไม่ใช้ DTO ของ version ก่อนหน้า
+    assert meeting_cache.get_meeting(meeting_id) is None
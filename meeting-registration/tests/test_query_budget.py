@@ -0,0 +1,59 @@
+# tests/test_query_budget.py
+"""
+จำนวน SQL ต่อ request ต้องคงที่ไม่ว่าจะมีกี่การประชุม (TestingConfig ใช้ QUERY_BUDGET='raise')
+"""
+from datetime import date, time, timedelta
+
+import pytest
+
+from query_budget import assert_max_queries
+
+
+@pytest.fixture
+def meetings(app):
+    import meeting_cache
+    from models import Meeting, Registration, User, db
+
+    organizer = User(email='organizer@example.com', name='Organizer')
+    db.session.add(organizer)
+    db.session.flush()
+
+    today = date.today()
+    for offset in (-7, -1, 0, 0, 1, 3, 10):
+        meeting = Meeting(topic=f'Meeting {offset}', meeting_date=today + timedelta(days=offset),
+                          start_time=time(0, 0) if offset else time(23, 0),
+                          end_time=time(23, 59), organizer_id=organizer.id)
+        db.session.add(meeting)
+        db.session.flush()
+        for i in range(3):
+            db.session.add(Registration(meeting_id=meeting.id, emp_id=None, emp_name=f'ผู้เข้าร่วม {i}',
+                                        is_manual_entry=True))
+    db.session.commit()
+    meeting_cache.invalidate()
+    return organizer.id
+
+
+def test_organizer_dashboard_query_count(app, meetings):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = meetings
+
+    # User + การประชุมพร้อมจำนวนผู้ลงทะเบียน
+    with assert_max_queries(2, 'GET /organizer/'):
+        response = client.get('/organizer/')
+    assert response.status_code == 200
+    assert 'Meeting 10' in response.get_data(as_text=True)
+
+
+def test_index_query_count(app, meetings):
+    client = app.test_client()
+
+    # cache ว่าง: โหลดการประชุมที่ active ครั้งเดียว
+    with assert_max_queries(1, 'GET /'):
+        response = client.get('/')
+    assert response.status_code == 200
+    assert 'Meeting 3' in response.get_data(as_text=True)
+
+    # ครั้งต่อไปมาจาก cache ทั้งหมด
+    with assert_max_queries(0, 'GET / (cached)'):
+        assert client.get('/').status_code == 200
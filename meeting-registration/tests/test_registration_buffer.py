@@ -0,0 +1,103 @@
+# tests/test_registration_buffer.py
+"""registration_buffer: รับการลงทะเบียนเข้า stream แล้ว flush ลง database (รวมกรณี insert ไม่ได้)"""
+from datetime import date, time
+
+import pytest
+
+import registration_buffer
+import registration_cache
+from extensions import redis_store
+
+
+@pytest.fixture
+def buffer(app, monkeypatch):
+    from models import Meeting, db
+
+    for name in (registration_buffer.STREAM_KEY, registration_buffer.DEAD_LETTER_KEY,
+                 registration_buffer.FLUSH_SCHEDULED_KEY, registration_buffer.STATS_KEY):
+        redis_store.delete(redis_store.key(name))
+    registration_buffer._group_ready = False
+
+    scheduled = []
+    monkeypatch.setattr(registration_buffer, 'schedule_flush', lambda delay=0: scheduled.append(delay))
+
+    meeting = Meeting(topic='Buffer test', meeting_date=date(2030, 1, 1),
+                      start_time=time(9, 0), end_time=time(10, 0))
+    db.session.add(meeting)
+    db.session.commit()
+    registration_cache.invalidate(meeting.id)
+
+    yield meeting.id, scheduled
+
+    registration_cache.invalidate(meeting.id)
+
+
+def _registered(meeting_id):
+    from models import Registration
+    return sorted(r.emp_id for r in Registration.query.filter_by(meeting_id=meeting_id))
+
+
+def test_accept_then_flush(buffer):
+    meeting_id, scheduled = buffer
+
+    registration, created = registration_buffer.accept(meeting_id, '00000001', emp_name='สมชาย')
+    assert created and registration.emp_id == '00000001'
+    assert registration_buffer.accept(meeting_id, '00000001', emp_name='สมชาย') == (None, False)
+    registration_buffer.accept(meeting_id, '00000002', emp_name='สมหญิง')
+    assert scheduled == [0, 0]
+
+    flushed = []
+    assert registration_buffer.flush(on_inserted=flushed.extend) == 2
+    assert _registered(meeting_id) == ['00000001', '00000002']
+    assert sorted(r.emp_id for r in flushed) == ['00000001', '00000002']
+
+    metrics = registration_buffer.get_metrics()
+    assert metrics['pending'] == 0
+    assert metrics['dead_letter'] == 0
+    assert scheduled == [0, 0]
+
+
+def test_failing_row_goes_to_dead_letter(buffer):
+    meeting_id, scheduled = buffer
+
+    registration_buffer.accept(meeting_id, '00000001', emp_name='สมชาย')
+    registration_buffer.accept(meeting_id, '00000002', emp_name=None)  # NOT NULL ทำให้ทั้ง batch ล้มเหลว
+    registration_buffer.accept(meeting_id, '00000003', emp_name='สมศรี')
+
+    assert registration_buffer.flush() == 2
+    assert _registered(meeting_id) == ['00000001', '00000003']
+
+    dead = redis_store.xrange(redis_store.key(registration_buffer.DEAD_LETTER_KEY))
+    assert len(dead) == 1
+    assert b'00000002' in dead[0][1][b'data']
+
+    # ไม่ค้างใน stream และสแกนลงทะเบียนใหม่ได้
+    metrics = registration_buffer.get_metrics()
+    assert metrics['pending'] == 0
+    assert metrics['dead_letter'] == 1
+    assert registration_cache.get(meeting_id, '00000002') is None
+    assert registration_cache.get(meeting_id, '00000001')['emp_name'] == 'สมชาย'
+    assert scheduled == [0, 0, 0]
+
+
+def test_transient_failure_reschedules(buffer, monkeypatch):
+    from sqlalchemy.exc import OperationalError
+
+    meeting_id, scheduled = buffer
+    registration_buffer.accept(meeting_id, '00000001', emp_name='สมชาย')
+
+    def unavailable(rows):
+        raise OperationalError('INSERT', {}, Exception('server closed the connection'))
+
+    monkeypatch.setattr(registration_buffer, '_insert_batch', unavailable)
+    with pytest.raises(OperationalError):
+        registration_buffer.flush()
+    assert scheduled == [0, 30]
+    assert registration_buffer.get_metrics()['pending'] == 1
+
+    monkeypatch.undo()
+    monkeypatch.setattr(registration_buffer, 'schedule_flush', lambda delay=0: scheduled.append(delay))
+    monkeypatch.setitem(registration_buffer.current_app.config, 'REGISTRATION_FLUSH_RECLAIM_MS', 0)
+    assert registration_buffer.flush() == 1
+    assert _registered(meeting_id) == ['00000001']
+    assert registration_buffer.get_metrics()['pending'] == 0
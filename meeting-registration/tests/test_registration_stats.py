@@ -0,0 +1,50 @@
+# tests/test_registration_stats.py
+"""registration_stats: rebuild ที่ชนกับ record() และการตั้ง reconcile เป็นระยะ"""
+from collections import namedtuple
+from datetime import datetime
+
+import registration_stats
+from extensions import redis_store
+
+Row = namedtuple('Row', ['meeting_id', 'is_manual_entry', 'sec_short', 'registration_time'])
+
+
+def test_rebuild_retries_when_counters_change(app, monkeypatch):
+    meeting_id = 901
+    registration_stats.invalidate(meeting_id)
+    counts = iter([1, 2])
+
+    def from_database(meeting_id):
+        total = next(counts)
+        if total == 1:
+            # มีการลงทะเบียน commit และ record() ระหว่างที่ rebuild aggregate อยู่
+            registration_stats.record([Row(meeting_id, False, 'IT', datetime(2030, 1, 1, 9, 5))])
+        return {'total': total}
+
+    monkeypatch.setattr(registration_stats, '_from_database', from_database)
+
+    assert registration_stats.rebuild(meeting_id) == {'total': 2}
+    assert int(redis_store.hget(registration_stats._key(meeting_id), 'total')) == 2
+    registration_stats.invalidate(meeting_id)
+
+
+def test_schedule_reconcile_keeps_one_chain(app, monkeypatch):
+    from tasks import default_queue
+
+    scheduled = []
+    monkeypatch.setattr(default_queue, 'enqueue_in',
+                        lambda delay, f, **kwargs: scheduled.append((delay, kwargs)))
+    redis_store.delete(redis_store.key(registration_stats.RECONCILE_SCHEDULED_KEY))
+
+    job_id = registration_stats.schedule_reconcile()
+    assert job_id is not None
+    # worker อื่นเริ่มทำงาน หรือ job เก่าของชุดอื่น ไม่ตั้งซ้ำ
+    assert registration_stats.schedule_reconcile() is None
+    assert registration_stats.schedule_reconcile(previous_job_id='someone-else') is None
+    # job ที่ตั้งไว้รันเสร็จแล้วตั้งรอบถัดไป
+    next_job_id = registration_stats.schedule_reconcile(previous_job_id=job_id)
+    assert next_job_id not in (None, job_id)
+
+    assert [kwargs['job_id'] for _, kwargs in scheduled] == [job_id, next_job_id]
+    assert all(kwargs['periodic'] for _, kwargs in scheduled)
+    redis_store.delete(redis_store.key(registration_stats.RECONCILE_SCHEDULED_KEY))
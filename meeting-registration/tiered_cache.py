@@ -0,0 +1,487 @@
+# tiered_cache.py
+"""
+Two-tier cache: per-worker LRU in front of the shared Redis cache
+
+key ที่อ่านทุก request (เช่น meeting_cache_version และ MeetingDTO) ถูกเก็บใน memory ของ worker
+(OrderedDict จำกัดขนาด TIERED_CACHE_SIZE และอายุ TIERED_CACHE_TTL วินาที) ก่อนจะไปถึง
+Flask-Caching RedisCache จึงไม่ต้องเสีย network round trip + unpickle ทุกครั้ง
+
+ความถูกต้องระหว่าง worker/node:
+- set/inc/delete ส่งชื่อ key ไปที่ Redis pub/sub channel (cache_invalidation) ทุก worker มี
+  thread ที่ subscribe อยู่และลบ key นั้นออกจาก memory ของตัวเอง
+- ระหว่างที่ยังไม่ได้ subscribe (เพิ่งเริ่ม / Redis หลุด) จะไม่ใช้ tier ใน memory เลย
+  และล้างทั้งหมดเมื่อ subscribe ได้อีกครั้ง (อาจพลาดข้อความไประหว่างนั้น)
+- TIERED_CACHE_TTL เป็นขอบเขตสุดท้ายของความเก่าของข้อมูล ถ้าข้อความ invalidation หายไป
+
+hit/miss ของแต่ละ tier ถูกนับต่อ worker และรวมลง Redis hash เป็นระยะ (ดู get_metrics)
+
+channel เดียวกันใช้สั่งให้ทุก worker เตรียมข้อมูลใน memory ของตัวเองล่วงหน้า (broadcast_warm)
+เช่น meeting_warmup ก่อนเริ่มการประชุม
+
+get_or_compute() ป้องกัน cache stampede ของ key ที่ทุก request ต้องใช้ (เช่น การประชุมที่ active):
+- ค่าถูกเก็บเป็น CacheEntry ที่มีเวลาหมดอายุ "ทางตรรกะ" และอยู่ใน Redis ต่ออีก CACHE_STALE_SECONDS
+- ใกล้หมดอายุ request จะสุ่ม refresh ก่อนเวลา (probabilistic early expiration / XFetch)
+  โอกาสเพิ่มขึ้นเมื่อใกล้หมดอายุและเมื่อการคำนวณใช้เวลานาน
+- การคำนวณใหม่ทำได้ทีละ worker (Redis lock แบบ SET NX PX) worker อื่นได้ค่าเก่าไปก่อน
+  ถ้าไม่มีค่าเก่าเลยจะรอ leader สูงสุด CACHE_LOCK_WAIT วินาทีแล้วจึงคำนวณเอง
+"""
+
+import logging
+import math
+import os
+import random
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict, namedtuple
+
+from extensions import cache, redis_store
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'cache_invalidation'
+STATS_KEY = 'tiered_cache_stats'
+CLEAR_ALL = '*'
+# ข้อความที่ขึ้นต้นด้วย prefix นี้เป็นคำสั่ง warm ไม่ใช่ชื่อ key
+WARM_PREFIX = 'warm:'
+
+# รวมตัวนับของ worker ลง Redis ทุกกี่วินาที
+STATS_FLUSH_INTERVAL = 10
+
+STAT_FIELDS = ('local_hits', 'redis_hits', 'misses', 'invalidations',
+               'recomputes', 'early_refreshes', 'stale_served', 'lock_waits', 'lock_timeouts')
+
+# ระยะห่างระหว่างการตรวจว่า leader เขียนค่าเสร็จหรือยัง (วินาที)
+LOCK_POLL_INTERVAL = 0.05
+
+# key ที่ไม่มีใน Redis ก็เก็บใน memory ด้วย (เช่น meeting_cache_version ก่อน invalidate ครั้งแรก)
+_MISSING = object()
+
+
+# value พร้อมเวลาหมดอายุทางตรรกะ (epoch) และเวลาที่ใช้คำนวณ (วินาที) สำหรับ get_or_compute
+CacheEntry = namedtuple('CacheEntry', ['value', 'expires_at', 'delta'])
+
+
+def _decode(value):
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+def _hit_rates(stats):
+    lookups = stats.get('local_hits', 0) + stats.get('redis_hits', 0) + stats.get('misses', 0)
+    return {
+        'lookups': lookups,
+        'local_hit_rate': round(stats.get('local_hits', 0) / lookups, 4) if lookups else None,
+        'redis_hit_rate': round(stats.get('redis_hits', 0) / lookups, 4) if lookups else None,
+        'miss_rate': round(stats.get('misses', 0) / lookups, 4) if lookups else None,
+    }
+
+
+class TieredCache:
+    """Bounded in-process LRU with TTL in front of extensions.cache"""
+
+    def __init__(self):
+        self.enabled = False
+        self.maxsize = 1024
+        self.ttl = 5
+        self.stale_seconds = 300
+        self.lock_timeout = 10
+        self.lock_wait = 3
+        self.early_refresh_beta = 1.0
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        # เพิ่มทุกครั้งที่มี invalidation - ค่าที่อ่านจาก Redis ก่อนหน้านั้นจะไม่ถูกเก็บลง memory
+        self._generation = 0
+        self._subscribed = threading.Event()
+        self._pid = None
+        self._sender = None
+        self._stats = Counter()
+        self._flushed = Counter()
+        self._flushed_at = time.monotonic()
+        self._app = None
+        self._warmers = []
+
+    def init_app(self, app):
+        self.enabled = app.config.get('TIERED_CACHE_ENABLED', True)
+        self.maxsize = app.config.get('TIERED_CACHE_SIZE', 1024)
+        self.ttl = app.config.get('TIERED_CACHE_TTL', 5)
+        self.stale_seconds = app.config.get('CACHE_STALE_SECONDS', 300)
+        self.lock_timeout = app.config.get('CACHE_LOCK_TIMEOUT', 10)
+        self.lock_wait = app.config.get('CACHE_LOCK_WAIT', 3)
+        self.early_refresh_beta = app.config.get('CACHE_EARLY_REFRESH_BETA', 1.0)
+        self._app = app
+        app.extensions['tiered_cache'] = self
+        if self.enabled:
+            # subscribe ตั้งแต่ worker เริ่ม เพื่อให้ได้รับคำสั่ง warm ก่อน request แรก
+            self._ensure_listener()
+
+    # ----- local tier -----
+
+    def _ensure_listener(self):
+        """Start the invalidation listener once per process (หลัง fork ของ gunicorn)"""
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._pid = pid
+            self._sender = uuid.uuid4().hex
+            self._data.clear()
+            self._subscribed.clear()
+            self._stats.clear()
+            self._flushed.clear()
+            thread = threading.Thread(target=self._listen, name='tiered-cache-invalidation', daemon=True)
+            thread.start()
+
+    def _listen(self):
+        channel = redis_store.key(CHANNEL)
+        delay = 1
+        while True:
+            pubsub = None
+            try:
+                pubsub = redis_store.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(channel)
+                # ข้อความระหว่างที่หลุดไปอาจหายไป จึงเริ่มใหม่จาก memory ว่าง
+                self.clear_local()
+                self._subscribed.set()
+                delay = 1
+                for message in pubsub.listen():
+                    sender, _, key = _decode(message['data']).partition('|')
+                    if sender == self._sender:
+                        continue
+                    if key.startswith(WARM_PREFIX):
+                        self._start_warmers(key[len(WARM_PREFIX):])
+                    else:
+                        self._evict(key)
+            except Exception as e:
+                logger.warning(f"Cache invalidation listener disconnected, retrying in {delay}s: {e}")
+            finally:
+                self._subscribed.clear()
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+            time.sleep(delay)
+            delay = min(delay * 2, 30)
+
+    def _evict(self, key):
+        with self._lock:
+            self._generation += 1
+            if key == CLEAR_ALL:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+        self._count('invalidations')
+
+    def clear_local(self):
+        with self._lock:
+            self._generation += 1
+            self._data.clear()
+
+    def _get_local(self, key):
+        """Cached value, _MISSING for a cached miss, or None if not in memory"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def _set_local(self, key, value, timeout, generation):
+        ttl = min(self.ttl, timeout) if timeout else self.ttl
+        with self._lock:
+            # มี invalidation เกิดขึ้นระหว่างที่อ่านจาก Redis - ค่าที่ได้อาจเก่าไปแล้ว
+            if generation != self._generation:
+                return
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def _local_ready(self):
+        if not self.enabled:
+            return False
+        self._ensure_listener()
+        return self._subscribed.is_set()
+
+    # ----- public API (เหมือน Flask-Caching) -----
+
+    def get(self, key):
+        """Value from memory, then Redis (None if missing in both)"""
+        use_local = self._local_ready()
+        if use_local:
+            value = self._get_local(key)
+            if value is not None:
+                self._count('local_hits')
+                return None if value is _MISSING else value
+            generation = self._generation
+
+        value = cache.get(key)
+        if value is None:
+            self._count('misses')
+            if use_local:
+                self._set_local(key, _MISSING, None, generation)
+            return None
+
+        self._count('redis_hits')
+        if use_local:
+            self._set_local(key, value, None, generation)
+        return value
+
+    def set(self, key, value, timeout=None):
+        cache.set(key, value, timeout=timeout)
+        self._publish(key)
+        if self._local_ready():
+            self._set_local(key, value, timeout, self._generation)
+
+    def set_many(self, mapping, timeout=None):
+        cache.set_many(mapping, timeout=timeout)
+        for key in mapping:
+            self._publish(key)
+        if self._local_ready():
+            generation = self._generation
+            for key, value in mapping.items():
+                self._set_local(key, value, timeout, generation)
+
+    def inc(self, key, delta=1):
+        """Atomic increment in Redis (ใช้กับ version key)"""
+        value = cache.cache.inc(key, delta)
+        self.invalidate(key)
+        return value
+
+    def delete(self, key):
+        cache.delete(key)
+        self.invalidate(key)
+
+    def invalidate(self, key=CLEAR_ALL):
+        """Drop key (default: everything) from the memory tier of every worker"""
+        self._evict(key)
+        self._publish(key)
+
+    def _publish(self, key):
+        if not self.enabled:
+            return
+        try:
+            redis_store.publish(redis_store.key(CHANNEL), f"{self._sender}|{key}")
+        except Exception as e:
+            # worker อื่นจะเห็นค่าใหม่ภายใน TIERED_CACHE_TTL
+            logger.warning(f"Cannot publish cache invalidation for {key}: {e}")
+
+    # ----- single-flight recomputation -----
+
+    def get_or_compute(self, key, compute, timeout, stale_key=None):
+        """
+        Read-through cache for hot keys without a stampede on expiry
+
+        Args:
+            key: cache key
+            compute: ฟังก์ชันที่คืนค่าใหม่ (None ถูก cache ด้วย เช่น ไม่พบข้อมูล)
+                     raise ถ้าคำนวณไม่ได้ (database ล่ม) - ใช้ค่าเก่าถ้ามี ไม่อย่างนั้น raise ต่อ
+            timeout: อายุของค่า (วินาที) หลังจากนั้นยังใช้เป็นค่าเก่าได้อีก CACHE_STALE_SECONDS
+            stale_key: key ที่ใช้เป็นค่าเก่าแทนถ้า key ยังไม่มี (เช่น version ก่อนหน้า)
+
+        Returns:
+            ค่าจาก cache หรือจาก compute() (ค่าเก่าถ้า worker อื่นกำลังคำนวณอยู่)
+        """
+        entry = self._get_entry(key)
+        if entry is not None and not self._should_refresh(entry):
+            return entry.value
+
+        stale = entry
+        if stale is None and stale_key is not None:
+            stale = self._get_entry(stale_key)
+
+        lock = self._try_lock(key)
+        if lock is not False:
+            try:
+                # leader คนก่อนอาจเพิ่งเขียนค่าใหม่และปล่อย lock ระหว่างที่อ่าน key ด้านบน
+                current = self._read_redis(key) if lock is not None else None
+                if current is not None and time.time() < current.expires_at \
+                        and (entry is None or current.expires_at > entry.expires_at):
+                    return current.value
+                if entry is not None:
+                    self._count('early_refreshes' if time.time() < entry.expires_at else 'recomputes')
+                return self._fill(key, compute, timeout, stale)
+            finally:
+                self._unlock(lock)
+
+        if stale is not None:
+            self._count('stale_served')
+            return stale.value
+
+        # ยังไม่เคยมีค่าเลย - รอ worker ที่ถือ lock แทนการยิง database พร้อมกัน
+        self._count('lock_waits')
+        deadline = time.monotonic() + self.lock_wait
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            entry = self._read_redis(key)
+            if entry is not None:
+                return entry.value
+
+        self._count('lock_timeouts')
+        logger.warning(f"Timed out waiting for {key} to be recomputed, computing locally")
+        return self._fill(key, compute, timeout, None)
+
+    def prime(self, mapping, timeout, delta=0):
+        """Store values read by get_or_compute (เช่น DTO ของทุกการประชุมที่ได้มาพร้อมรายการ active)"""
+        expires_at = time.time() + timeout
+        self.set_many({key: CacheEntry(value, expires_at, delta) for key, value in mapping.items()},
+                      timeout=timeout + self.stale_seconds)
+
+    def is_fresh(self, key):
+        """True if key holds a get_or_compute value that has not expired"""
+        entry = self._get_entry(key)
+        return entry is not None and time.time() < entry.expires_at
+
+    def _get_entry(self, key):
+        try:
+            entry = self.get(key)
+        except Exception as e:
+            logger.warning(f"Cache read failed for {key}: {e}")
+            return None
+        # ค่าที่เขียนด้วย set() ธรรมดา (ก่อนเปลี่ยนมาใช้ get_or_compute) ถือว่าไม่มี
+        return entry if isinstance(entry, CacheEntry) else None
+
+    def _read_redis(self, key):
+        """CacheEntry straight from Redis (memory tier อาจเก็บ miss ไว้)"""
+        try:
+            entry = cache.get(key)
+        except Exception:
+            return None
+        return entry if isinstance(entry, CacheEntry) else None
+
+    def _should_refresh(self, entry):
+        """XFetch: now - delta * beta * ln(rand) >= expiry"""
+        now = time.time()
+        if now >= entry.expires_at:
+            return True
+        if not entry.delta or not self.early_refresh_beta:
+            return False
+        # 1 - random() อยู่ใน (0, 1] จึงไม่เกิด log(0)
+        return now - entry.delta * self.early_refresh_beta * math.log(1.0 - random.random()) >= entry.expires_at
+
+    def _try_lock(self, key):
+        """
+        Redis lock for recomputing key
+
+        Returns:
+            Lock ที่ได้มา, None ถ้า Redis ใช้งานไม่ได้ (คำนวณเองโดยไม่ล็อก) หรือ False ถ้า worker อื่นถืออยู่
+        """
+        try:
+            lock = redis_store.lock(redis_store.key('lock', key), timeout=self.lock_timeout, blocking=False)
+            return lock if lock.acquire() else False
+        except Exception as e:
+            logger.warning(f"Cannot acquire cache lock for {key}: {e}")
+            return None
+
+    def _unlock(self, lock):
+        if lock is None:
+            return
+        try:
+            lock.release()
+        except Exception as e:
+            # lock หมดอายุก่อนคำนวณเสร็จ (ควรเพิ่ม CACHE_LOCK_TIMEOUT)
+            logger.warning(f"Cannot release cache lock {lock.name}: {e}")
+
+    def _fill(self, key, compute, timeout, stale):
+        started = time.perf_counter()
+        try:
+            value = compute()
+        except Exception as e:
+            if stale is None:
+                raise
+            # เช่น database ล่ม (circuit breaker เปิด) - ใช้ค่าเดิมต่อไปก่อน
+            logger.warning(f"Recomputing {key} failed, serving stale value: {e}")
+            self._count('stale_served')
+            return stale.value
+
+        # None ก็เป็นผลลัพธ์ (เช่น การประชุมถูกลบ) - cache ไว้ ไม่ใช้ค่าเก่าแทน
+        delta = time.perf_counter() - started
+        try:
+            self.set(key, CacheEntry(value, time.time() + timeout, delta), timeout=timeout + self.stale_seconds)
+        except Exception as e:
+            logger.warning(f"Cache write failed for {key}: {e}")
+        return value
+
+    # ----- warming every worker -----
+
+    def on_warm(self, callback):
+        """Register callback(arg) to run in every worker when broadcast_warm(arg) is called"""
+        self._warmers.append(callback)
+        return callback
+
+    def broadcast_warm(self, arg):
+        """Ask every subscribed worker (ยกเว้น process นี้) to run its warm callbacks"""
+        self._ensure_listener()
+        redis_store.publish(redis_store.key(CHANNEL), f"{self._sender}|{WARM_PREFIX}{arg}")
+
+    def _start_warmers(self, arg):
+        if not self._warmers or self._app is None:
+            return
+        # ไม่ทำใน thread ของ listener เพื่อไม่ให้ข้อความ invalidation ค้าง
+        thread = threading.Thread(target=self._run_warmers, args=(arg,), name='tiered-cache-warm', daemon=True)
+        thread.start()
+
+    def _run_warmers(self, arg):
+        with self._app.app_context():
+            for callback in self._warmers:
+                try:
+                    callback(arg)
+                except Exception as e:
+                    logger.warning(f"Cache warm callback {callback.__name__}({arg}) failed: {e}")
+
+    # ----- metrics -----
+
+    def _count(self, field):
+        self._stats[field] += 1
+        if time.monotonic() - self._flushed_at >= STATS_FLUSH_INTERVAL:
+            self.flush_stats()
+
+    def flush_stats(self):
+        """Add this worker's counters since the last flush to the shared Redis hash"""
+        self._flushed_at = time.monotonic()
+        current = Counter(self._stats)
+        delta = current - self._flushed
+        if not delta:
+            return
+        try:
+            pipe = redis_store.pipeline()
+            for field, value in delta.items():
+                pipe.hincrby(redis_store.key(STATS_KEY), field, value)
+            pipe.execute()
+            self._flushed = current
+        except Exception as e:
+            logger.warning(f"Cannot flush tiered cache stats: {e}")
+
+    def get_metrics(self):
+        """
+        Hit rates per tier
+
+        Returns:
+            dict: worker (process นี้) และ cluster (ทุก worker รวมกัน ณ การ flush ล่าสุด)
+        """
+        worker = {field: self._stats.get(field, 0) for field in STAT_FIELDS}
+        worker.update(_hit_rates(worker))
+        worker.update({
+            'pid': os.getpid(),
+            'local_entries': len(self._data),
+            'subscribed': self._subscribed.is_set(),
+        })
+
+        self.flush_stats()
+        try:
+            raw = redis_store.hgetall(redis_store.key(STATS_KEY))
+            cluster = {_decode(field): int(value) for field, value in raw.items()}
+            cluster.update(_hit_rates(cluster))
+        except Exception as e:
+            logger.warning(f"Cannot read tiered cache stats: {e}")
+            cluster = None
+
+        return {'enabled': self.enabled, 'worker': worker, 'cluster': cluster}
+
+
+tiered_cache = TieredCache()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Benchmark XLSX export memory: pandas DataFrame (เดิม) vs openpyxl write-only (export_utils)
+
+แต่ละกรณีรันใน process แยกเพื่อให้วัด peak RSS ได้ถูกต้อง (รวมเวลา import pandas ด้วย)
+ใช้ข้อมูลสังเคราะห์ จึงไม่ต้องเชื่อมต่อ database
+
+Usage:
+    python tools/benchmark_export.py [--rows 10000 100000]
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+HEADER = ['ลำดับ', 'รหัสพนักงาน', 'ชื่อ-สกุล', 'ตำแหน่ง', 'ส่วนงาน', 'ศูนย์ต้นทุน', 'เวลาลงทะเบียน', 'ลงทะเบียนด้วยตนเอง']
+SHEET_NAME = 'รายชื่อผู้ลงทะเบียน'
+
+
+def synthetic_rows(count):
+    start = datetime(2026, 1, 1, 8, 0, 0)
+    for idx in range(1, count + 1):
+        yield [
+            idx,
+            f'{idx:08d}',
+            f'นาย ทดสอบ ระบบลงทะเบียน {idx}',
+            'พนักงานปฏิบัติการ',
+            'ฝ่ายเทคโนโลยีสารสนเทศ',
+            'ศูนย์ต้นทุนสำนักงานใหญ่',
+            (start + timedelta(seconds=idx)).strftime('%Y-%m-%d %H:%M:%S'),
+            'ใช่' if idx % 7 == 0 else 'ไม่'
+        ]
+
+
+def export_pandas(count, fileobj):
+    """Previous organizer.export_registrations excel branch"""
+    import pandas as pd
+
+    data = [dict(zip(HEADER, row)) for row in synthetic_rows(count)]
+    df = pd.DataFrame(data)
+    with pd.ExcelWriter(fileobj, engine='openpyxl') as writer:
+        df.to_excel(writer, index=False, sheet_name=SHEET_NAME)
+
+
+def export_write_only(count, fileobj):
+    from export_utils import write_xlsx
+
+    write_xlsx(fileobj, HEADER, synthetic_rows(count), SHEET_NAME)
+
+
+IMPLEMENTATIONS = {
+    'pandas': export_pandas,
+    'write_only': export_write_only,
+}
+
+
+def run_case(name, count):
+    """Run one export in this process and print: seconds peak_traced_mb max_rss_mb file_kb"""
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    start = time.perf_counter()
+    with tempfile.TemporaryFile() as output:
+        IMPLEMENTATIONS[name](count, output)
+        size = output.tell()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{elapsed:.3f} {peak / 1024 / 1024:.1f} {max_rss / 1024:.1f} {(max_rss - baseline_rss) / 1024:.1f} {size / 1024:.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark XLSX export memory')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--run', nargs=2, metavar=('IMPL', 'ROWS'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_case(args.run[0], int(args.run[1]))
+        return
+
+    print(f"{'impl':>10} {'rows':>8} {'seconds':>8} {'peak traced MB':>15} {'max RSS MB':>11} {'RSS growth MB':>14} {'file KB':>8}")
+    for count in args.rows:
+        for name in IMPLEMENTATIONS:
+            result = subprocess.run([sys.executable, __file__, '--run', name, str(count)],
+                                    capture_output=True, text=True)
+            if result.returncode != 0:
+                last_line = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'failed'
+                print(f"{name:>10} {count:>8} {last_line}")
+                continue
+            seconds, traced, rss, growth, size = result.stdout.split()
+            print(f"{name:>10} {count:>8} {seconds:>8} {traced:>15} {rss:>11} {growth:>14} {size:>8}")
+
+
+if __name__ == '__main__':
+    main()
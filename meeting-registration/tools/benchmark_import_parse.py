@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Benchmark employee CSV parse/validate throughput vs number of worker processes
+
+วัดเฉพาะขั้นตอน parse + normalize (employee_import.iter_csv_records) ไม่รวม COPY/merge
+จึงไม่ต้องเชื่อมต่อ database และตรวจว่าผลลัพธ์ทุกจำนวน worker ตรงกับแบบ process เดียว
+
+Usage:
+    python tools/benchmark_import_parse.py [--rows 200000] [--workers 1 2 4]
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from employee_import import CSV_COLUMNS, iter_csv_records
+
+
+def write_synthetic_csv(path, count):
+    """CSV with Thai headers like the HR export, plus a few invalid rows"""
+    with open(path, 'w', encoding='utf-8-sig', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow([header for _, header in CSV_COLUMNS])
+        for idx in range(1, count + 1):
+            row = {field: f'{field[:3].upper()}{idx % 500:04d}' for field, _ in CSV_COLUMNS}
+            row['emp_id'] = '' if idx % 10007 == 0 else f'{idx:08d}'
+            row['emp_name'] = 'ช' * 300 if idx % 20011 == 0 else f'นาย ทดสอบ, ระบบลงทะเบียน {idx}'
+            row['position'] = 'พนักงานปฏิบัติการ'
+            writer.writerow([row[field] for field, _ in CSV_COLUMNS])
+
+
+def run(path, workers):
+    errors = []
+    start = time.perf_counter()
+    records = list(iter_csv_records(path, errors, workers=workers))
+    return time.perf_counter() - start, records, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark parallel CSV parsing for employee imports')
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'employees.csv')
+        write_synthetic_csv(path, args.rows)
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        print(f"rows={args.rows} file={size_mb:.1f} MB cpu_count={os.cpu_count()}\n")
+
+        baseline = None
+        results = []
+        for workers in args.workers:
+            seconds, records, errors = run(path, workers)
+            if baseline is None:
+                baseline = (seconds, records, errors)
+            same = records == baseline[1] and errors == baseline[2]
+            results.append((workers, seconds, len(records), len(errors), same))
+
+    print(f"\n{'workers':>8} {'seconds':>8} {'rows/sec':>10} {'speedup':>8} {'records':>8} {'errors':>7} {'identical':>9}")
+    for workers, seconds, record_count, error_count, same in results:
+        print(f"{workers:>8} {seconds:>8.3f} {args.rows / seconds:>10.0f} {baseline[0] / seconds:>7.2f}x "
+              f"{record_count:>8} {error_count:>7} {str(same):>9}")
+
+
+if __name__ == '__main__':
+    main()
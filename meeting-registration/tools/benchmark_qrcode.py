@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Benchmark QR Code rendering: per-pixel putpixel loop (เดิม) vs rasterize_qr
+
+ตรวจสอบด้วยว่าภาพที่ได้เหมือนเดิมทุก pixel (ทั้งแบบมีและไม่มี logo)
+
+Usage:
+    python tools/benchmark_qrcode.py [--repeat 20] [--logo static/logo.png]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageChops, ImageDraw
+from qrcodegen import QrCode
+
+import qrcode_utils
+from qrcode_utils import generate_qr_code, rasterize_qr
+
+VERSIONS = [2, 5, 10, 20, 40]
+SCALE = 8
+
+
+def legacy_rasterize(qr, scale=SCALE):
+    """Original implementation from generate_qr_code"""
+    size = qr.get_size()
+    img_size = size * scale
+    img = Image.new('1', (img_size, img_size), 'white')
+    for y in range(size):
+        for x in range(size):
+            if qr.get_module(x, y):
+                for dy in range(scale):
+                    for dx in range(scale):
+                        img.putpixel((x * scale + dx, y * scale + dy), 0)
+    return img.convert("RGB")
+
+
+def legacy_add_logo(img, logo_path):
+    """Original logo overlay (open + LANCZOS resize every call)"""
+    img_size = img.size[0]
+    logo = Image.open(logo_path)
+    logo_width, logo_height = logo.size
+    logo_ratio = logo_width / logo_height
+    max_logo_size = img_size // 5
+    if logo_width > logo_height:
+        new_logo_width = max_logo_size
+        new_logo_height = int(max_logo_size / logo_ratio)
+    else:
+        new_logo_height = max_logo_size
+        new_logo_width = int(max_logo_size * logo_ratio)
+    logo = logo.resize((new_logo_width, new_logo_height), Image.Resampling.LANCZOS)
+    padding = 10
+    logo_position = ((img_size - new_logo_width) // 2, (img_size - new_logo_height) // 2)
+    draw = ImageDraw.Draw(img)
+    draw.rectangle([(logo_position[0] - padding, logo_position[1] - padding),
+                    (logo_position[0] + new_logo_width + padding,
+                     logo_position[1] + new_logo_height + padding)],
+                   fill="white")
+    if logo.mode == 'RGBA':
+        img.paste(logo, logo_position, mask=logo.split()[3])
+    else:
+        img.paste(logo, logo_position)
+    return img
+
+
+def encode(version):
+    """Registration-like URL padded so that encode_text picks the given QR version"""
+    base = "https://meeting.example.com/submit/1"
+    lo, hi = 0, 4000
+    while lo < hi:
+        mid = (lo + hi) // 2
+        data = f"{base}?q={'x' * mid}"
+        try:
+            reached = QrCode.encode_text(data, QrCode.Ecc.QUARTILE).get_version() >= version
+        except Exception:
+            reached = True
+        if reached:
+            hi = mid
+        else:
+            lo = mid + 1
+    data = f"{base}?q={'x' * lo}" if version > 1 else base
+    return data, QrCode.encode_text(data, QrCode.Ecc.QUARTILE)
+
+
+def timeit(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def same_pixels(a, b):
+    return a.size == b.size and a.mode == b.mode and ImageChops.difference(a, b).getbbox() is None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark QR Code rasterizer')
+    parser.add_argument('--repeat', type=int, default=20, help='Iterations per measurement')
+    parser.add_argument('--logo', default=os.path.join('static', 'logo.png'), help='Logo file for overlay test')
+    args = parser.parse_args()
+
+    # generate_qr_code ไม่ต้อง log ทุกครั้งระหว่าง benchmark
+    qrcode_utils.logger.disabled = True
+
+    print(f"{'version':>7} {'modules':>7} {'pixels':>9} {'putpixel ms':>12} {'rasterize ms':>13} {'speedup':>8} {'identical':>9}")
+    for version in VERSIONS:
+        _, qr = encode(version)
+        old_ms = timeit(lambda: legacy_rasterize(qr), args.repeat)
+        new_ms = timeit(lambda: rasterize_qr(qr, SCALE), args.repeat)
+        identical = same_pixels(legacy_rasterize(qr), rasterize_qr(qr, SCALE))
+        size = qr.get_size()
+        print(f"{qr.get_version():>7} {size:>7} {(size * SCALE) ** 2:>9} {old_ms:>12.2f} {new_ms:>13.2f} "
+              f"{old_ms / new_ms:>7.1f}x {str(identical):>9}")
+
+    if not os.path.exists(args.logo):
+        print(f"\nLogo not found at {args.logo} - skipping logo comparison")
+        return
+
+    print(f"\nWith logo ({args.logo}):")
+    print(f"{'version':>7} {'legacy ms':>10} {'generate_qr_code ms':>20} {'speedup':>8} {'identical':>9}")
+    for version in VERSIONS:
+        data, qr = encode(version)
+        # ทั้งสองฝั่งรวมเวลา encode_text (ส่วนที่ rasterizer ไม่ได้เปลี่ยน)
+        old_ms = timeit(lambda: legacy_add_logo(
+            legacy_rasterize(QrCode.encode_text(data, QrCode.Ecc.QUARTILE)), args.logo), args.repeat)
+        new_ms = timeit(lambda: generate_qr_code(data, True, args.logo), args.repeat)
+        identical = same_pixels(legacy_add_logo(legacy_rasterize(qr), args.logo),
+                                generate_qr_code(data, True, args.logo))
+        print(f"{qr.get_version():>7} {old_ms:>10.2f} {new_ms:>20.2f} {old_ms / new_ms:>7.1f}x {str(identical):>9}")
+
+
+if __name__ == '__main__':
+    main()
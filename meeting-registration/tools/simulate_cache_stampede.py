@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Simulate a cache stampede: many concurrent misses on one hot key
+
+เทียบ read-through แบบเดิม (get -> compute -> set) กับ tiered_cache.get_or_compute
+ทุก client เริ่มพร้อมกันด้วย Barrier (thread แทน gunicorn worker - lock อยู่ใน Redis จึงให้ผลเหมือนกัน)
+
+  cold      key ยังไม่มีเลย: client อื่นรอ leader แทนการคำนวณเอง
+  expired   ค่าหมดอายุแล้ว: client อื่นได้ค่าเก่าทันที
+  version   meeting_cache.invalidate() แล้วอ่านการประชุมที่ active (ใช้ database จริง, --meeting-cache)
+
+ต้องมี Redis (REDIS_URL) และสำหรับ --meeting-cache ต้องมี database ตาม config
+
+เป็น benchmark เสริม (วัด latency) การตรวจว่าคำนวณเพียงครั้งเดียวอยู่ใน tests/test_cache_stampede.py
+
+Usage:
+    python tools/simulate_cache_stampede.py [--clients 200] [--compute-ms 200] [--meeting-cache]
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def run_clients(app, clients, target):
+    """Run target() from `clients` threads at once, return sorted latencies in ms"""
+    barrier = threading.Barrier(clients)
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def client():
+        with app.app_context():
+            barrier.wait()
+            started = time.perf_counter()
+            try:
+                target()
+            except Exception as e:
+                with lock:
+                    errors.append(e)
+                return
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        print(f"  {len(errors)} client errors, first: {errors[0]!r}")
+    return sorted(latencies)
+
+
+def report(name, computes, latencies, stats_before, stats_after):
+    p50 = statistics.median(latencies) if latencies else 0
+    p99 = latencies[int(len(latencies) * 0.99) - 1] if latencies else 0
+    changed = {field: stats_after[field] - stats_before.get(field, 0)
+               for field in ('recomputes', 'early_refreshes', 'stale_served', 'lock_waits', 'lock_timeouts')
+               if stats_after[field] - stats_before.get(field, 0)}
+    print(f"{name:<28} computes={computes:<4} p50={p50:7.1f}ms p99={p99:7.1f}ms {changed}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate concurrent cache misses on a hot key')
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--compute-ms', type=int, default=200, help='simulated recompute time')
+    parser.add_argument('--config', default=os.environ.get('FLASK_ENV', 'development'))
+    parser.add_argument('--meeting-cache', action='store_true',
+                        help='also bump meeting_cache version and load active meetings from the database')
+    args = parser.parse_args()
+
+    from app import create_app
+    from extensions import cache
+    from tiered_cache import CacheEntry, tiered_cache
+
+    app = create_app(args.config)
+    timeout = 60
+    computes = []
+
+    def compute():
+        computes.append(1)
+        time.sleep(args.compute_ms / 1000)
+        return {'computed_at': time.time()}
+
+    print(f"{args.clients} concurrent clients, recompute {args.compute_ms}ms\n")
+
+    with app.app_context():
+        key = f'stampede_sim:{uuid.uuid4().hex}'
+
+        def naive():
+            if cache.get(key + ':naive') is None:
+                cache.set(key + ':naive', compute(), timeout=timeout)
+
+        computes.clear()
+        stats = dict(tiered_cache._stats)
+        latencies = run_clients(app, args.clients, naive)
+        report('naive get/compute/set', len(computes), latencies, stats, tiered_cache._stats)
+
+        computes.clear()
+        stats = dict(tiered_cache._stats)
+        latencies = run_clients(app, args.clients,
+                                lambda: tiered_cache.get_or_compute(key + ':cold', compute, timeout))
+        report('single-flight, cold', len(computes), latencies, stats, tiered_cache._stats)
+
+        # ค่าที่หมดอายุไปแล้ว 1 วินาที แต่ยังอยู่ใน Redis
+        tiered_cache.set(key + ':expired', CacheEntry({'computed_at': 0}, time.time() - 1, args.compute_ms / 1000),
+                         timeout=timeout + tiered_cache.stale_seconds)
+        computes.clear()
+        stats = dict(tiered_cache._stats)
+        latencies = run_clients(app, args.clients,
+                                lambda: tiered_cache.get_or_compute(key + ':expired', compute, timeout))
+        report('single-flight, expired', len(computes), latencies, stats, tiered_cache._stats)
+
+        for suffix in ('naive', 'cold', 'expired'):
+            cache.delete(f'{key}:{suffix}')
+
+        if args.meeting_cache:
+            simulate_meeting_cache(app, args.clients)
+
+
+def simulate_meeting_cache(app, clients):
+    from sqlalchemy import event
+
+    import meeting_cache
+    from models import Meeting, db
+    from tiered_cache import tiered_cache
+
+    statements = []
+
+    def count_meeting_queries(conn, cursor, statement, parameters, context, executemany):
+        if 'FROM meetings' in statement:
+            statements.append(statement)
+
+    loads = []
+    load_active = Meeting.load_active.__func__
+
+    def counting_load_active(cls):
+        loads.append(1)
+        return load_active(cls)
+
+    meeting_cache.get_active_meetings()
+    meeting_cache.invalidate()
+
+    event.listen(db.engine, 'before_cursor_execute', count_meeting_queries)
+    Meeting.load_active = classmethod(counting_load_active)
+    try:
+        stats = dict(tiered_cache._stats)
+        latencies = run_clients(app, clients, meeting_cache.get_active_meetings)
+        report('meeting_cache after bump', len(loads), latencies, stats, tiered_cache._stats)
+        print(f"{'':<28} meetings queries={len(statements)}")
+    finally:
+        Meeting.load_active = classmethod(load_active)
+        event.remove(db.engine, 'before_cursor_execute', count_meeting_queries)
+
+
+if __name__ == '__main__':
+    main()